@@ -1,18 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 from werkzeug.utils import secure_filename
-from config import Config
-from csv_processor import CSVProcessor
-from google_sheets_service import GoogleSheetsService
+from config import get_config
+from csv_processor import CSVBatch, CSVProcessor, compression_from_header, extract_csv_archive, strip_compression_extension, zstandard
+from google_sheets_service import GoogleSheetsService, NO_NEW_COMPANIES
+from multi_client_service import MultiClientUploadService
 from master_sheet_service import MasterSheetService
-import threading
+from job_queue import JobExecutor
+from job_store import JobStore, FINAL_STATUSES
+from write_checkpoints import CheckpointStore, JobCheckpoint
+from stage_graph import StageGraph, StageError
+from upload_cache import UploadCache, hash_stream
+from datetime import datetime
+from rate_limiter import get_request_layer
+from metrics import REGISTRY, JOBS_QUEUED, JOBS_RUNNING
+import itertools
+import json
 import time
 
 app = Flask(__name__)
 CORS(app)
 
-config = Config()
+config = get_config()
 UPLOAD_FOLDER = config.UPLOAD_FOLDER
 ALLOWED_EXTENSIONS = config.ALLOWED_EXTENSIONS
 
@@ -21,67 +31,348 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH
 
-processing_status = {}
+job_store = JobStore(config.JOB_STORE_PATH, config.JOB_STATUS_TTL_HOURS * 3600, config.JOB_STORE_MAX_JOBS)
+job_executor = JobExecutor(config.JOB_WORKERS)
+checkpoint_store = CheckpointStore(config.WRITE_CHECKPOINT_PATH, config.JOB_STATUS_TTL_HOURS * 3600)
+upload_cache = UploadCache(config.UPLOAD_CACHE_PATH, config.UPLOAD_CACHE_TTL_HOURS * 3600)
+# Jobs cut off by a crash or restart would otherwise stay queued/processing and could not be retried
+interrupted_jobs = job_store.fail_interrupted_jobs('Interrupted: the server stopped while this job was running. Retry it to resume where it left off.')
+if interrupted_jobs:
+    print(f"WARNING: Marked {interrupted_jobs} interrupted job(s) as failed")
+JOBS_QUEUED.set_function(lambda: job_executor.queue_depth)
+JOBS_RUNNING.set_function(lambda: job_executor.running)
+# How often a status stream looks at a queued job's position again
+QUEUED_STATUS_POLL_SECONDS = 2
 
 def allowed_file(filename):
+    # .csv.gz and .csv.zst are decompressed while parsing
+    filename = strip_compression_extension(filename)
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_csv_and_upload(file_path, filename, client_id):
-    global processing_status
+def allowed_archive(filename):
+    # Zip archives of CSVs are accepted by batch uploads
+    return filename.lower().endswith('.zip')
+
+def process_csv_and_upload(file_path, job_id, client_id):
     try:
-        processing_status[filename] = {'status': 'processing', 'message': 'Processing CSV file...', 'progress': 0}
+        job_store.set_status(job_id, {'status': 'processing', 'message': 'Processing CSV file...', 'progress': 0})
         
-        # Initialize master sheet if needed
         master_service = MasterSheetService()
-        master_init_success, master_init_message = master_service.initialize_master_sheet()
-        if not master_init_success:
-            processing_status[filename] = {'status': 'failed', 'message': f'Master sheet initialization failed: {master_init_message}', 'progress': 0}
+        master_service.checkpoint = JobCheckpoint(checkpoint_store, job_id)
+        
+        # Create Google Sheets service for the specific client
+        sheets_service = GoogleSheetsService(client_id=client_id, master_service=master_service)
+        sheets_service.checkpoint = master_service.checkpoint
+        
+        # Get client info for display
+        client_info, error = sheets_service.get_client_sheet_info()
+        if error:
+            job_store.set_status(job_id, {'status': 'failed', 'message': f'Client configuration error: {error}', 'progress': 0})
             return
         
-        processing_status[filename] = {'status': 'processing', 'message': 'Master sheet ready, processing CSV...', 'progress': 20}
+        client_name = client_info['name']
+        csv_processor = CSVProcessor(file_path, engine=get_config().CSV_PARSE_ENGINE, max_data_bytes=get_config().CSV_MAX_DATA_MB * 1024 * 1024)
+        
+        # Large files (by decompressed size) are parsed and uploaded chunk by chunk to bound memory
+        streaming = csv_processor.data_size() >= get_config().CSV_STREAMING_THRESHOLD_MB * 1024 * 1024
         
-        csv_processor = CSVProcessor(file_path)
-        success, data, message = csv_processor.process_csv()
-        if not success:
-            processing_status[filename] = {'status': 'failed', 'message': f'CSV processing failed: {message}', 'progress': 0}
+        job_store.set_status(job_id, {'status': 'processing', 'message': 'Preparing sheets and processing CSV...', 'progress': 20})
+        try:
+            results = prepare_upload_stages(csv_processor, master_service, {client_id: sheets_service}, streaming).run()
+        except StageError as e:
+            job_store.set_status(job_id, {'status': 'failed', 'message': str(e), 'progress': 0})
+            return
+        
+        if streaming:
+            process_csv_streaming(csv_processor, job_id, sheets_service, client_name, results['parse'])
             return
         
-        processing_status[filename] = {'status': 'processing', 'message': 'CSV processed, checking for duplicates and uploading...', 'progress': 50}
+        data = results['parse']
+        job_store.set_status(job_id, {'status': 'processing', 'message': 'CSV processed, checking for duplicates and uploading...', 'progress': 50})
         
-        data_info = csv_processor.get_data_info()
         # Validate data
         is_valid, issues = csv_processor.validate_data()
         if not is_valid:
-            processing_status[filename] = {'status': 'warning', 'message': f'Data uploaded with warnings: {"; ".join(issues)}', 'progress': 75}
+            job_store.set_status(job_id, {'status': 'warning', 'message': f'Data uploaded with warnings: {"; ".join(issues)}', 'progress': 75})
         
-        # Create Google Sheets service for the specific client
-        sheets_service = GoogleSheetsService(client_id=client_id)
+        # Upload data to client sheet and update master sheet
+        upload_success, upload_message = sheets_service.append_data(data, client_name)
+        finish_upload(job_id, csv_processor, sheets_service, client_name, upload_success, upload_message)
+            
+    except Exception as e:
+        job_store.set_status(job_id, {'status': 'failed', 'message': f'Unexpected error: {str(e)}', 'progress': 0})
+
+def prepare_upload_stages(csv_processor, master_service, sheets_services, streaming, extra_columns=()):
+    """Stages to run before writing: parsing the CSV and the sheet reads don't depend on each other
+    
+    sheets_services maps client IDs to the GoogleSheetsService of each target
+    sheet; their headers are read once here and reused by the upload.
+    The 'parse' stage yields the parsed DataFrame, or for streaming uploads an
+    iterator over the chunks whose first chunk has already been parsed.
+    
+    With CSV_PROJECT_COLUMNS the parse waits for the sheet headers and loads
+    only the CSV columns they map to, plus extra_columns (e.g. a routing column).
+    """
+    project_columns = get_config().CSV_PROJECT_COLUMNS
+    def initialize_master(results):
+        success, message = master_service.initialize_master_sheet()
+        if not success:
+            raise StageError(f'Master sheet initialization failed: {message}')
+    
+    def sync_master_index(results):
+        # A failed sync is retried when duplicates are checked, so it is not fatal here
+        master_service.sync_index()
+    
+    def fetch_headers(client_id, sheets_service):
+        def stage(results):
+            headers, error = sheets_service.get_existing_headers()
+            if error:
+                raise StageError(f'Upload failed: Failed to get sheet headers for {client_id}: {error}')
+            return headers
+        return stage
+    
+    def parse_csv(results):
+        if project_columns:
+            try:
+                csv_columns = csv_processor.read_header()
+            except Exception as e:
+                raise StageError(f'CSV processing failed: {str(e)}')
+            used_columns = set(extra_columns)
+            for client_id, sheets_service in sheets_services.items():
+                used_columns.update(sheets_service.csv_columns_used(csv_columns, results[f'headers:{client_id}']))
+            csv_processor.select_columns(used_columns)
         
-        # Get client info for display
-        client_info, error = sheets_service.get_client_sheet_info()
-        if error:
-            processing_status[filename] = {'status': 'failed', 'message': f'Client configuration error: {error}', 'progress': 75}
+        if streaming:
+            # Parse errors in the first chunk fail the job here; later ones are reported by append_data_stream
+            try:
+                chunks = csv_processor.iter_chunks(get_config().CSV_CHUNK_ROWS)
+                first_chunk = next(chunks, None)
+            except Exception as e:
+                raise StageError(f'CSV processing failed: {str(e)}')
+            return chunks if first_chunk is None else itertools.chain([first_chunk], chunks)
+        
+        success, data, message = csv_processor.process_csv()
+        if not success:
+            raise StageError(f'CSV processing failed: {message}')
+        return data
+    
+    graph = StageGraph(max_workers=len(sheets_services) + 3)
+    graph.add('master_init', initialize_master)
+    graph.add('master_index', sync_master_index, depends_on=['master_init'])
+    for client_id, sheets_service in sheets_services.items():
+        graph.add(f'headers:{client_id}', fetch_headers(client_id, sheets_service))
+    graph.add('parse', parse_csv, depends_on=[f'headers:{client_id}' for client_id in sheets_services] if project_columns else ())
+    return graph
+
+def process_csv_streaming(csv_processor, job_id, sheets_service, client_name, chunks):
+    """Deduplicate and upload a large CSV one chunk at a time"""
+    def report_progress(rows_read, rows_added):
+        job_store.set_status(job_id, {
+            'status': 'processing',
+            'message': f'Streaming upload: {rows_read} rows read, {rows_added} new companies added...',
+            'progress': 50
+        })
+    
+    # Parse errors surface while iterating and are reported by append_data_stream
+    upload_success, upload_message = sheets_service.append_data_stream(chunks, client_name, report_progress)
+    
+    if upload_success:
+        is_valid, issues = csv_processor.validate_data()
+        if not is_valid:
+            upload_message = f'{upload_message}. Warnings: {"; ".join(issues)}'
+    
+    finish_upload(job_id, csv_processor, sheets_service, client_name, upload_success, upload_message)
+
+def process_csv_fan_out(file_path, job_id, upload_service):
+    """Parse a CSV once and upload its new rows to several clients"""
+    try:
+        job_store.set_status(job_id, {'status': 'processing', 'message': 'Processing CSV file...', 'progress': 0})
+        upload_service.set_checkpoint(JobCheckpoint(checkpoint_store, job_id))
+        
+        csv_processor = CSVProcessor(file_path, engine=get_config().CSV_PARSE_ENGINE, max_data_bytes=get_config().CSV_MAX_DATA_MB * 1024 * 1024)
+        
+        # Large files (by decompressed size) are parsed and uploaded chunk by chunk to bound memory
+        streaming = csv_processor.data_size() >= get_config().CSV_STREAMING_THRESHOLD_MB * 1024 * 1024
+        
+        job_store.set_status(job_id, {'status': 'processing', 'message': 'Preparing sheets and processing CSV...', 'progress': 20})
+        try:
+            results = prepare_upload_stages(
+                csv_processor, upload_service.master_service, upload_service.services, streaming,
+                extra_columns=[upload_service.routing_column] if upload_service.routing_column else ()
+            ).run()
+        except StageError as e:
+            job_store.set_status(job_id, {'status': 'failed', 'message': str(e), 'progress': 0})
             return
         
-        client_name = client_info['name']
+        if streaming:
+            def report_progress(rows_read, rows_added):
+                job_store.set_status(job_id, {
+                    'status': 'processing',
+                    'message': f'Streaming upload: {rows_read} rows read, {rows_added} new companies added...',
+                    'progress': 50
+                })
+            
+            upload_success, upload_message = upload_service.append_data_stream(results['parse'], report_progress)
+        else:
+            job_store.set_status(job_id, {'status': 'processing', 'message': 'CSV processed, checking for duplicates and uploading...', 'progress': 50})
+            upload_success, upload_message = upload_service.append_data(results['parse'])
         
-        # Upload data to client sheet and update master sheet
-        upload_success, upload_message = sheets_service.append_data(data, client_name)
         if upload_success:
-            mapping_info = sheets_service.get_column_mapping_info()
-            processing_status[filename] = {
-                'status': 'completed', 
-                'message': f'{upload_message}. Data: {data_info["rows"]} rows, {data_info["columns"]} columns', 
-                'progress': 100, 
-                'data_info': data_info, 
-                'column_mapping': mapping_info,
-                'client_name': client_name
-            }
+            is_valid, issues = csv_processor.validate_data()
+            if not is_valid:
+                upload_message = f'{upload_message}. Warnings: {"; ".join(issues)}'
+            
+            checkpoint_store.clear(job_id)
+            data_info = csv_processor.get_data_info()
+            record_upload_result(job_id, ', '.join(upload_service.client_names()), data_info['rows'])
+            job_store.set_status(job_id, {
+                'status': 'completed',
+                'message': f'{upload_message}. Data: {data_info["rows"]} rows, {data_info["columns"]} columns',
+                'progress': 100,
+                'data_info': data_info,
+                'client_name': ', '.join(upload_service.client_names()),
+                'client_counts': upload_service.client_counts
+            })
         else:
-            processing_status[filename] = {'status': 'failed', 'message': f'Upload failed: {upload_message}', 'progress': 75}
+            if upload_message.startswith(NO_NEW_COMPANIES):
+                record_upload_result(job_id, ', '.join(upload_service.client_names()), csv_processor.rows_read or csv_processor.get_data_info()['rows'])
+            job_store.set_status(job_id, {'status': 'failed', 'message': f'Upload failed: {upload_message}', 'progress': 75})
             
     except Exception as e:
-        processing_status[filename] = {'status': 'failed', 'message': f'Unexpected error: {str(e)}', 'progress': 0}
+        job_store.set_status(job_id, {'status': 'failed', 'message': f'Unexpected error: {str(e)}', 'progress': 0})
+
+def expand_batch_files(file_paths, max_bytes):
+    """CSV files of a batch upload, with each zip archive replaced by the CSVs inside it"""
+    csv_paths = []
+    for file_path in file_paths:
+        if allowed_archive(file_path):
+            # Extracted next to the archive, so a retry extracts to the same files again
+            csv_paths.extend(extract_csv_archive(file_path, f"{file_path}_files", max_bytes))
+        else:
+            csv_paths.append(file_path)
+    return csv_paths
+
+def process_csv_batch(file_paths, job_id, client_id):
+    """Parse several CSVs (or zips of CSVs) in parallel and upload them as one CSV
+    
+    The combined rows are deduplicated against each other and the master sheet
+    in one pass, then written with a single client append and a single master
+    append, instead of one full upload per file.
+    """
+    try:
+        job_store.set_status(job_id, {'status': 'processing', 'message': f'Processing {len(file_paths)} uploaded files...', 'progress': 0})
+        batch_config = get_config()
+        
+        master_service = MasterSheetService()
+        master_service.checkpoint = JobCheckpoint(checkpoint_store, job_id)
+        sheets_service = GoogleSheetsService(client_id=client_id, master_service=master_service)
+        sheets_service.checkpoint = master_service.checkpoint
+        
+        client_info, error = sheets_service.get_client_sheet_info()
+        if error:
+            job_store.set_status(job_id, {'status': 'failed', 'message': f'Client configuration error: {error}', 'progress': 0})
+            return
+        client_name = client_info['name']
+        
+        max_bytes = batch_config.BATCH_MAX_DATA_MB * 1024 * 1024
+        try:
+            csv_paths = expand_batch_files(file_paths, max_bytes)
+        except ValueError as e:
+            job_store.set_status(job_id, {'status': 'failed', 'message': str(e), 'progress': 0})
+            return
+        if not csv_paths:
+            job_store.set_status(job_id, {'status': 'failed', 'message': 'No CSV files found in the upload', 'progress': 0})
+            return
+        if len(csv_paths) > batch_config.BATCH_MAX_FILES:
+            job_store.set_status(job_id, {'status': 'failed', 'message': f'The upload holds {len(csv_paths)} CSV files, more than the limit of {batch_config.BATCH_MAX_FILES}', 'progress': 0})
+            return
+        
+        # The whole batch is held in memory at once, so its decompressed size is capped
+        csv_batch = CSVBatch(csv_paths, engine=batch_config.CSV_PARSE_ENGINE, max_workers=batch_config.BATCH_PARSE_WORKERS, max_data_bytes=max_bytes)
+        data_size = csv_batch.data_size()
+        if data_size > max_bytes:
+            size = 'A file of the batch has an unknown decompressed size' if data_size == float('inf') else f'The batch holds {data_size / (1024 * 1024):.1f}MB of CSV data'
+            job_store.set_status(job_id, {
+                'status': 'failed',
+                'message': f'{size}, more than the {batch_config.BATCH_MAX_DATA_MB:g}MB batch limit. Upload large files one at a time.',
+                'progress': 0
+            })
+            return
+        
+        job_store.set_status(job_id, {'status': 'processing', 'message': f'Preparing sheets and processing {len(csv_paths)} CSV files...', 'progress': 20})
+        try:
+            results = prepare_upload_stages(csv_batch, master_service, {client_id: sheets_service}, streaming=False).run()
+        except StageError as e:
+            job_store.set_status(job_id, {'status': 'failed', 'message': str(e), 'progress': 0})
+            return
+        
+        data = results['parse']
+        job_store.set_status(job_id, {'status': 'processing', 'message': f'{len(csv_paths)} CSV files combined, checking for duplicates and uploading...', 'progress': 50})
+        
+        is_valid, issues = csv_batch.validate_data()
+        if not is_valid:
+            job_store.set_status(job_id, {'status': 'warning', 'message': f'Data uploaded with warnings: {"; ".join(issues)}', 'progress': 75})
+        
+        # One deduplication, one client write and one master write for every file together
+        upload_success, upload_message = sheets_service.append_data(data, client_name)
+        finish_upload(job_id, csv_batch, sheets_service, client_name, upload_success, upload_message)
+        
+    except Exception as e:
+        job_store.set_status(job_id, {'status': 'failed', 'message': f'Unexpected error: {str(e)}', 'progress': 0})
+
+def finish_upload(job_id, csv_processor, sheets_service, client_name, upload_success, upload_message):
+    """Record the final status of an upload job"""
+    if upload_success:
+        checkpoint_store.clear(job_id)
+        data_info = csv_processor.get_data_info()
+        record_upload_result(job_id, client_name, data_info['rows'])
+        mapping_info = sheets_service.get_column_mapping_info()
+        job_store.set_status(job_id, {
+            'status': 'completed', 
+            'message': f'{upload_message}. Data: {data_info["rows"]} rows, {data_info["columns"]} columns', 
+            'progress': 100, 
+            'data_info': data_info, 
+            'column_mapping': mapping_info,
+            'client_name': client_name
+        })
+    else:
+        if upload_message.startswith(NO_NEW_COMPANIES):
+            record_upload_result(job_id, client_name, csv_processor.rows_read or csv_processor.get_data_info()['rows'])
+        job_store.set_status(job_id, {'status': 'failed', 'message': f'Upload failed: {upload_message}', 'progress': 75})
+
+def record_upload_result(job_id, client_name, rows):
+    """Cache a finished upload so an identical resubmission can be answered at once"""
+    params = job_store.get_params(job_id)
+    if params and params.get('cache_key'):
+        upload_cache.put(params['cache_key'], job_id, {'client_name': client_name, 'rows': rows})
+
+def cached_upload_status(cached):
+    """Final job status for a resubmission of an already processed file"""
+    result = cached['result']
+    uploaded_at = datetime.fromtimestamp(cached['created_at']).strftime('%Y-%m-%d %H:%M')
+    return {
+        'status': 'failed',
+        'message': (
+            f"Upload failed: {NO_NEW_COMPANIES}. This file was already processed for {result['client_name']} "
+            f"on {uploaded_at}, so all {result['rows']} companies already exist in master sheet or repeat earlier rows. "
+            "Use Upload anyway (force=true) to check it again."
+        ),
+        'progress': 100,
+        'client_name': result['client_name'],
+        'cached': True,
+        'cached_job_id': cached['job_id']
+    }
+
+def submit_upload_job(job_id, params):
+    """Queue an upload job from its stored parameters and return its queue position"""
+    if params.get('file_paths'):
+        return job_executor.submit(job_id, process_csv_batch, params['file_paths'], job_id, params['client_id'])
+    if params.get('client_ids'):
+        upload_service = MultiClientUploadService(
+            params['client_ids'], routing=params['routing'], routing_column=params['routing_column']
+        )
+        return job_executor.submit(job_id, process_csv_fan_out, params['file_path'], job_id, upload_service)
+    return job_executor.submit(job_id, process_csv_and_upload, params['file_path'], job_id, params['client_id'])
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
@@ -89,47 +380,254 @@ def upload_file():
         return jsonify({'error': 'No file part'}), 400
     
     file = request.files['file']
-    client_id = request.form.get('client_id', 'client_a')  # Default to client_a
+    client_id = request.form.get('client_id') or next(iter(get_config().CLIENT_SHEETS), '')  # Default to the first client
+    
+    # Several clients (repeated or comma-separated client_ids) share one parse of the file
+    client_ids = list(dict.fromkeys(cid.strip() for value in request.form.getlist('client_ids') for cid in value.split(',') if cid.strip()))
+    if len(client_ids) == 1:
+        client_id = client_ids[0]
+    upload_service = None
+    if len(client_ids) > 1:
+        upload_service = MultiClientUploadService(
+            client_ids,
+            routing=request.form.get('routing', 'round_robin'),
+            routing_column=request.form.get('routing_column')
+        )
+        error = upload_service.validate_request()
+        if error:
+            return jsonify({'error': error}), 400
+        client_id = ','.join(upload_service.client_ids)
+    elif client_id not in get_config().CLIENT_SHEETS:
+        return jsonify({'error': f'Unknown client ID: {client_id}'}), 400
     
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        
+        # Compression is recognized from the content, whatever the file is called
+        compression = compression_from_header(file.stream.read(4))
+        file.stream.seek(0)
+        if compression == 'zstd' and zstandard is None:
+            return jsonify({'error': 'zstd-compressed uploads are not supported by this server (zstandard is not installed); send gzip or plain CSV'}), 400
+        
+        # An identical file for the same clients and mapping was processed before:
+        # answer from the upload cache instead of saving and processing it again
+        if upload_service:
+            cache_key = UploadCache.make_key(hash_stream(file.stream), upload_service.client_ids, upload_service.routing, upload_service.routing_column, get_config())
+        else:
+            cache_key = UploadCache.make_key(hash_stream(file.stream), [client_id], None, None, get_config())
+        force = request.form.get('force', '').lower() in ('1', 'true', 'yes')
+        cached = None if force else upload_cache.get(cache_key)
+        if cached:
+            job_id = job_store.create_job(cached_upload_status(cached), {'cache_key': cache_key})
+            return jsonify({
+                'message': 'This file was already processed. Returning the earlier result.',
+                'filename': filename,
+                'status': 'cached',
+                'processing_id': job_id,
+                'job_id': job_id,
+                'client_id': client_id,
+                'queue_position': 0,
+                'cached': True
+            }), 200
+        
+        job_id = job_store.create_job({'status': 'queued', 'message': 'Waiting for a free worker...', 'progress': 0, 'filename': filename})
+        
+        # Saved rather than parsed from the request stream: the job runs on a worker
+        # after this request returns, and a retry reads the file again. Prefix with the
+        # job ID so concurrent uploads of the same file don't collide
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
         file.save(file_path)
         
-        # Start background processing
-        thread = threading.Thread(
-            target=process_csv_and_upload, 
-            args=(file_path, filename, client_id)
-        )
-        thread.daemon = True
-        thread.start()
+        # Kept so a failed job can be retried with the same file and clients
+        params = {'file_path': file_path, 'client_id': client_id, 'cache_key': cache_key}
+        if upload_service:
+            params.update({
+                'client_ids': upload_service.client_ids,
+                'routing': upload_service.routing,
+                'routing_column': upload_service.routing_column
+            })
+        job_store.set_params(job_id, params)
+        
+        # Queue background processing on the bounded worker pool
+        queue_position = submit_upload_job(job_id, params)
         
         return jsonify({
-            'message': 'File uploaded successfully. Processing started.', 
+            'message': 'File uploaded successfully. Processing started.' if queue_position == 0 else f'File uploaded successfully. Queued at position {queue_position}.', 
             'filename': filename, 
             'status': 'uploaded', 
-            'processing_id': filename,
-            'client_id': client_id
+            'processing_id': job_id,
+            'job_id': job_id,
+            'client_id': client_id,
+            'queue_position': queue_position
         }), 200
     
     return jsonify({'error': 'Invalid file type'}), 400
 
-@app.route('/api/status/<filename>', methods=['GET'])
-def get_processing_status(filename):
-    global processing_status
-    if filename not in processing_status:
-        return jsonify({'error': 'File not found'}), 404
-    return jsonify(processing_status[filename]), 200
+@app.route('/api/upload/batch', methods=['POST'])
+def upload_batch():
+    """Upload several CSVs, or zip archives of CSVs, for one client as a single upload"""
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'No files selected'}), 400
+    
+    client_id = request.form.get('client_id') or next(iter(get_config().CLIENT_SHEETS), '')  # Default to the first client
+    if client_id not in get_config().CLIENT_SHEETS:
+        return jsonify({'error': f'Unknown client ID: {client_id}'}), 400
+    
+    if len(files) > get_config().BATCH_MAX_FILES:
+        return jsonify({'error': f'Too many files: at most {get_config().BATCH_MAX_FILES} per batch'}), 400
+    
+    invalid = [file.filename for file in files if not (allowed_file(file.filename) or allowed_archive(file.filename))]
+    if invalid:
+        return jsonify({'error': f'Invalid file type: {", ".join(invalid)}'}), 400
+    
+    file_hashes = []
+    for file in files:
+        compression = compression_from_header(file.stream.read(4))
+        file.stream.seek(0)
+        if compression == 'zstd' and zstandard is None:
+            return jsonify({'error': f'{file.filename}: zstd-compressed uploads are not supported by this server (zstandard is not installed); send gzip or plain CSV'}), 400
+        file_hashes.append(hash_stream(file.stream))
+    
+    # The same set of files for the same client gives the same result, in whatever order
+    filenames = [secure_filename(file.filename) for file in files]
+    cache_key = UploadCache.make_key(','.join(sorted(file_hashes)), [client_id], None, None, get_config())
+    force = request.form.get('force', '').lower() in ('1', 'true', 'yes')
+    cached = None if force else upload_cache.get(cache_key)
+    if cached:
+        job_id = job_store.create_job(cached_upload_status(cached), {'cache_key': cache_key})
+        return jsonify({
+            'message': 'These files were already processed. Returning the earlier result.',
+            'filenames': filenames,
+            'status': 'cached',
+            'processing_id': job_id,
+            'job_id': job_id,
+            'client_id': client_id,
+            'queue_position': 0,
+            'cached': True
+        }), 200
+    
+    job_id = job_store.create_job({'status': 'queued', 'message': 'Waiting for a free worker...', 'progress': 0, 'filename': ', '.join(filenames)})
+    
+    # One folder per job; the position prefix keeps the upload order and tells same-named files apart
+    batch_folder = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_batch")
+    os.makedirs(batch_folder, exist_ok=True)
+    file_paths = []
+    for index, (file, filename) in enumerate(zip(files, filenames)):
+        file_path = os.path.join(batch_folder, f"{index:03d}_{filename}")
+        file.save(file_path)
+        file_paths.append(file_path)
+    
+    # Kept so a failed job can be retried with the same files
+    params = {'file_paths': file_paths, 'client_id': client_id, 'cache_key': cache_key}
+    job_store.set_params(job_id, params)
+    queue_position = submit_upload_job(job_id, params)
+    
+    return jsonify({
+        'message': f'{len(files)} files uploaded successfully. Processing started.' if queue_position == 0 else f'{len(files)} files uploaded successfully. Queued at position {queue_position}.',
+        'filenames': filenames,
+        'status': 'uploaded',
+        'processing_id': job_id,
+        'job_id': job_id,
+        'client_id': client_id,
+        'queue_position': queue_position
+    }), 200
+
+def job_status_payload(job_id, status):
+    """Status sent to clients: the stored status plus the queue position of queued jobs"""
+    if status['status'] == 'queued':
+        queue_position = job_executor.get_queue_position(job_id)
+        if queue_position is not None:
+            status = dict(status)
+            status['queue_position'] = queue_position
+            status['message'] = f'Waiting for a free worker (queue position {queue_position})'
+    return status
+
+@app.route('/api/status/<job_id>', methods=['GET'])
+def get_processing_status(job_id):
+    status = job_store.get_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status_payload(job_id, status)), 200
+
+@app.route('/api/retry/<job_id>', methods=['POST'])
+def retry_job(job_id):
+    """Run a failed upload job again, resuming from its last committed write blocks"""
+    status, version = job_store.get_status_version(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if status['status'] != 'failed':
+        return jsonify({'error': f"Only failed jobs can be retried (job is {status['status']})"}), 409
+    if status.get('cached'):
+        return jsonify({'error': 'This job was answered from the upload cache; upload the file again with force=true instead'}), 409
+    
+    params = job_store.get_params(job_id)
+    file_paths = (params.get('file_paths') or [params.get('file_path')]) if params else []
+    if not file_paths or not all(file_path and os.path.exists(file_path) for file_path in file_paths):
+        return jsonify({'error': 'The uploaded file for this job is no longer available'}), 410
+    
+    # Only the request that moves the job out of 'failed' submits it, so
+    # concurrent retries of one job can't run it twice
+    if not job_store.compare_and_set_status(job_id, version, {'status': 'queued', 'message': 'Retrying: waiting for a free worker...', 'progress': 0}):
+        return jsonify({'error': 'This job changed while the retry was being set up (it may already be retrying)'}), 409
+    queue_position = submit_upload_job(job_id, params)
+    return jsonify({
+        'message': 'Retry started.' if queue_position == 0 else f'Retry queued at position {queue_position}.',
+        'status': 'queued',
+        'job_id': job_id,
+        'queue_position': queue_position
+    }), 200
+
+@app.route('/api/status/<job_id>/stream', methods=['GET'])
+def stream_processing_status(job_id):
+    """Push status updates for a job as Server-Sent Events until it finishes"""
+    if job_store.get_status(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        version = None
+        sent = None
+        last_sent_at = time.time()
+        while True:
+            # A queued job's position changes without the job itself being
+            # updated, so queued jobs are looked at again every couple of seconds
+            timeout = config.STATUS_STREAM_HEARTBEAT_SECONDS
+            if sent is not None and sent['status'] == 'queued':
+                timeout = min(timeout, QUEUED_STATUS_POLL_SECONDS)
+            status, version = job_store.wait_for_update(job_id, version, timeout=timeout)
+            if status is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+            
+            payload = job_status_payload(job_id, status)
+            if payload == sent:
+                if time.time() - last_sent_at >= config.STATUS_STREAM_HEARTBEAT_SECONDS:
+                    # Keep the connection open through proxies while nothing changes
+                    yield ": keep-alive\n\n"
+                    last_sent_at = time.time()
+                continue
+            
+            sent = payload
+            last_sent_at = time.time()
+            yield f"data: {json.dumps(payload)}\n\n"
+            if payload['status'] in FINAL_STATUSES:
+                return
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/clients', methods=['GET'])
 def get_available_clients():
     """Get list of available clients"""
     try:
         clients = []
-        for client_id, client_info in config.CLIENT_SHEETS.items():
+        for client_id, client_info in get_config().CLIENT_SHEETS.items():
             clients.append({
                 'id': client_id,
                 'name': client_info['name'],
@@ -156,7 +654,7 @@ def test_master_sheet_connection():
 def test_client_sheet_connection(client_id):
     """Test connection to specific client sheet"""
     try:
-        if client_id not in config.CLIENT_SHEETS:
+        if client_id not in get_config().CLIENT_SHEETS:
             return jsonify({'status': 'error', 'message': f'Unknown client ID: {client_id}'}), 400
         
         sheets_service = GoogleSheetsService(client_id=client_id)
@@ -172,7 +670,7 @@ def test_client_sheet_connection(client_id):
 def get_column_mapping_info(client_id):
     """Get column mapping information for a specific client"""
     try:
-        if client_id not in config.CLIENT_SHEETS:
+        if client_id not in get_config().CLIENT_SHEETS:
             return jsonify({'status': 'error', 'message': f'Unknown client ID: {client_id}'}), 400
         
         sheets_service = GoogleSheetsService(client_id=client_id)
@@ -186,7 +684,15 @@ def get_column_mapping_info(client_id):
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'message': 'Backend is running'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'message': 'Backend is running',
+        'sheets_api': get_request_layer().get_stats()
+    }), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/', methods=['GET'])
 def index():
@@ -194,12 +700,16 @@ def index():
         'message': 'CSV Upload & Master Sheet Backend API', 
         'endpoints': {
             'upload': '/api/upload (POST) - Upload CSV file with client selection',
-            'status': '/api/status/<filename> (GET) - Check processing status',
+            'upload_batch': '/api/upload/batch (POST) - Upload several CSV files or zip archives for one client as a single merged upload',
+            'status': '/api/status/<job_id> (GET) - Check processing status',
+            'status_stream': '/api/status/<job_id>/stream (GET) - Stream processing status (Server-Sent Events)',
+            'retry': '/api/retry/<job_id> (POST) - Retry a failed upload, skipping rows already written',
             'clients': '/api/clients (GET) - Get available clients',
             'column_mapping': '/api/column-mapping/<client_id> (GET) - Get column mapping info',
             'test_master': '/api/test-master-connection (GET) - Test master sheet connection',
             'test_client': '/api/test-client-connection/<client_id> (GET) - Test client sheet connection',
-            'health': '/api/health (GET) - Health check'
+            'health': '/api/health (GET) - Health check',
+            'metrics': '/api/metrics (GET) - Prometheus metrics'
         }
     }), 200
 
@@ -207,12 +717,16 @@ if __name__ == '__main__':
     print("Starting CSV Upload & Master Sheet Backend...")
     print("Available endpoints:")
     print("  - POST /api/upload - Upload CSV file with client selection")
-    print("  - GET  /api/status/<filename> - Check processing status")
+    print("  - POST /api/upload/batch - Upload several CSV files or zip archives as one merged upload")
+    print("  - GET  /api/status/<job_id> - Check processing status")
+    print("  - GET  /api/status/<job_id>/stream - Stream processing status (Server-Sent Events)")
+    print("  - POST /api/retry/<job_id> - Retry a failed upload, skipping rows already written")
     print("  - GET  /api/clients - Get available clients")
     print("  - GET  /api/column-mapping/<client_id> - Get column mapping info")
     print("  - GET  /api/test-master-connection - Test master sheet connection")
     print("  - GET  /api/test-client-connection/<client_id> - Test client sheet connection")
     print("  - GET  /api/health - Health check")
+    print("  - GET  /api/metrics - Prometheus metrics")
     print("  - GET  / - API information")
     print("\nBackend will be available at: http://localhost:5000")
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""End-to-end ingestion benchmark against the in-memory fake Sheets backend.
+
+Generates Crunchbase-style CSVs, pre-loads the master sheet and runs the same
+CSVProcessor -> GoogleSheetsService path as an upload job, reporting wall time
+per stage, peak traced memory, Sheets API calls per 1k rows and request bytes.
+
+Run from backend/:
+
+    python -m benchmarks.ingest_benchmark
+    python -m benchmarks.ingest_benchmark --sizes 1000,10000 --duplicate-ratios 0.2 --baseline benchmarks/results/baseline.json
+
+Results are written as JSON (benchmarks/results/ by default); pass --baseline
+to compare against an earlier run and exit non-zero on regressions.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# The benchmark never talks to Google and must not be throttled by the real quota
+os.environ['SHEETS_BACKEND'] = 'fake'
+os.environ.setdefault('SHEETS_REQUESTS_PER_MINUTE', '1000000')
+os.environ.setdefault('SHEETS_RATE_LIMIT_BURST', '1000000')
+
+from benchmarks.synthetic_data import generate_crunchbase_frame, master_rows_for
+from config import reload_config
+from csv_processor import CSVProcessor
+from fake_sheets import FakeSheetsBackend, FakeSheetsClientPool
+from google_sheets_service import GoogleSheetsService
+from master_sheet_service import MasterSheetService
+from metrics import STAGE_SECONDS, time_stage
+from sheets_client import set_sheets_client_pool
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+CLIENT_HEADERS = ['Date', 'Source', 'Campaign', 'Company Name', 'Website', 'Company Linkedin', 'POCs']
+
+# Metrics compared against a baseline, and whether they count as regressions
+# only beyond the time threshold (timings are noisy) or on any increase
+TIMED_METRICS = ['total_seconds', 'peak_memory_mb']
+EXACT_METRICS = ['api_calls_per_1k_rows', 'bytes_sent']
+
+def time_method(obj, method_name, stage):
+    """Record calls of an instance method the app itself doesn't time as a stage"""
+    original = getattr(obj, method_name)
+
+    @functools.wraps(original)
+    def timed(*args, **kwargs):
+        with time_stage(stage):
+            return original(*args, **kwargs)
+
+    setattr(obj, method_name, timed)
+
+def stage_seconds_since(before):
+    """Seconds per stage recorded in the stage histogram since the totals in before"""
+    seconds = {}
+    for (stage,), (total, count) in STAGE_SECONDS.totals().items():
+        previous_total, previous_count = before.get((stage,), (0.0, 0))
+        if count > previous_count:
+            seconds[stage] = total - previous_total
+    return seconds
+
+def run_scenario(csv_path, rows, master_numbers, background_rows, mode, latency_ms, work_dir, trace_memory):
+    """Run one upload against a fresh fake backend and return its measurements"""
+    run_id = f"bench-{os.getpid()}-{time.monotonic_ns()}"
+    os.environ['MASTER_SHEET_ID'] = f"{run_id}-master"
+    os.environ['MASTER_SHEET_NAME'] = 'Master'
+    os.environ['CLIENT_A_SHEET_ID'] = f"{run_id}-client"
+    os.environ['CLIENT_A_SHEET_NAME'] = 'Sheet1'
+    os.environ['MASTER_INDEX_PATH'] = os.path.join(work_dir, f"{run_id}-index.sqlite3")
+    reload_config()
+
+    backend = FakeSheetsBackend(latency_ms=latency_ms)
+    backend.seed(os.environ['MASTER_SHEET_ID'], 'Master', master_rows_for(master_numbers, background_rows))
+    backend.seed(os.environ['CLIENT_A_SHEET_ID'], 'Sheet1', [CLIENT_HEADERS])
+    set_sheets_client_pool(FakeSheetsClientPool(backend))
+
+    # Stages are timed by the app's own time_stage instrumentation (the same
+    # histogram /api/metrics reports); only the steps it doesn't cover are added here
+    master_service = MasterSheetService()
+    sheets_service = GoogleSheetsService(client_id='client_a', master_service=master_service)
+    time_method(sheets_service, 'get_existing_headers', 'headers')
+    csv_processor = CSVProcessor(csv_path)
+    time_method(csv_processor, 'validate_data', 'validate')
+    stage_totals = STAGE_SECONDS.totals()
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+
+    if mode == 'stream':
+        chunks = csv_processor.iter_chunks(int(os.getenv('CSV_CHUNK_ROWS', 5000)))
+        success, message = sheets_service.append_data_stream(chunks, 'Client A')
+        csv_processor.validate_data()
+    else:
+        success, data, message = csv_processor.process_csv()
+        if success:
+            csv_processor.validate_data()
+            success, message = sheets_service.append_data(data, 'Client A')
+
+    total_seconds = time.perf_counter() - start
+    stage_seconds = stage_seconds_since(stage_totals)
+    peak_memory = None
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    if not success:
+        raise RuntimeError(f"Benchmark upload failed: {message}")
+
+    api_calls = sum(backend.call_counts.values())
+    client_rows = len(backend.get_rows(os.environ['CLIENT_A_SHEET_ID'], 'Sheet1')) - 1
+    return {
+        'total_seconds': round(total_seconds, 4),
+        'stage_seconds': {stage: round(seconds, 4) for stage, seconds in sorted(stage_seconds.items())},
+        'peak_memory_mb': round(peak_memory / (1024 * 1024), 2) if peak_memory is not None else None,
+        'api_calls': api_calls,
+        'api_calls_by_method': dict(sorted(backend.call_counts.items())),
+        'api_calls_per_1k_rows': round(api_calls * 1000 / rows, 3),
+        'bytes_sent': backend.bytes_sent,
+        'rows_written': client_rows,
+        'message': message
+    }
+
+def run_benchmarks(sizes, duplicate_ratios, master_share, background_rows, mode, latency_ms, repeat, trace_memory):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in sizes:
+            for duplicate_ratio in duplicate_ratios:
+                frame, master_numbers = generate_crunchbase_frame(rows, duplicate_ratio, master_share)
+                csv_path = os.path.join(work_dir, f"crunchbase_{rows}_{duplicate_ratio}.csv")
+                frame.to_csv(csv_path, index=False)
+                del frame
+
+                name = f"{mode}-{rows}-dup{duplicate_ratio}"
+                runs = []
+                for _ in range(repeat):
+                    runs.append(run_scenario(csv_path, rows, master_numbers, background_rows, mode, latency_ms, work_dir, False))
+                # Memory is traced in a separate run so tracing overhead stays out of the timings
+                if trace_memory:
+                    memory_run = run_scenario(csv_path, rows, master_numbers, background_rows, mode, latency_ms, work_dir, True)
+                    peak_memory_mb = memory_run['peak_memory_mb']
+                else:
+                    peak_memory_mb = None
+
+                # Report the fastest run; API usage is identical across runs
+                result = min(runs, key=lambda run: run['total_seconds'])
+                result['peak_memory_mb'] = peak_memory_mb
+                result.update({
+                    'name': name,
+                    'mode': mode,
+                    'rows': rows,
+                    'duplicate_ratio': duplicate_ratio,
+                    'file_bytes': os.path.getsize(csv_path)
+                })
+                results.append(result)
+                print(f"{name}: {result['total_seconds']:.3f}s, {result['api_calls']} API calls, "
+                      f"{result['bytes_sent']} bytes sent, {result['rows_written']} rows written")
+    return results
+
+def compare(results, baseline, threshold):
+    """Print metric changes against a baseline run and return the regressions found"""
+    baseline_by_name = {result['name']: result for result in baseline['results']}
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('created_at', 'unknown')}:")
+    for result in results:
+        previous = baseline_by_name.get(result['name'])
+        if previous is None:
+            print(f"  {result['name']}: not in baseline")
+            continue
+        for metric in TIMED_METRICS + EXACT_METRICS:
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            allowed = threshold if metric in TIMED_METRICS else 0
+            flag = ''
+            if change > allowed:
+                flag = '  <-- REGRESSION'
+                regressions.append((result['name'], metric, old, new))
+            print(f"  {result['name']} {metric}: {old} -> {new} ({change:+.1%}){flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark CSV ingestion against the fake Sheets backend')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated row counts')
+    parser.add_argument('--duplicate-ratios', default='0,0.2,0.5', help='comma-separated shares of duplicate rows')
+    parser.add_argument('--master-share', type=float, default=0.5, help='share of duplicates already in the master sheet (rest repeat within the file)')
+    parser.add_argument('--master-rows', type=int, default=10000, help='unrelated rows pre-loaded into the master sheet')
+    parser.add_argument('--mode', choices=['full', 'stream'], default='full', help='whole-file upload or chunked streaming upload')
+    parser.add_argument('--latency-ms', type=float, default=0, help='simulated latency per Sheets API call')
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per scenario (the fastest is reported)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before a timing counts as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    duplicate_ratios = [float(ratio) for ratio in args.duplicate_ratios.split(',')]
+    results = run_benchmarks(sizes, duplicate_ratios, args.master_share, args.master_rows, args.mode,
+                             args.latency_ms, max(1, args.repeat), not args.no_memory)
+
+    created_at = datetime.now()
+    report = {
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': vars(args),
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{created_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) found")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
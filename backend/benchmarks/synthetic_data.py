@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+INDUSTRIES = ['Software', 'FinTech', 'Health Care', 'Artificial Intelligence', 'E-Commerce', 'Biotechnology', 'SaaS', 'Logistics']
+FUNDING_TYPES = ['Seed', 'Pre-Seed', 'Series A', 'Series B', 'Series C', 'Angel', 'Venture - Series Unknown']
+LOCATIONS = ['San Francisco, California, United States', 'London, England, United Kingdom', 'Berlin, Berlin, Germany', 'Bangalore, Karnataka, India', 'New York, New York, United States']
+SUFFIXES = ['Inc.', 'LLC', 'Ltd', 'GmbH', 'Labs', '']
+
+def company_name(i):
+    """Deterministic company name for company number i"""
+    return f"Benchmark Company {i} {SUFFIXES[i % len(SUFFIXES)]}".strip()
+
+def name_variant(name, i):
+    """Spelling of a company name as a different source might write it"""
+    variants = [name.upper(), name.replace(' Inc.', ', Inc'), name.lower(), name + ' ']
+    return variants[i % len(variants)]
+
+def generate_crunchbase_frame(rows, duplicate_ratio=0.0, master_share=0.5, seed=42):
+    """Build a Crunchbase-style export with a known share of duplicates
+
+    Of the duplicate rows, master_share already exist in the master sheet (see
+    master_rows_for) and the rest repeat an earlier row of the same file,
+    spelled differently so normalization is exercised.
+
+    Returns:
+        Tuple[pd.DataFrame, list]: (export, company numbers already in the master sheet)
+    """
+    rng = np.random.default_rng(seed)
+    duplicates = int(rows * duplicate_ratio)
+    in_master = int(duplicates * master_share)
+    repeats = duplicates - in_master
+
+    # Company numbers: fresh companies, then ones already in the master sheet,
+    # then repeats of earlier rows of this file
+    unique = rows - repeats
+    numbers = np.arange(unique)
+    if repeats:
+        numbers = np.concatenate([numbers, rng.choice(unique, size=repeats)])
+    order = rng.permutation(rows)
+    numbers = numbers[order]
+    is_repeat = order >= unique
+
+    names = [
+        name_variant(company_name(n), i) if repeat else company_name(n)
+        for i, (n, repeat) in enumerate(zip(numbers, is_repeat))
+    ]
+    frame = pd.DataFrame({
+        'Organization Name': names,
+        'Organization Name URL': [f"https://www.crunchbase.com/organization/benchmark-company-{n}" for n in numbers],
+        'Website': [f"https://www.company{n}.example.com/" for n in numbers],
+        'LinkedIn': [f"https://www.linkedin.com/company/company-{n}" for n in numbers],
+        'Last Funding Type': rng.choice(FUNDING_TYPES, size=rows),
+        'Industries': rng.choice(INDUSTRIES, size=rows),
+        'Headquarters Location': rng.choice(LOCATIONS, size=rows),
+        'Description': [f"Company {n} builds products for its customers." for n in numbers],
+        'CB Rank (Company)': rng.integers(1, 500000, size=rows),
+        'Number of Employees': rng.choice(['1-10', '11-50', '51-100', '101-250'], size=rows),
+        'Total Funding Amount': rng.integers(100000, 50000000, size=rows)
+    })
+
+    # The first in_master company numbers are the ones pre-loaded into the master sheet
+    return frame, list(range(in_master))
+
+def master_rows_for(company_numbers, background_rows=0, client_name='Benchmark Client', date_added='01/01/25'):
+    """Master sheet rows (header included) for pre-existing companies plus unrelated background rows"""
+    rows = [['Client Name', 'Company', 'Date Added', 'Website', 'LinkedIn']]
+    for n in company_numbers:
+        rows.append([client_name, company_name(n), date_added, f"https://company{n}.example.com", ''])
+    for i in range(background_rows):
+        rows.append([client_name, f"Background Company {i}", date_added, f"https://background{i}.example.com", ''])
+    return rows
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import get_config
+from sheets_client import get_sheet_id, parse_updated_range
+
+def payload_fingerprint(rows):
+    """Row count and hash of the rows of a block write, stored with its checkpoint"""
+    digest = hashlib.sha256(json.dumps(rows, default=str).encode('utf-8')).hexdigest()
+    return f"{len(rows)}:{digest}"
+
+class BlockWriter:
+    """Appends large row sets to a sheet in fixed-size blocks.
+
+    The first block is appended to learn where the table ends, empty rows are
+    inserted right after it for the remaining blocks, and those blocks are then
+    written in place with bounded concurrency. Small writes stay a single append.
+    With a JobCheckpoint each committed block is recorded, so a retried job
+    skips the blocks that already landed instead of writing them again.
+    """
+
+    def __init__(self, pool, block_rows=None, concurrency=None):
+        config = get_config()
+        self.pool = pool
+        self.block_rows = max(1, block_rows or config.WRITE_BLOCK_ROWS)
+        self.concurrency = max(1, concurrency or config.WRITE_CONCURRENCY)
+
+    def write(self, spreadsheet_id, sheet_name, last_column, rows, checkpoint=None):
+        """Append rows after the sheet's last row and return (first_row, last_row)
+
+        The caller should hold spreadsheet_write_lock(spreadsheet_id) so no other
+        write from this host lands between the first block and the inserted rows.
+        """
+        blocks = [rows[i:i + self.block_rows] for i in range(0, len(rows), self.block_rows)]
+        key = checkpoint.write_key(spreadsheet_id, sheet_name) if checkpoint else None
+        state = checkpoint.store.get_write(checkpoint.job_id, key) if checkpoint else None
+        payload = payload_fingerprint(rows) if checkpoint else None
+        if state is not None and state['payload'] not in (None, payload):
+            # The checkpoint belongs to a write of other rows; resuming it would
+            # skip rows that never reached the sheet (checkpoints saved before
+            # fingerprints were recorded have none and are resumed as before)
+            print(f"WARNING: Checkpoint {key} of job {checkpoint.job_id} was recorded for different rows; writing them again")
+            state = None
+
+        if state is None:
+            # Append the first block; the API reports where the table ended
+            with self.pool.checkout() as service:
+                result = service.spreadsheets().values().append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"{sheet_name}!A:{last_column}",
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': blocks[0]}
+                ).execute()
+            start_row, _ = parse_updated_range(result['updates']['updatedRange'])
+            state = {'start_row': start_row, 'reserved': len(blocks) == 1, 'committed': {0}}
+            if checkpoint:
+                checkpoint.store.start_write(checkpoint.job_id, key, start_row, state['committed'], payload)
+
+        start_row = state['start_row']
+        last_row = start_row + len(rows) - 1
+        if len(blocks) == 1:
+            return start_row, last_row
+
+        if not state['reserved']:
+            self._insert_rows(spreadsheet_id, sheet_name, start_row + len(blocks[0]) - 1, len(rows) - len(blocks[0]))
+            if checkpoint:
+                checkpoint.store.mark_reserved(checkpoint.job_id, key)
+
+        pending = [index for index in range(1, len(blocks)) if index not in state['committed']]
+        errors = []
+        errors_lock = threading.Lock()
+
+        def write_block(index):
+            block_start = start_row + index * self.block_rows
+            try:
+                with self.pool.checkout() as service:
+                    service.spreadsheets().values().update(
+                        spreadsheetId=spreadsheet_id,
+                        range=f"{sheet_name}!A{block_start}:{last_column}{block_start + len(blocks[index]) - 1}",
+                        valueInputOption='RAW',
+                        body={'values': blocks[index]}
+                    ).execute()
+                if checkpoint:
+                    checkpoint.store.mark_committed(checkpoint.job_id, key, index)
+            except Exception as e:
+                with errors_lock:
+                    errors.append(f"rows {block_start}-{block_start + len(blocks[index]) - 1}: {str(e)}")
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(pending) or 1)) as executor:
+            list(executor.map(write_block, pending))
+
+        if errors:
+            # Committed blocks stay recorded; a retry writes only the failed ones
+            raise RuntimeError(f"{len(errors)} of {len(blocks)} blocks failed to write ({errors[0]})")
+
+        return start_row, last_row
+
+    def _insert_rows(self, spreadsheet_id, sheet_name, after_row, count):
+        """Insert count empty rows after after_row so in-place writes stay inside the grid"""
+        with self.pool.checkout() as service:
+            sheet_id = get_sheet_id(service, spreadsheet_id, sheet_name)
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'requests': [{
+                    'insertDimension': {
+                        'range': {
+                            'sheetId': sheet_id,
+                            'dimension': 'ROWS',
+                            'startIndex': after_row,
+                            'endIndex': after_row + count
+                        },
+                        'inheritFromBefore': True
+                    }
+                }]}
+            ).execute()
@@ -1,30 +1,65 @@
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from dotenv import load_dotenv, dotenv_values, find_dotenv
 import json
 
+# Variables set in the real environment take precedence over the .env file, also on reload
+_PROCESS_ENV_KEYS = set(os.environ)
+ENV_FILE = find_dotenv()
+
 # Load environment variables
-load_dotenv()
+load_dotenv(ENV_FILE)
+
+# Seconds between checks of the .env and clients files for changes
+CONFIG_RELOAD_CHECK_SECONDS = float(os.getenv('CONFIG_RELOAD_CHECK_SECONDS', 2))
+
+# Row colors in the master sheet for clients that don't set one, assigned in registry order
+CLIENT_COLOR_PALETTE = [
+    {'red': 0.9, 'green': 0.9, 'blue': 1.0},  # Light blue
+    {'red': 1.0, 'green': 0.9, 'blue': 0.9},  # Light red
+    {'red': 0.9, 'green': 1.0, 'blue': 0.9},  # Light green
+    {'red': 1.0, 'green': 1.0, 'blue': 0.85},  # Light yellow
+    {'red': 0.95, 'green': 0.9, 'blue': 1.0},  # Light purple
+    {'red': 1.0, 'green': 0.95, 'blue': 0.85},  # Light orange
+    {'red': 0.85, 'green': 0.97, 'blue': 1.0},  # Light cyan
+    {'red': 0.93, 'green': 0.93, 'blue': 0.93}  # Light gray
+]
+
+# Clients used when no clients file exists; their settings come from CLIENT_A_* / CLIENT_B_* variables
+DEFAULT_CLIENTS = {'client_a': {}, 'client_b': {}}
+
+# Last clients file content that parsed, kept so a bad edit doesn't swap the registry on reload
+_last_valid_clients = None
+
+def parse_color(value):
+    """Sheets API color dict from "#RRGGBB" or {"red", "green", "blue"} (0-1 floats); None if invalid"""
+    if isinstance(value, dict):
+        try:
+            return {channel: float(value.get(channel, 0)) for channel in ('red', 'green', 'blue')}
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, str):
+        hex_value = value.strip().lstrip('#')
+        if len(hex_value) == 6:
+            try:
+                channels = [int(hex_value[i:i + 2], 16) / 255 for i in (0, 2, 4)]
+            except ValueError:
+                return None
+            return {'red': round(channels[0], 3), 'green': round(channels[1], 3), 'blue': round(channels[2], 3)}
+    return None
 
 class Config:
     def __init__(self):
         # Google Sheets Configuration
         self.MASTER_SHEET_ID = os.getenv('MASTER_SHEET_ID')
         self.MASTER_SHEET_NAME = os.getenv('MASTER_SHEET_NAME', 'Master')
-        self.MASTER_SHEET_COLUMNS = ['Client Name', 'Company', 'Date Added']
-        
-        # Client Sheets Configuration
-        self.CLIENT_SHEETS = {
-            'client_a': {
-                'name': os.getenv('CLIENT_A_NAME', 'Client A'),
-                'sheet_id': os.getenv('CLIENT_A_SHEET_ID'),
-                'sheet_name': os.getenv('CLIENT_A_SHEET_NAME', 'Sheet1')
-            },
-            'client_b': {
-                'name': os.getenv('CLIENT_B_NAME', 'Client B'),
-                'sheet_id': os.getenv('CLIENT_B_SHEET_ID'),
-                'sheet_name': os.getenv('CLIENT_B_SHEET_NAME', 'Sheet1')
-            }
-        }
+        # Website and LinkedIn are kept so uploads can be deduplicated on them too
+        self.MASTER_SHEET_COLUMNS = ['Client Name', 'Company', 'Date Added', 'Website', 'LinkedIn']
+        self.MASTER_INDEX_PATH = os.getenv('MASTER_INDEX_PATH', os.path.join('cache', 'master_index.sqlite3'))
+        
+        # Client registry: a JSON file of {client_id: settings}; see clients.example.json
+        self.CLIENTS_CONFIG_FILE = os.getenv('CLIENTS_CONFIG_FILE', 'clients.json')
         
         # Google API Configuration
         self.GOOGLE_SHEETS_CREDENTIALS_FILE = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE', 'credentials.json')
@@ -33,10 +68,75 @@ class Config:
         # Try to get credentials from environment variables first
         self.GOOGLE_SHEETS_CREDENTIALS = self._get_credentials_from_env()
         
+        # Shared Sheets client settings
+        self.SHEETS_DISCOVERY_CACHE_FILE = os.getenv('SHEETS_DISCOVERY_CACHE_FILE', os.path.join('cache', 'sheets_v4_discovery.json'))
+        self.SHEETS_HTTP_TIMEOUT = int(os.getenv('SHEETS_HTTP_TIMEOUT', 60))  # seconds
+        # Idle Sheets API clients (each with its own keep-alive connection) kept for reuse
+        self.SHEETS_CLIENT_POOL_SIZE = int(os.getenv('SHEETS_CLIENT_POOL_SIZE', 16))
+        
+        # Sheets API rate limiting and retries (per process)
+        self.SHEETS_REQUESTS_PER_MINUTE = int(os.getenv('SHEETS_REQUESTS_PER_MINUTE', 60))  # per-user Sheets quota
+        self.SHEETS_RATE_LIMIT_BURST = int(os.getenv('SHEETS_RATE_LIMIT_BURST', 10))
+        self.SHEETS_MAX_RETRIES = int(os.getenv('SHEETS_MAX_RETRIES', 5))
+        self.SHEETS_RETRY_BASE_DELAY = float(os.getenv('SHEETS_RETRY_BASE_DELAY', 1.0))  # seconds
+        self.SHEETS_RETRY_MAX_DELAY = float(os.getenv('SHEETS_RETRY_MAX_DELAY', 64.0))  # seconds
+        
+        # Sheets backend: 'google' for the real API, 'fake' for the in-memory stand-in
+        # used for offline benchmarks and tests (see fake_sheets.py)
+        self.SHEETS_BACKEND = os.getenv('SHEETS_BACKEND', 'google')
+        self.FAKE_SHEETS_LATENCY_MS = float(os.getenv('FAKE_SHEETS_LATENCY_MS', 0))  # per call
+        self.FAKE_SHEETS_ERROR_RATE = float(os.getenv('FAKE_SHEETS_ERROR_RATE', 0))  # share of calls failing with 503
+        self.FAKE_SHEETS_QUOTA_PER_MINUTE = int(os.getenv('FAKE_SHEETS_QUOTA_PER_MINUTE', 0))  # 0 = unlimited, else 429s
+        # Header row for tabs the fake creates on first use, comma-separated
+        self.FAKE_SHEETS_DEFAULT_HEADERS = [h.strip() for h in os.getenv('FAKE_SHEETS_DEFAULT_HEADERS', '').split(',') if h.strip()]
+        
+        # Large appends are split into blocks written with bounded concurrency;
+        # committed blocks are checkpointed so a retried job resumes where it stopped
+        self.WRITE_BLOCK_ROWS = int(os.getenv('WRITE_BLOCK_ROWS', 2000))
+        self.WRITE_CONCURRENCY = int(os.getenv('WRITE_CONCURRENCY', 4))
+        self.WRITE_CHECKPOINT_PATH = os.getenv('WRITE_CHECKPOINT_PATH', os.path.join('cache', 'write_checkpoints.sqlite3'))
+        # Lock files that make processes on this host take turns writing to a spreadsheet (empty: this process only)
+        self.WRITE_LOCK_DIR = os.getenv('WRITE_LOCK_DIR', os.path.join('cache', 'locks'))
+        
+        # Outcomes of finished uploads, keyed by file hash, clients and mapping, so an
+        # identical resubmission is answered without processing the file again
+        self.UPLOAD_CACHE_PATH = os.getenv('UPLOAD_CACHE_PATH', os.path.join('cache', 'upload_cache.sqlite3'))
+        self.UPLOAD_CACHE_TTL_HOURS = float(os.getenv('UPLOAD_CACHE_TTL_HOURS', 168))
+        
+        # Master sheet formatting
+        self.FORMAT_BATCH_MAX_REQUESTS = int(os.getenv('FORMAT_BATCH_MAX_REQUESTS', 500))  # requests per batchUpdate
+        
         # File Upload Configuration
         self.UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
         self.ALLOWED_EXTENSIONS = {'csv'}
         self.MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB default
+        # Cap on an upload's CSV text after decompression (MAX_CONTENT_LENGTH only bounds .gz / .zst uploads as sent)
+        self.CSV_MAX_DATA_MB = float(os.getenv('CSV_MAX_DATA_MB', 1024))
+        
+        # Streaming ingestion: files at or above the threshold are uploaded chunk by chunk
+        self.CSV_STREAMING_THRESHOLD_MB = float(os.getenv('CSV_STREAMING_THRESHOLD_MB', 5))
+        self.CSV_CHUNK_ROWS = int(os.getenv('CSV_CHUNK_ROWS', 5000))
+        
+        # CSV parser for whole-file parses: 'auto' uses the multithreaded pyarrow engine when
+        # installed, 'c' always uses pandas' own parser (chunked parses always do)
+        self.CSV_PARSE_ENGINE = os.getenv('CSV_PARSE_ENGINE', 'auto')
+        # Load only the CSV columns the target sheets' mapping uses
+        self.CSV_PROJECT_COLUMNS = os.getenv('CSV_PROJECT_COLUMNS', 'true').lower() in ('1', 'true', 'yes')
+        
+        # Batch uploads (several CSVs or a zip of CSVs merged into one upload) are parsed
+        # whole, in parallel, so their total decompressed size is capped
+        self.BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 50))
+        self.BATCH_MAX_DATA_MB = float(os.getenv('BATCH_MAX_DATA_MB', 200))
+        self.BATCH_PARSE_WORKERS = int(os.getenv('BATCH_PARSE_WORKERS', 4))
+        
+        # Background jobs: at most JOB_WORKERS uploads run at once, the rest wait in a queue
+        self.JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+        
+        # Job status store shared by all worker processes
+        self.JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', os.path.join('cache', 'jobs.sqlite3'))
+        self.JOB_STATUS_TTL_HOURS = float(os.getenv('JOB_STATUS_TTL_HOURS', 24))
+        self.JOB_STORE_MAX_JOBS = int(os.getenv('JOB_STORE_MAX_JOBS', 1000))
+        self.STATUS_STREAM_HEARTBEAT_SECONDS = int(os.getenv('STATUS_STREAM_HEARTBEAT_SECONDS', 15))
         
         # Column Mapping Configuration
         self.COLUMN_MAPPING = {
@@ -53,8 +153,81 @@ class Config:
         }
         
         # Duplicate Detection Configuration
-        self.DUPLICATE_CHECK_FIELDS = ['Company Name']
-        self.DUPLICATE_MIN_MATCH_SCORE = 1.0  # Exact match only
+        # Sheet columns used as dedupe keys (company name first) and the kind of key each holds
+        self.DUPLICATE_CHECK_FIELDS = ['Company Name', 'Website', 'Company Linkedin']
+        self.DUPLICATE_KEY_TYPES = {
+            'Company Name': 'company',
+            'Website': 'website',
+            'Company Linkedin': 'linkedin'
+        }
+        self.DUPLICATE_HANDLING = os.getenv('DUPLICATE_HANDLING', 'skip')
+        # Names are normalized (case, punctuation, legal suffixes) before matching;
+        # 1.0 requires identical normalized names, lower values allow fuzzy matches
+        self.DUPLICATE_MIN_MATCH_SCORE = float(os.getenv('DUPLICATE_MIN_MATCH_SCORE', 1.0))
+        
+        # Client Sheets Configuration, resolved once per load: {client_id: {'name', 'sheet_id',
+        # 'sheet_name', 'color', 'column_mapping', 'default_values'}}
+        self.CLIENT_SHEETS = self._load_clients()
+        # Master sheet row color per client name
+        self.CLIENT_COLORS = {client['name']: client['color'] for client in self.CLIENT_SHEETS.values()}
+    
+    def _load_clients(self):
+        """Build the client registry from the clients file, or from CLIENT_A_* / CLIENT_B_* variables without one
+        
+        Each client may set name, sheet_id, sheet_name, color, column_mapping and
+        default_values; the mapping and defaults extend the global ones. Unset
+        name, sheet ID and tab fall back to <CLIENT_ID>_NAME, <CLIENT_ID>_SHEET_ID
+        and <CLIENT_ID>_SHEET_NAME.
+        
+        A clients file that can't be parsed (e.g. one caught half-saved) keeps
+        the registry last loaded from it; entries with the wrong shape are skipped.
+        """
+        global _last_valid_clients
+        raw_clients = DEFAULT_CLIENTS
+        if os.path.exists(self.CLIENTS_CONFIG_FILE):
+            try:
+                with open(self.CLIENTS_CONFIG_FILE) as f:
+                    raw_clients = json.load(f)
+                if not isinstance(raw_clients, dict):
+                    raise ValueError("expected an object of client IDs")
+                _last_valid_clients = raw_clients
+            except (OSError, ValueError) as e:
+                if _last_valid_clients is not None:
+                    print(f"WARNING: Ignoring invalid clients file {self.CLIENTS_CONFIG_FILE}, keeping the previous clients: {str(e)}")
+                    raw_clients = _last_valid_clients
+                else:
+                    print(f"WARNING: Ignoring invalid clients file {self.CLIENTS_CONFIG_FILE}: {str(e)}")
+                    raw_clients = DEFAULT_CLIENTS
+        
+        clients = {}
+        for position, (client_id, settings) in enumerate(raw_clients.items()):
+            settings = settings or {}
+            if not isinstance(settings, dict):
+                print(f"WARNING: Skipping client {client_id}: expected an object of settings, got {settings!r}")
+                continue
+            invalid = [key for key in ('column_mapping', 'default_values') if not isinstance(settings.get(key, {}), dict)]
+            invalid += [key for key in ('name', 'sheet_id', 'sheet_name') if not isinstance(settings.get(key, ''), (str, type(None)))]
+            if invalid:
+                print(f"WARNING: Skipping client {client_id}: invalid {', '.join(invalid)}")
+                continue
+            env_prefix = client_id.upper()
+            default_name = client_id.replace('_', ' ').title()
+            
+            color = CLIENT_COLOR_PALETTE[position % len(CLIENT_COLOR_PALETTE)]
+            if 'color' in settings:
+                color = parse_color(settings['color'])
+                if color is None:
+                    print(f"WARNING: Invalid color for client {client_id}: {settings['color']}")
+            
+            clients[client_id] = {
+                'name': settings.get('name') or os.getenv(f'{env_prefix}_NAME', default_name),
+                'sheet_id': settings.get('sheet_id') or os.getenv(f'{env_prefix}_SHEET_ID'),
+                'sheet_name': settings.get('sheet_name') or os.getenv(f'{env_prefix}_SHEET_NAME', 'Sheet1'),
+                'color': color,
+                'column_mapping': {**self.COLUMN_MAPPING, **settings.get('column_mapping', {})},
+                'default_values': {**self.DEFAULT_VALUES, **settings.get('default_values', {})}
+            }
+        return clients
     
     def _get_credentials_from_env(self):
         """Get Google credentials from environment variables if available"""
@@ -65,4 +238,64 @@ class Config:
             except json.JSONDecodeError:
                 print("WARNING: Invalid GOOGLE_SHEETS_CREDENTIALS JSON in environment")
                 return None
-        return None 
\ No newline at end of file
+        return None 
+
+_config = None
+_config_signature = None
+_config_checked_at = 0.0
+_config_lock = threading.Lock()
+
+def _config_files_signature():
+    """Modification times of the files the configuration is read from"""
+    paths = [ENV_FILE, os.getenv('CLIENTS_CONFIG_FILE', 'clients.json')]
+    signature = []
+    for path in paths:
+        if not path:
+            continue
+        try:
+            signature.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            signature.append((path, None))
+    return tuple(signature)
+
+def _reload_env_file():
+    """Apply the current .env values, leaving variables from the real environment alone"""
+    if not ENV_FILE:
+        return
+    for key, value in dotenv_values(ENV_FILE).items():
+        if key not in _PROCESS_ENV_KEYS and value is not None:
+            os.environ[key] = value
+
+def get_config():
+    """Get the shared Config, loading it on first use
+    
+    The .env and clients files are checked for changes at most every
+    CONFIG_RELOAD_CHECK_SECONDS and the Config is rebuilt when one changed, so
+    callers get current settings without re-reading anything per request.
+    The returned Config is shared and must not be modified.
+    """
+    global _config, _config_signature, _config_checked_at
+    config = _config
+    if config is not None and time.monotonic() - _config_checked_at < CONFIG_RELOAD_CHECK_SECONDS:
+        return config
+    
+    with _config_lock:
+        if _config is None or time.monotonic() - _config_checked_at >= CONFIG_RELOAD_CHECK_SECONDS:
+            signature = _config_files_signature()
+            if _config is None or signature != _config_signature:
+                if _config is not None:
+                    print("Configuration files changed, reloading configuration")
+                    _reload_env_file()
+                _config = Config()
+                _config_signature = signature
+            _config_checked_at = time.monotonic()
+        return _config
+
+def reload_config():
+    """Rebuild the shared Config now, e.g. after changing os.environ in-process"""
+    global _config, _config_signature, _config_checked_at
+    with _config_lock:
+        _config_signature = _config_files_signature()
+        _config = Config()
+        _config_checked_at = time.monotonic()
+        return _config
@@ -1,12 +1,352 @@
+import numpy as np
 import pandas as pd
+import gzip
+import io
 import os
-from typing import Tuple, Optional
+import queue
+import shutil
+import struct
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Tuple, Optional
+from metrics import time_stage
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for zstd-compressed uploads
+    zstandard = None
+
+try:
+    import pyarrow
+except ImportError:  # optional: multithreaded whole-file parsing
+    pyarrow = None
+
+# Compressed upload file extensions and the pandas compression each stands for
+COMPRESSION_BY_EXTENSION = {'gz': 'gzip', 'zst': 'zstd'}
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def detect_compression(file_path: str) -> Optional[str]:
+    """'gzip' or 'zstd' when the file starts with that format's magic number, else None"""
+    try:
+        with open(file_path, 'rb') as f:
+            return compression_from_header(f.read(4))
+    except OSError:
+        return None
+
+def compression_from_header(header: bytes) -> Optional[str]:
+    """'gzip' or 'zstd' for data starting with header (at least 4 bytes), else None"""
+    if header.startswith(_GZIP_MAGIC):
+        return 'gzip'
+    if header.startswith(_ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+def strip_compression_extension(filename: str) -> str:
+    """File name without a trailing .gz / .zst, e.g. "export.csv.gz" -> "export.csv" """
+    base, _, extension = filename.rpartition('.')
+    if base and extension.lower() in COMPRESSION_BY_EXTENSION:
+        return base
+    return filename
+
+class DataTooLargeError(ValueError):
+    """Raised while parsing once a CSV's text is larger than its size limit"""
+
+class DataBudget:
+    """Bytes of CSV text that may still be read, shared by the files of one upload"""
+    
+    def __init__(self, max_bytes: float):
+        self.max_bytes = max_bytes
+        self._read = 0
+        self._lock = threading.Lock()
+    
+    def consume(self, n_bytes: int):
+        """Count n_bytes as read; raises DataTooLargeError once the total is over the limit"""
+        with self._lock:
+            self._read += n_bytes
+            over = self._read > self.max_bytes
+        if over:
+            raise self.error()
+    
+    def error(self) -> DataTooLargeError:
+        return DataTooLargeError(
+            f"CSV data is larger than the {self.max_bytes / (1024 * 1024):.0f}MB limit after decompression"
+        )
+
+class _BudgetedStream(io.RawIOBase):
+    """Readable stream over source that charges every byte read to a DataBudget"""
+    
+    def __init__(self, source, budget: DataBudget):
+        self._source = source
+        self._budget = budget
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._source.read(len(buffer))
+        self._budget.consume(len(data))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def close(self):
+        if not self.closed:
+            self._source.close()
+        super().close()
+
+# Longest text Google Sheets accepts in one cell
+SHEETS_CELL_LIMIT = 50000
+
+def _smallest_distinct(values: np.ndarray, k: int) -> np.ndarray:
+    """The k smallest distinct values, sorted, without sorting the whole array"""
+    candidates = min(len(values), 4 * k)
+    if candidates < len(values):
+        smallest = np.unique(np.partition(values, candidates - 1)[:candidates])
+        # Enough distinct values among the smallest candidates: they are the overall smallest
+        if len(smallest) >= k:
+            return smallest[:k]
+    return np.unique(values)[:k]
+
+class DataProfile:
+    """Per-column statistics gathered while the CSV is parsed.
+    
+    Each parsed frame (the whole file, or one chunk when streaming) is folded
+    in once: a single length computation per column yields the max length,
+    the empty-cell count and the cells over the Sheets limit. Distinct counts
+    are estimated with a k-minimum-values sketch of the value hashes, which
+    stays exact below sketch_size distinct values and combines across chunks.
+    """
+    
+    def __init__(self, sketch_size: int = 1024, header: Optional[list] = None):
+        self.sketch_size = sketch_size
+        self.rows = 0
+        self.rows_over_limit = 0
+        self.columns = {}
+        # Every column of the CSV header when only some were loaded (see
+        # CSVProcessor.select_columns); None when the loaded columns are all of them
+        self.header = header
+    
+    def update(self, frame: pd.DataFrame):
+        """Add a cleaned frame (missing values already replaced by '') to the profile"""
+        self.rows += len(frame)
+        over_limit = np.zeros(len(frame), dtype=bool)
+        
+        for column in frame.columns:
+            stats = self.columns.setdefault(column, {
+                'max_length': 0,
+                'empty': 0,
+                'sketch': np.empty(0, dtype=np.uint64)
+            })
+            values = frame[column]
+            lengths = values.str.len().to_numpy(dtype=np.int64)
+            if len(lengths) == 0:
+                continue
+            
+            stats['max_length'] = max(stats['max_length'], int(lengths.max()))
+            filled = lengths > 0
+            stats['empty'] += int(len(lengths) - filled.sum())
+            over_limit |= lengths > SHEETS_CELL_LIMIT
+            
+            hashes = pd.util.hash_array(values.to_numpy(dtype=object), categorize=False)[filled]
+            stats['sketch'] = _smallest_distinct(np.concatenate([stats['sketch'], hashes]), self.sketch_size)
+        
+        self.rows_over_limit += int(over_limit.sum())
+    
+    def merge(self, other: 'DataProfile'):
+        """Fold in the profile of another table whose rows are stacked under this one's
+        
+        Cells of columns that only one of the tables has count as empty for the
+        other's rows, as they are once the tables are concatenated.
+        """
+        if self.header is not None or other.header is not None:
+            self.header = list(dict.fromkeys(self.file_columns() + other.file_columns()))
+        
+        for column, stats in self.columns.items():
+            if column not in other.columns:
+                stats['empty'] += other.rows
+        
+        for column, other_stats in other.columns.items():
+            stats = self.columns.setdefault(column, {
+                'max_length': 0,
+                'empty': self.rows,
+                'sketch': np.empty(0, dtype=np.uint64)
+            })
+            stats['max_length'] = max(stats['max_length'], other_stats['max_length'])
+            stats['empty'] += other_stats['empty']
+            stats['sketch'] = _smallest_distinct(np.concatenate([stats['sketch'], other_stats['sketch']]), self.sketch_size)
+        
+        self.rows += other.rows
+        self.rows_over_limit += other.rows_over_limit
+    
+    def distinct_estimate(self, column: str) -> int:
+        """Estimated number of distinct non-empty values in a column"""
+        sketch = self.columns[column]['sketch']
+        if len(sketch) < self.sketch_size:
+            return len(sketch)
+        # The k-th smallest of n uniform hashes sits near k / n of the hash range
+        return int((self.sketch_size - 1) * 2.0 ** 64 / float(sketch[-1]))
+    
+    def file_columns(self) -> list:
+        """Columns of the CSV itself, loaded or not"""
+        return list(self.header) if self.header is not None else list(self.columns)
+    
+    def summary(self) -> dict:
+        """Row and column counts plus the per-column profile, for data info
+        
+        'columns' counts the CSV's columns; 'loaded_columns' only the ones parsed
+        and profiled, which are fewer when the upload was projected.
+        """
+        return {
+            'rows': self.rows,
+            'columns': len(self.file_columns()),
+            'column_names': self.file_columns(),
+            'loaded_columns': len(self.columns),
+            'loaded_column_names': list(self.columns),
+            'rows_over_cell_limit': self.rows_over_limit,
+            'column_profile': self.to_dict()
+        }
+    
+    def issues(self) -> list:
+        """Problems the profiled data may cause in Google Sheets"""
+        issues = []
+        
+        # Check for very long text that might exceed Google Sheets limits
+        for col, stats in self.columns.items():
+            if stats['max_length'] > SHEETS_CELL_LIMIT:
+                issues.append(f"Column '{col}' contains text longer than 50,000 characters")
+        if self.rows_over_limit:
+            issues.append(f"{self.rows_over_limit} rows have a cell longer than 50,000 characters")
+        
+        # Check for very wide data
+        if len(self.file_columns()) > 26:  # More than A-Z columns
+            issues.append("CSV has more than 26 columns, which might cause display issues")
+        
+        # Check for very long data
+        if self.rows > 100000:  # More than 100k rows
+            issues.append("CSV has more than 100,000 rows, which might be slow to process")
+        
+        return issues
+    
+    def to_dict(self) -> dict:
+        """{column: {'max_length', 'empty', 'distinct'}} for reporting"""
+        return {
+            column: {
+                'max_length': stats['max_length'],
+                'empty': stats['empty'],
+                'distinct': self.distinct_estimate(column)
+            }
+            for column, stats in self.columns.items()
+        }
 
 class CSVProcessor:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, engine: str = 'auto', max_data_bytes: Optional[float] = None):
         self.file_path = file_path
+        self.engine = engine
         self.data = None
         self.error = None
+        
+        # Cap on the CSV text parsed, checked while reading: the request size limit
+        # only bounds the compressed size of .gz / .zst uploads. None means no cap.
+        self.data_budget = DataBudget(max_data_bytes) if max_data_bytes is not None else None
+        
+        # CSV columns to load (see select_columns); None loads every column
+        self.columns = None
+        
+        # Compressed files are decompressed on the fly while pandas parses them
+        self.compression = detect_compression(file_path)
+        
+        # Rows read so far in streaming mode, where self.data is never fully loaded
+        self.rows_read = 0
+        # Filled in while parsing; feeds validate_data and get_data_info without rescanning
+        self.profile = DataProfile()
+        self._file_size = None
+    
+    def data_size(self) -> float:
+        """Size of the CSV text in bytes, which for compressed files is the decompressed size
+        
+        gzip stores it (modulo 4GB) in its trailer and zstd usually in its frame
+        header. When it is unknown the file is assumed to be huge, so callers
+        deciding between a full and a streamed parse pick streaming.
+        """
+        file_size = self.file_size()
+        if self.compression == 'gzip':
+            try:
+                with open(self.file_path, 'rb') as f:
+                    f.seek(-4, os.SEEK_END)
+                    uncompressed_size = struct.unpack('<I', f.read(4))[0]
+            except (OSError, struct.error):
+                return float('inf')
+            # The trailer wraps around at 4GB, but a CSV is never smaller than its gzip
+            return uncompressed_size if uncompressed_size >= file_size else float('inf')
+        if self.compression == 'zstd':
+            if zstandard is None:
+                return float('inf')
+            try:
+                with open(self.file_path, 'rb') as f:
+                    content_size = zstandard.frame_content_size(f.read(18))
+            except (OSError, zstandard.ZstdError):
+                return float('inf')
+            return content_size if content_size >= 0 else float('inf')
+        return file_size
+    
+    def file_size(self) -> int:
+        """Size of the file on disk in bytes (read once)"""
+        if self._file_size is None:
+            self._file_size = os.path.getsize(self.file_path)
+        return self._file_size
+    
+    def read_header(self) -> list:
+        """Column names from the CSV's header row, without parsing any data"""
+        return pd.read_csv(self.file_path, nrows=0, compression=self.compression).columns.tolist()
+    
+    def _open_data(self):
+        """What pd.read_csv reads: the path, or with a data budget a stream that enforces it
+        
+        Returns:
+            Tuple: (path or stream, compression for pandas)
+        """
+        if self.data_budget is None:
+            return self.file_path, self.compression
+        # A size the file declares is checked up front, so a streamed upload
+        # doesn't write its first chunks before running into the limit
+        if self.data_size() != float('inf') and self.data_size() > self.data_budget.max_bytes:
+            raise self.data_budget.error()
+        if self.compression == 'gzip':
+            source = gzip.open(self.file_path, 'rb')
+        elif self.compression == 'zstd':
+            source = zstandard.ZstdDecompressor().stream_reader(open(self.file_path, 'rb'), closefd=True)
+        else:
+            source = open(self.file_path, 'rb')
+        return io.BufferedReader(_BudgetedStream(source, self.data_budget)), None
+    
+    def select_columns(self, columns: Optional[list]):
+        """Load only these header columns, so parse time and memory follow the columns used
+        
+        Columns not in the file are ignored; None (or nothing left) loads every column.
+        """
+        if columns is None:
+            self.columns = None
+            self.profile.header = None
+            return
+        wanted = set(columns)
+        header = self.read_header()
+        self.columns = [column for column in header if column in wanted] or None
+        # The full width is still reported (see DataProfile.summary)
+        self.profile.header = header if self.columns else None
+    
+    def _parse_engine(self) -> str:
+        """pandas engine for whole-file parses: pyarrow when requested (or 'auto') and installed"""
+        if self.engine in ('auto', 'pyarrow') and pyarrow is not None:
+            return 'pyarrow'
+        return 'c'
+    
+    def _check_compression_support(self) -> Optional[str]:
+        """Error message when the file's compression can't be read here, else None"""
+        if self.compression == 'zstd' and zstandard is None:
+            return "zstd-compressed CSVs need the zstandard package (pip install zstandard)"
+        return None
     
     def process_csv(self) -> Tuple[bool, Optional[pd.DataFrame], str]:
         """
@@ -20,8 +360,24 @@ class CSVProcessor:
             if not os.path.exists(self.file_path):
                 return False, None, f"File not found: {self.file_path}"
             
-            # Read CSV file
-            self.data = pd.read_csv(self.file_path)
+            error = self._check_compression_support()
+            if error:
+                return False, None, error
+            
+            # Read CSV file; every column as text, as it is written to the sheets as text
+            source, compression = self._open_data()
+            try:
+                with time_stage('csv_parse'):
+                    self.data = pd.read_csv(
+                        source,
+                        dtype=str,
+                        usecols=self.columns,
+                        compression=compression,
+                        engine=self._parse_engine()
+                    )
+            finally:
+                if source is not self.file_path:
+                    source.close()
             
             # Basic validation
             if self.data.empty:
@@ -35,6 +391,9 @@ class CSVProcessor:
             
             return True, self.data, f"CSV processed successfully: {rows} rows, {cols} columns"
             
+        except DataTooLargeError as e:
+            self.data = None
+            return False, None, str(e)
         except pd.errors.EmptyDataError:
             return False, None, "CSV file is empty or corrupted"
         except pd.errors.ParserError as e:
@@ -47,22 +406,76 @@ class CSVProcessor:
         if self.data is None:
             return
         
-        # Remove completely empty rows
-        self.data = self.data.dropna(how='all')
+        with time_stage('csv_clean'):
+            # Remove completely empty rows
+            self.data = self.data.dropna(how='all')
+            
+            # Remove completely empty columns
+            self.data = self.data.dropna(axis=1, how='all')
+            
+            # Fill NaN values with empty string for better Google Sheets compatibility;
+            # columns were read as text, so no further conversion is needed
+            self.data = self.data.fillna('')
+            
+            # Clean column names (remove special characters that might cause issues)
+            self.data.columns = [str(col).strip().replace('\n', ' ').replace('\r', ' ') 
+                               for col in self.data.columns]
+        
+        with time_stage('csv_profile'):
+            self.profile = DataProfile(header=self.profile.header)
+            self.profile.update(self.data)
+    
+    def iter_chunks(self, chunk_rows: int, prefetch: bool = True) -> Iterator[pd.DataFrame]:
+        """
+        Stream the CSV file as cleaned DataFrame chunks of at most chunk_rows rows
         
-        # Remove completely empty columns
-        self.data = self.data.dropna(axis=1, how='all')
+        Every column is read as text, so no per-column string conversion is needed
+        and dtypes stay consistent across chunks. With prefetch enabled the next
+        chunk is parsed in a background thread while the caller uploads the current one.
         
-        # Fill NaN values with empty string for better Google Sheets compatibility
-        self.data = self.data.fillna('')
+        Raises the same pandas errors as process_csv; they surface when iterated.
+        """
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"File not found: {self.file_path}")
         
-        # Convert all data to string to avoid Google Sheets formatting issues
-        for col in self.data.columns:
-            self.data[col] = self.data[col].astype(str)
+        error = self._check_compression_support()
+        if error:
+            raise ValueError(error)
         
-        # Clean column names (remove special characters that might cause issues)
-        self.data.columns = [str(col).strip().replace('\n', ' ').replace('\r', ' ') 
-                           for col in self.data.columns]
+        chunks = self._read_chunks(chunk_rows)
+        return _prefetch(chunks) if prefetch else chunks
+    
+    def _read_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        source, compression = self._open_data()
+        try:
+            reader = pd.read_csv(source, dtype=str, usecols=self.columns, chunksize=chunk_rows, compression=compression)
+            with reader:
+                while True:
+                    with time_stage('csv_parse'):
+                        chunk = next(reader, None)
+                    if chunk is None:
+                        break
+                    
+                    chunk = self._clean_chunk(chunk)
+                    if chunk.empty:
+                        continue
+                    
+                    self.rows_read += len(chunk)
+                    with time_stage('csv_profile'):
+                        self.profile.update(chunk)
+                    
+                    yield chunk
+        finally:
+            if source is not self.file_path:
+                source.close()
+    
+    def _clean_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Clean one streamed chunk (columns are kept even if empty within the chunk)"""
+        with time_stage('csv_clean'):
+            chunk = chunk.dropna(how='all').fillna('')
+            chunk.columns = [str(col).strip().replace('\n', ' ').replace('\r', ' ')
+                             for col in chunk.columns]
+            return chunk
     
     def get_sample_data(self, n_rows: int = 5) -> pd.DataFrame:
         """Get a sample of the data for preview"""
@@ -71,36 +484,208 @@ class CSVProcessor:
         return self.data.head(n_rows)
     
     def get_data_info(self) -> dict:
-        """Get information about the processed data"""
+        """Get information about the processed data, from the profile gathered while parsing"""
+        if self.data is None and not self.rows_read:
+            return {}
+        
+        return {**self.profile.summary(), 'file_size_mb': round(self.file_size() / (1024 * 1024), 2)}
+    
+    def validate_data(self) -> Tuple[bool, list]:
+        """Validate the data and return any issues found"""
+        if self.data is None and not self.rows_read:
+            return False, ["No data loaded"]
+        
+        issues = self.profile.issues()
+        return len(issues) == 0, issues 
+
+class CSVBatch:
+    """Several CSV files parsed side by side and handled as one table.
+    
+    Each file gets its own CSVProcessor so the files can be parsed in parallel;
+    the parsed frames are then stacked (columns are the union of the files'
+    columns, missing cells empty) and their profiles merged, so data info and
+    validation cover the whole batch without another pass over the rows.
+    Batches are always parsed whole: there is no streaming mode.
+    """
+    
+    def __init__(self, file_paths: list, engine: str = 'auto', max_workers: int = 4, max_data_bytes: Optional[float] = None):
+        self.processors = [CSVProcessor(file_path, engine=engine) for file_path in file_paths]
+        # One cap for the CSV text of all the files together
+        if max_data_bytes is not None:
+            budget = DataBudget(max_data_bytes)
+            for processor in self.processors:
+                processor.data_budget = budget
+        self.max_workers = max(1, max_workers)
+        self.data = None
+        self.profile = DataProfile()
+    
+    @property
+    def rows_read(self) -> int:
+        """Rows in the combined table"""
+        return self.profile.rows
+    
+    def data_size(self) -> float:
+        """Total size of the CSV text of every file (inf if any file's size is unknown)"""
+        return sum(processor.data_size() for processor in self.processors)
+    
+    def file_size(self) -> int:
+        """Total size of the files on disk in bytes"""
+        return sum(processor.file_size() for processor in self.processors)
+    
+    def read_header(self) -> list:
+        """Union of the files' header columns, in order of first appearance"""
+        columns = []
+        for processor in self.processors:
+            try:
+                columns.extend(processor.read_header())
+            except Exception as e:
+                raise ValueError(f"{os.path.basename(processor.file_path)}: {str(e)}") from e
+        return list(dict.fromkeys(columns))
+    
+    def select_columns(self, columns: Optional[list]):
+        """Load only these columns from every file (see CSVProcessor.select_columns)"""
+        for processor in self.processors:
+            processor.select_columns(columns)
+    
+    def process_csv(self) -> Tuple[bool, Optional[pd.DataFrame], str]:
+        """
+        Parse every file in parallel and stack them into one DataFrame
+        
+        A file that fails to parse fails the whole batch, so a batch is
+        uploaded completely or not at all.
+        
+        Returns:
+            Tuple[bool, Optional[pd.DataFrame], str]: (success, data, message)
+        """
+        if not self.processors:
+            return False, None, "No CSV files to process"
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.processors))) as executor:
+            results = list(executor.map(lambda processor: processor.process_csv(), self.processors))
+        
+        errors = [
+            f"{os.path.basename(processor.file_path)}: {message}"
+            for processor, (success, _, message) in zip(self.processors, results)
+            if not success
+        ]
+        if errors:
+            return False, None, "; ".join(errors)
+        
+        # A fresh index keeps row labels unique across files (write checkpoints rely on them)
+        with time_stage('csv_combine'):
+            frames = [data for _, data, _ in results]
+            del results
+            self.data = pd.concat(frames, ignore_index=True, sort=False).fillna('')
+            
+            # Only the combined frame is kept, so a batch holds its rows in memory once
+            del frames
+            for processor in self.processors:
+                processor.data = None
+                self.profile.merge(processor.profile)
+        
+        rows, cols = self.data.shape
+        return True, self.data, f"{len(self.processors)} CSV files processed successfully: {rows} rows, {cols} columns"
+    
+    def get_data_info(self) -> dict:
+        """Data info of the combined table plus the number of files in the batch"""
         if self.data is None:
             return {}
         
         return {
-            'rows': len(self.data),
-            'columns': len(self.data.columns),
-            'column_names': list(self.data.columns),
-            'file_size_mb': round(os.path.getsize(self.file_path) / (1024 * 1024), 2)
+            **self.profile.summary(),
+            'file_size_mb': round(self.file_size() / (1024 * 1024), 2),
+            'files': len(self.processors)
         }
     
     def validate_data(self) -> Tuple[bool, list]:
-        """Validate the data and return any issues found"""
-        issues = []
-        
+        """Validate the combined table and return any issues found"""
         if self.data is None:
             return False, ["No data loaded"]
         
-        # Check for very long text that might exceed Google Sheets limits
-        for col in self.data.columns:
-            max_length = self.data[col].str.len().max()
-            if max_length > 50000:  # Google Sheets cell limit is ~50k characters
-                issues.append(f"Column '{col}' contains text longer than 50,000 characters")
-        
-        # Check for very wide data
-        if len(self.data.columns) > 26:  # More than A-Z columns
-            issues.append("CSV has more than 26 columns, which might cause display issues")
+        issues = self.profile.issues()
+        return len(issues) == 0, issues
+
+def extract_csv_archive(archive_path: str, target_dir: str, max_bytes: float) -> list:
+    """
+    Extract the CSV files (plain or compressed) of a zip archive into target_dir
+    
+    Directories, hidden files and other file types are skipped. Members are
+    written flat, prefixed with their position in the archive, so names never
+    collide or escape target_dir. The archive is rejected before anything is
+    written if its CSVs add up to more than max_bytes uncompressed.
+    
+    Returns:
+        list: paths of the extracted files, in archive order
+    
+    Raises:
+        ValueError: when the archive is not a zip or is too large
+    """
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile:
+        raise ValueError(f"{os.path.basename(archive_path)} is not a valid zip archive")
+    
+    with archive:
+        members = []
+        for member in archive.infolist():
+            name = os.path.basename(member.filename.replace('\\', '/'))
+            if member.is_dir() or not name or name.startswith('.') or member.filename.startswith('__MACOSX/'):
+                continue
+            if strip_compression_extension(name).lower().endswith('.csv'):
+                members.append((member, name))
         
-        # Check for very long data
-        if len(self.data) > 100000:  # More than 100k rows
-            issues.append("CSV has more than 100,000 rows, which might be slow to process")
+        total_bytes = sum(member.file_size for member, _ in members)
+        if total_bytes > max_bytes:
+            raise ValueError(
+                f"{os.path.basename(archive_path)} holds {total_bytes / (1024 * 1024):.1f}MB of CSV data, "
+                f"more than the {max_bytes / (1024 * 1024):.0f}MB limit"
+            )
         
-        return len(issues) == 0, issues 
\ No newline at end of file
+        os.makedirs(target_dir, exist_ok=True)
+        file_paths = []
+        for index, (member, name) in enumerate(members):
+            # Reads stop at the size recorded for the member, so the check above holds
+            file_path = os.path.join(target_dir, f"{index:03d}_{name}")
+            with archive.open(member) as source, open(file_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            file_paths.append(file_path)
+        return file_paths
+
+_END_OF_STREAM = object()
+
+def _prefetch(iterator: Iterator, depth: int = 1) -> Iterator:
+    """Run iterator in a background thread, keeping up to depth items ready ahead of the consumer"""
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    
+    def put(item):
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_END_OF_STREAM)
+        except Exception as e:
+            put(e)
+    
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,210 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+import pandas as pd
+
+# Legal-form words dropped from the end of company names before comparing
+LEGAL_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'llc', 'llp', 'lp',
+    'ltd', 'limited', 'plc', 'gmbh', 'ag', 'sa', 'sas', 'sarl', 'srl', 'spa', 'bv', 'nv',
+    'oy', 'ab', 'as', 'pty', 'pte', 'pvt', 'private', 'kk', 'kg'
+}
+
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+_URL_SCHEME = re.compile(r'^[a-z][a-z0-9+.-]*://')
+_LINKEDIN_PATH = re.compile(r'linkedin\.com/(?:company|school|showcase|in)/([^/?#\s]+)')
+
+def normalize_company_name(name):
+    """Normalize a company name for duplicate matching
+
+    Lowercases, strips accents and punctuation, and drops trailing legal
+    suffixes, so "Acme Inc.", "ACME, Inc" and "Acme" all become "acme".
+    """
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    text = text.lower().replace('&', ' and ')
+    # Join dotted abbreviations such as "S.A." or "L.L.C." before splitting
+    text = re.sub(r'\b(?:[a-z]\.){2,}', lambda m: m.group(0).replace('.', ''), text)
+    tokens = _NON_ALPHANUMERIC.sub(' ', text).split()
+
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+
+    return ' '.join(tokens)
+
+def normalize_website_domain(url):
+    """Reduce a website URL to its bare domain, e.g. "https://www.acme.com/about" -> "acme.com"
+
+    Returns an empty string when the value does not look like a domain.
+    """
+    text = _URL_SCHEME.sub('', str(url).strip().lower())
+    domain = re.split(r'[/?#:\s]', text, maxsplit=1)[0].rstrip('.')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain if '.' in domain else ''
+
+def normalize_linkedin_slug(url):
+    """Reduce a LinkedIn URL to its page slug, e.g. "linkedin.com/company/acme-inc/" -> "acme-inc"
+
+    Returns an empty string when the value is not a LinkedIn page URL.
+    """
+    match = _LINKEDIN_PATH.search(str(url).strip().lower())
+    return match.group(1) if match else ''
+
+# Normalizer for each kind of dedupe key
+KEY_NORMALIZERS = {
+    'company': normalize_company_name,
+    'website': normalize_website_domain,
+    'linkedin': normalize_linkedin_slug
+}
+
+def normalize_keys(values, key_type):
+    """Normalize a pandas Series of raw values into dedupe keys, normalizing each distinct value once"""
+    normalizer = KEY_NORMALIZERS[key_type]
+    codes, uniques = values.factorize()
+    normalized = [normalizer(value) for value in uniques]
+    return pd.Series([normalized[code] if code >= 0 else '' for code in codes], index=values.index, dtype=object)
+
+class RunKeyRegistry:
+    """Dedupe keys claimed by the uploads of one batch run.
+
+    Files of a run may be uploaded concurrently, so a company that appears in
+    two of them could pass the master index check in both before either is
+    written. Each upload claims the keys of its new rows here; rows with a key
+    that another upload already claimed count as duplicates. An upload that
+    fails before writing its rows releases its claims, so the companies can
+    still be added by another file of the run. Once rows are in the master
+    sheet the index catches them, so their keys are forgotten to keep a
+    long-running (watch mode) registry small.
+    """
+
+    def __init__(self):
+        self._keys = defaultdict(set)
+        self._lock = threading.Lock()
+        self._forgotten = 0
+
+    @property
+    def generation(self):
+        """Number of forget() calls so far
+
+        An upload that checked the master index before a forget() may have
+        missed rows written by the upload that forgot them, and should check
+        the keys it claimed against the index again.
+        """
+        with self._lock:
+            return self._forgotten
+
+    def claim(self, key_columns, duplicate_mask):
+        """Claim the keys of the rows not in duplicate_mask
+
+        Args:
+            key_columns: {key type: Series of normalized keys}, as built for detect_duplicates
+            duplicate_mask: boolean Series of rows already known to be duplicates
+
+        Returns:
+            Tuple[pd.Series, dict]: (duplicate_mask plus the rows whose keys were claimed
+            earlier in the run, {key type: set of keys claimed by this call})
+        """
+        with self._lock:
+            claimed_mask = duplicate_mask.copy()
+            for key_type, keys in key_columns.items():
+                claimed_mask |= keys.isin(self._keys[key_type])
+            claimed = {}
+            for key_type, keys in key_columns.items():
+                claimed[key_type] = {key for key in keys[~claimed_mask] if key}
+                self._keys[key_type].update(claimed[key_type])
+            return claimed_mask, claimed
+
+    def release(self, claimed):
+        """Give back keys returned by claim whose rows were never written"""
+        with self._lock:
+            for key_type, keys in claimed.items():
+                self._keys[key_type].difference_update(keys)
+
+    def forget(self, claimed):
+        """Drop keys returned by claim whose rows are now in the master sheet and its index"""
+        with self._lock:
+            for key_type, keys in claimed.items():
+                self._keys[key_type].difference_update(keys)
+            self._forgotten += 1
+
+def _trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CompanyMatcher:
+    """Finds the best matching known company name for a normalized name.
+
+    Matching is exact when min_score is 1.0. Below that, names are scored by
+    the Jaccard similarity of their character trigrams, and candidates are
+    found through a trigram inverted index probed only with the query's rarest
+    trigrams (prefix filtering), so a lookup touches a small fraction of the
+    known names instead of all of them.
+    """
+
+    def __init__(self, min_score=1.0):
+        self.min_score = min_score
+        self._names = []
+        self._name_ids = {}
+        self._gram_sets = []
+        self._postings = defaultdict(list)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, normalized):
+        """Add a normalized company name to the matcher"""
+        if not normalized or normalized in self._name_ids:
+            return
+
+        name_id = len(self._names)
+        self._names.append(normalized)
+        self._name_ids[normalized] = name_id
+
+        if self.min_score < 1.0:
+            grams = _trigrams(normalized)
+            self._gram_sets.append(grams)
+            for gram in grams:
+                self._postings[gram].append(name_id)
+
+    def add_all(self, normalized_names):
+        for normalized in normalized_names:
+            self.add(normalized)
+
+    def find_match(self, normalized):
+        """Return (matched name, score) for the best match at or above min_score, or (None, 0.0)"""
+        if not normalized:
+            return None, 0.0
+
+        if normalized in self._name_ids:
+            return normalized, 1.0
+
+        if self.min_score >= 1.0:
+            return None, 0.0
+
+        grams = _trigrams(normalized)
+        required_overlap = math.ceil(self.min_score * len(grams))
+
+        # Any name sharing required_overlap trigrams must share one of these
+        probe_count = len(grams) - required_overlap + 1
+        probe_grams = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))[:probe_count]
+
+        candidates = set()
+        for gram in probe_grams:
+            candidates.update(self._postings.get(gram, ()))
+
+        best_name, best_score = None, 0.0
+        min_size = self.min_score * len(grams)
+        max_size = len(grams) / self.min_score if self.min_score > 0 else float('inf')
+        for name_id in candidates:
+            candidate_grams = self._gram_sets[name_id]
+            # Jaccard >= t is impossible when the set sizes differ too much
+            if not min_size <= len(candidate_grams) <= max_size:
+                continue
+            overlap = len(grams & candidate_grams)
+            score = overlap / (len(grams) + len(candidate_grams) - overlap)
+            if score >= self.min_score and score > best_score:
+                best_name, best_score = self._names[name_id], score
+
+        return best_name, best_score
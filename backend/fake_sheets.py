@@ -0,0 +1,304 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+import httplib2
+from googleapiclient.errors import HttpError
+from config import get_config
+from rate_limiter import get_request_layer, is_idempotent
+
+_CELL = re.compile(r'^\$?([A-Z]*)\$?(\d*)$')
+
+def column_index(letters):
+    """0-based column index for column letters ("A" -> 0, "AA" -> 26)"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+def column_letter(index):
+    """Column letters for a 0-based column index"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def parse_a1_range(range_name):
+    """Split an A1 range into (sheet, first_row, first_col, last_row, last_col), 0-based
+
+    Open-ended bounds ("A:C", "A5:C") come back as None.
+    """
+    sheet, _, cells = range_name.rpartition('!')
+    sheet = sheet.strip("'").replace("''", "'")
+    start, _, end = cells.partition(':')
+    start_match = _CELL.match(start)
+    end_match = _CELL.match(end or start)
+    if not start_match or not end_match:
+        raise ValueError(f"Unsupported range: {range_name}")
+
+    first_col = column_index(start_match.group(1)) if start_match.group(1) else 0
+    first_row = int(start_match.group(2)) - 1 if start_match.group(2) else 0
+    last_col = column_index(end_match.group(1)) if end_match.group(1) else None
+    last_row = int(end_match.group(2)) - 1 if end_match.group(2) else None
+    return sheet, first_row, first_col, last_row, last_col
+
+class FakeSheetsBackend:
+    """In-memory stand-in for the Google Sheets API used by the services.
+
+    Implements spreadsheets().get/batchUpdate and values().get/update/append
+    with the same request/response shapes as the real API. Spreadsheets and
+    tabs are created on first use. Latency, random 503s and a per-minute quota
+    (answered with 429s) can be configured, and every call is counted by
+    method along with the bytes of request bodies sent.
+    """
+
+    def __init__(self, latency_ms=0, error_rate=0.0, quota_per_minute=None, default_headers=None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.default_headers = default_headers or []
+        self.spreadsheets = {}
+        self.call_counts = Counter()
+        self.bytes_sent = 0
+        self.errors_injected = Counter()
+        self._recent_calls = deque()
+        self._lock = threading.RLock()
+
+    def seed(self, spreadsheet_id, sheet_name, rows, title=None):
+        """Create (or replace) a tab with the given rows"""
+        with self._lock:
+            spreadsheet = self._get_spreadsheet(spreadsheet_id, title)
+            self._get_sheet(spreadsheet, sheet_name)['rows'] = [[str(cell) for cell in row] for row in rows]
+
+    def get_rows(self, spreadsheet_id, sheet_name):
+        """Copy of a tab's rows"""
+        with self._lock:
+            return [list(row) for row in self._get_sheet(self._get_spreadsheet(spreadsheet_id), sheet_name)['rows']]
+
+    def reset_counters(self):
+        with self._lock:
+            self.call_counts.clear()
+            self.errors_injected.clear()
+            self.bytes_sent = 0
+
+    def _get_spreadsheet(self, spreadsheet_id, title=None):
+        if spreadsheet_id not in self.spreadsheets:
+            self.spreadsheets[spreadsheet_id] = {'title': title or spreadsheet_id, 'sheets': {}, 'formats': []}
+        return self.spreadsheets[spreadsheet_id]
+
+    def _get_sheet(self, spreadsheet, sheet_name):
+        if sheet_name not in spreadsheet['sheets']:
+            rows = [list(self.default_headers)] if self.default_headers else []
+            spreadsheet['sheets'][sheet_name] = {'sheetId': len(spreadsheet['sheets']), 'rows': rows}
+        return spreadsheet['sheets'][sheet_name]
+
+    def _before_call(self, method_id, body):
+        """Count the call, then simulate latency, quota and transient errors"""
+        with self._lock:
+            self.call_counts[method_id] += 1
+            if body is not None:
+                self.bytes_sent += len(json.dumps(body))
+
+            now = time.monotonic()
+            over_quota = False
+            if self.quota_per_minute:
+                while self._recent_calls and self._recent_calls[0] < now - 60:
+                    self._recent_calls.popleft()
+                over_quota = len(self._recent_calls) >= self.quota_per_minute
+                if not over_quota:
+                    self._recent_calls.append(now)
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        if over_quota:
+            self._raise(429, 'Quota exceeded for quota metric \'Requests\'', method_id)
+        if self.error_rate and random.random() < self.error_rate:
+            self._raise(503, 'The service is currently unavailable.', method_id)
+
+    def _raise(self, status, message, method_id):
+        with self._lock:
+            self.errors_injected[status] += 1
+        content = json.dumps({'error': {'code': status, 'message': message}}).encode('utf-8')
+        raise HttpError(httplib2.Response({'status': status}), content, uri=f"fake://{method_id}")
+
+    def _values_in_range(self, rows, first_row, first_col, last_row, last_col):
+        values = []
+        for row in rows[first_row:None if last_row is None else last_row + 1]:
+            cells = row[first_col:None if last_col is None else last_col + 1]
+            while cells and cells[-1] == '':
+                cells = cells[:-1]
+            values.append(list(cells))
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _write(self, rows, first_row, first_col, values):
+        for offset, row_values in enumerate(values):
+            while len(rows) <= first_row + offset:
+                rows.append([])
+            row = rows[first_row + offset]
+            if len(row) < first_col + len(row_values):
+                row.extend([''] * (first_col + len(row_values) - len(row)))
+            row[first_col:first_col + len(row_values)] = ['' if value is None else str(value) for value in row_values]
+
+    def values_get(self, spreadsheetId, range, **kwargs):
+        with self._lock:
+            sheet_name, first_row, first_col, last_row, last_col = parse_a1_range(range)
+            rows = self._get_sheet(self._get_spreadsheet(spreadsheetId), sheet_name)['rows']
+            values = self._values_in_range(rows, first_row, first_col, last_row, last_col)
+        result = {'range': range, 'majorDimension': 'ROWS'}
+        if values:
+            result['values'] = values
+        return result
+
+    def values_update(self, spreadsheetId, range, body, **kwargs):
+        with self._lock:
+            sheet_name, first_row, first_col, _, _ = parse_a1_range(range)
+            rows = self._get_sheet(self._get_spreadsheet(spreadsheetId), sheet_name)['rows']
+            self._write(rows, first_row, first_col, body.get('values', []))
+        return {
+            'spreadsheetId': spreadsheetId,
+            'updatedRange': range,
+            'updatedRows': len(body.get('values', []))
+        }
+
+    def values_append(self, spreadsheetId, range, body, **kwargs):
+        with self._lock:
+            sheet_name, _, first_col, _, last_col = parse_a1_range(range)
+            rows = self._get_sheet(self._get_spreadsheet(spreadsheetId), sheet_name)['rows']
+
+            # Like Sheets, append after the last row with data in the range's columns
+            next_row = 0
+            for index, row in enumerate(rows):
+                if any(cell != '' for cell in row[first_col:None if last_col is None else last_col + 1]):
+                    next_row = index + 1
+
+            values = body.get('values', [])
+            self._write(rows, next_row, first_col, values)
+
+        width = max((len(row_values) for row_values in values), default=1)
+        updated_range = (
+            f"{sheet_name}!{column_letter(first_col)}{next_row + 1}:"
+            f"{column_letter(first_col + width - 1)}{next_row + len(values)}"
+        )
+        return {
+            'spreadsheetId': spreadsheetId,
+            'tableRange': f"{sheet_name}!{column_letter(first_col)}1:{column_letter(first_col + width - 1)}{next_row}",
+            'updates': {'updatedRange': updated_range, 'updatedRows': len(values)}
+        }
+
+    def spreadsheets_get(self, spreadsheetId, **kwargs):
+        with self._lock:
+            spreadsheet = self._get_spreadsheet(spreadsheetId)
+            return {
+                'spreadsheetId': spreadsheetId,
+                'properties': {'title': spreadsheet['title']},
+                'sheets': [
+                    {'properties': {'sheetId': sheet['sheetId'], 'title': name}}
+                    for name, sheet in spreadsheet['sheets'].items()
+                ]
+            }
+
+    def spreadsheets_batch_update(self, spreadsheetId, body, **kwargs):
+        with self._lock:
+            spreadsheet = self._get_spreadsheet(spreadsheetId)
+            for request in body.get('requests', []):
+                insert = request.get('insertDimension')
+                if insert and insert['range'].get('dimension') == 'ROWS':
+                    self._insert_rows(spreadsheet, insert['range'])
+                else:
+                    # Formatting is recorded but has no effect on values
+                    spreadsheet['formats'].append(request)
+        return {'spreadsheetId': spreadsheetId, 'replies': [{} for _ in body.get('requests', [])]}
+
+    def _insert_rows(self, spreadsheet, dimension_range):
+        for sheet in spreadsheet['sheets'].values():
+            if sheet['sheetId'] == dimension_range['sheetId']:
+                start = dimension_range['startIndex']
+                # Rows past the end of the data are implicit, so there is nothing to shift
+                if start < len(sheet['rows']):
+                    sheet['rows'][start:start] = [[] for _ in range(dimension_range['endIndex'] - start)]
+                return
+        raise ValueError(f"No sheet with ID {dimension_range['sheetId']}")
+
+class FakeRequest:
+    """Mimics googleapiclient's HttpRequest: nothing happens until execute()"""
+
+    def __init__(self, backend, method_id, handler, kwargs):
+        self.backend = backend
+        self.methodId = method_id
+        self._handler = handler
+        self._kwargs = kwargs
+
+    def _run(self):
+        self.backend._before_call(self.methodId, self._kwargs.get('body'))
+        return self._handler(**self._kwargs)
+
+    def execute(self, http=None, num_retries=0):
+        # Same rate limiting and retry layer as real requests
+        return get_request_layer().call(self._run, self.methodId, is_idempotent(self.methodId, self._kwargs.get('body')))
+
+class _FakeValues:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get(self, **kwargs):
+        return FakeRequest(self._backend, 'sheets.spreadsheets.values.get', self._backend.values_get, kwargs)
+
+    def update(self, **kwargs):
+        return FakeRequest(self._backend, 'sheets.spreadsheets.values.update', self._backend.values_update, kwargs)
+
+    def append(self, **kwargs):
+        return FakeRequest(self._backend, 'sheets.spreadsheets.values.append', self._backend.values_append, kwargs)
+
+class _FakeSpreadsheets:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get(self, **kwargs):
+        return FakeRequest(self._backend, 'sheets.spreadsheets.get', self._backend.spreadsheets_get, kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return FakeRequest(self._backend, 'sheets.spreadsheets.batchUpdate', self._backend.spreadsheets_batch_update, kwargs)
+
+    def values(self):
+        return _FakeValues(self._backend)
+
+class FakeSheetsService:
+    """Drop-in for the object returned by build('sheets', 'v4')"""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def spreadsheets(self):
+        return _FakeSpreadsheets(self._backend)
+
+class FakeSheetsClientPool:
+    """Drop-in for SheetsClientPool that hands out clients of a FakeSheetsBackend"""
+
+    def __init__(self, backend=None, config=None):
+        config = config or get_config()
+        if backend is None:
+            backend = FakeSheetsBackend(
+                latency_ms=config.FAKE_SHEETS_LATENCY_MS,
+                error_rate=config.FAKE_SHEETS_ERROR_RATE,
+                quota_per_minute=config.FAKE_SHEETS_QUOTA_PER_MINUTE,
+                default_headers=config.FAKE_SHEETS_DEFAULT_HEADERS
+            )
+        self.backend = backend
+        self.config = config
+        self.creds = None
+        self._service = FakeSheetsService(backend)
+
+    def refresh_credentials(self):
+        pass
+
+    @contextmanager
+    def checkout(self):
+        yield self._service
@@ -1,63 +1,40 @@
 import os
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import pandas as pd
 from datetime import datetime
-from config import Config
+from config import get_config
+from sheets_client import get_sheets_client_pool, spreadsheet_write_lock
+from block_writer import BlockWriter
 from master_sheet_service import MasterSheetService
+from duplicate_detector import normalize_keys
+from metrics import time_stage, ROWS_PROCESSED, DUPLICATES_SKIPPED, ROWS_WRITTEN
+
+# Start of the message returned when an upload has nothing new to write
+NO_NEW_COMPANIES = "No new companies to add"
+
+# Next free row per (spreadsheet, sheet), updated after each of our appends
+_row_cursors = {}
+
+# Compiled column plans per (column mapping, sheet header) layout
+_column_plans = {}
 
 class GoogleSheetsService:
-    def __init__(self, client_id=None):
-        self.config = Config()
+    def __init__(self, client_id=None, master_service=None, pool=None):
+        self.config = get_config()
         self.client_id = client_id
-        self.creds = None
-        self.service = None
-        self.master_service = MasterSheetService()
-        self._authenticate()
-    
-    def _authenticate(self):
-        """Authenticate with Google Sheets API"""
-        try:
-            # First try to use credentials from environment variables
-            if self.config.GOOGLE_SHEETS_CREDENTIALS:
-                print("Using credentials from environment variables")
-                self.creds = Credentials.from_service_account_info(
-                    self.config.GOOGLE_SHEETS_CREDENTIALS,
-                    ['https://www.googleapis.com/auth/spreadsheets']
-                )
-            else:
-                # Fall back to credential files
-                if os.path.exists(self.config.GOOGLE_SHEETS_CREDENTIALS_FILE):
-                    print("Using credentials from file")
-                    self.creds = Credentials.from_service_account_file(
-                        self.config.GOOGLE_SHEETS_CREDENTIALS_FILE,
-                        ['https://www.googleapis.com/auth/spreadsheets']
-                    )
-                else:
-                    raise FileNotFoundError(f"Credentials file not found: {self.config.GOOGLE_SHEETS_CREDENTIALS_FILE}")
-            
-            # If no valid credentials, get new ones
-            if not self.creds or not self.creds.valid:
-                if self.creds and self.creds.expired and self.creds.refresh_token:
-                    self.creds.refresh(Request())
-                else:
-                    # For OAuth flow (if using user credentials instead of service account)
-                    if os.path.exists(self.config.GOOGLE_SHEETS_TOKEN_FILE):
-                        self.creds = Credentials.from_authorized_user_file(
-                            self.config.GOOGLE_SHEETS_TOKEN_FILE,
-                            ['https://www.googleapis.com/auth/spreadsheets']
-                        )
-                    else:
-                        raise Exception("No valid credentials found")
-            
-            self.service = build('sheets', 'v4', credentials=self.creds)
-            
-        except Exception as e:
-            print(f"ERROR: GoogleSheetsService authentication failed: {str(e)}")
-            raise
+        self.pool = pool or get_sheets_client_pool()
+        self.creds = self.pool.creds
+        self.master_service = master_service or MasterSheetService(pool=self.pool)
+        # JobCheckpoint of the upload job, if its writes should be resumable
+        self.checkpoint = None
+        # Header row of the client sheet, read once per service
+        self._sheet_headers = None
+        # RunKeyRegistry shared by the uploads of a batch run, if any
+        self.run_keys = None
+        # Keys claimed in run_keys for rows not written to the client sheet yet
+        self.unwritten_run_keys = {}
+        # Rows written to the client sheet by this service
+        self.rows_added = 0
     
     def get_client_sheet_info(self):
         """Get information about the current client's sheet"""
@@ -69,8 +46,23 @@ class GoogleSheetsService:
         
         return self.config.CLIENT_SHEETS[self.client_id], None
     
+    @property
+    def column_mapping(self):
+        """CSV to sheet column mapping for this client (the global mapping plus client overrides)"""
+        client = self.config.CLIENT_SHEETS.get(self.client_id)
+        return client['column_mapping'] if client else self.config.COLUMN_MAPPING
+    
+    @property
+    def default_values(self):
+        """Constant column values for this client (the global defaults plus client overrides)"""
+        client = self.config.CLIENT_SHEETS.get(self.client_id)
+        return client['default_values'] if client else self.config.DEFAULT_VALUES
+    
     def get_existing_headers(self):
         """Get existing headers from the client sheet"""
+        if self._sheet_headers is not None:
+            return self._sheet_headers, None
+        
         try:
             client_info, error = self.get_client_sheet_info()
             if error:
@@ -83,16 +75,18 @@ class GoogleSheetsService:
                 return None, f"Sheet ID not configured for {client_info['name']}"
             
             # Get headers from the first row
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=sheet_id,
-                range=f"{sheet_name}!A1:Z1"
-            ).execute()
+            with self.pool.checkout() as service:
+                result = service.spreadsheets().values().get(
+                    spreadsheetId=sheet_id,
+                    range=f"{sheet_name}!A1:Z1"
+                ).execute()
             
             values = result.get('values', [])
             if not values:
                 return None, f"No headers found in {sheet_name}"
             
             headers = [header.strip() for header in values[0] if header.strip()]
+            self._sheet_headers = headers
             return headers, None
             
         except Exception as e:
@@ -109,11 +103,17 @@ class GoogleSheetsService:
             sheet_id = client_info['sheet_id']
             sheet_name = client_info['sheet_name']
             
-            # Get all data to find the last row
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=sheet_id,
-                range=f"{sheet_name}!A:Z"
-            ).execute()
+            # Use the row cursor kept up to date by our own appends
+            cursor_key = (sheet_id, sheet_name)
+            if cursor_key in _row_cursors:
+                return _row_cursors[cursor_key], None
+            
+            # Get all data to find the last row (only once per sheet and process)
+            with self.pool.checkout() as service:
+                result = service.spreadsheets().values().get(
+                    spreadsheetId=sheet_id,
+                    range=f"{sheet_name}!A:Z"
+                ).execute()
             
             values = result.get('values', [])
             if not values:
@@ -126,6 +126,7 @@ class GoogleSheetsService:
                     last_row = i + 1
             
             next_row = last_row + 1
+            _row_cursors[cursor_key] = next_row
             return next_row, None
             
         except Exception as e:
@@ -137,13 +138,14 @@ class GoogleSheetsService:
         try:
             
             mapped_columns = {}
+            column_mapping = self.column_mapping
             
             for csv_col in csv_columns:
                 csv_col_clean = csv_col.strip()
                 
                 # First try exact mapping from config
-                if csv_col_clean in self.config.COLUMN_MAPPING:
-                    sheet_col = self.config.COLUMN_MAPPING[csv_col_clean]
+                if csv_col_clean in column_mapping:
+                    sheet_col = column_mapping[csv_col_clean]
                     if sheet_col in sheet_headers:
                         mapped_columns[sheet_col] = csv_col
                         continue
@@ -162,74 +164,179 @@ class GoogleSheetsService:
             print(f"ERROR: Failed to map CSV columns: {str(e)}")
             return {}
     
+    def csv_columns_used(self, csv_columns, sheet_headers):
+        """CSV columns the upload reads: the ones mapped to a sheet column, which include the dedupe keys"""
+        return list(self.map_csv_columns_to_sheet(csv_columns, sheet_headers).values())
+    
+    @time_stage('prepare')
     def prepare_data_for_sheets(self, data, mapped_columns, sheet_headers):
         """Prepare data for Google Sheets with proper column ordering and default values"""
         try:
-            ordered_data = []
+            if len(data) == 0:
+                return []
             
-            for index, row in data.iterrows():
-                ordered_row = []
-                
-                for sheet_col in sheet_headers:
-                    if sheet_col in mapped_columns:
-                        # This sheet column has a CSV mapping
-                        csv_col = mapped_columns[sheet_col]
-                        value = str(row[csv_col])
-                    else:
-                        # This sheet column has no mapping, check for default values
-                        value = ""
-                    
-                    # Apply default values for specific columns (regardless of mapping)
-                    if sheet_col in self.config.DEFAULT_VALUES:
-                        if sheet_col == "Date":
-                            # Always use today's date
-                            value = self.config.DEFAULT_VALUES["Date"]
-                        elif sheet_col == "Source":
-                            # Always use Crunchbase
-                            value = self.config.DEFAULT_VALUES["Source"]
-                        elif sheet_col in ["POCs", "Email ID", "Reachout LinkedIn", "Reachout Email", "Response"]:
-                            # Leave these blank
-                            value = ""
-                    
-                    ordered_row.append(value)
-                
-                ordered_data.append(ordered_row)
+            plan = self._get_column_plan(mapped_columns, sheet_headers)
             
-            return ordered_data
+            # Build every sheet column at once, then convert to lists in a single pass
+            columns = {}
+            for position, (source_type, source) in enumerate(plan):
+                if source_type == 'column':
+                    columns[position] = data[source].astype(str)
+                else:
+                    columns[position] = source
+            
+            ordered = pd.DataFrame(columns, index=data.index)
+            return ordered.to_numpy(dtype=object).tolist()
             
         except Exception as e:
             print(f"ERROR: Failed to prepare data for sheets: {str(e)}")
             return []
     
+    def _get_column_plan(self, mapped_columns, sheet_headers):
+        """Get (compiling once per mapping and header layout) where each sheet column's values come from
+        
+        Returns a list with one ('column', csv_col) or ('value', constant) entry per sheet header.
+        """
+        default_values = self.default_values
+        cache_key = (
+            tuple(sorted(mapped_columns.items())),
+            tuple(sheet_headers),
+            tuple(sorted(default_values.items()))
+        )
+        plan = _column_plans.get(cache_key)
+        if plan is not None:
+            return plan
+        
+        plan = []
+        for sheet_col in sheet_headers:
+            if sheet_col in mapped_columns:
+                # This sheet column has a CSV mapping
+                source = ('column', mapped_columns[sheet_col])
+            else:
+                # This sheet column has no mapping
+                source = ('value', "")
+            
+            # Apply default values for specific columns (regardless of mapping)
+            if sheet_col in default_values:
+                if sheet_col == "Date":
+                    # Always use today's date
+                    source = ('value', default_values["Date"])
+                elif sheet_col == "Source":
+                    # Always use Crunchbase
+                    source = ('value', default_values["Source"])
+                elif sheet_col in ["POCs", "Email ID", "Reachout LinkedIn", "Reachout Email", "Response"]:
+                    # Leave these blank
+                    source = ('value', "")
+                else:
+                    # Constants set for the client, e.g. a fixed Campaign
+                    source = ('value', default_values[sheet_col])
+            
+            plan.append(source)
+        
+        _column_plans[cache_key] = plan
+        return plan
+    
+    @time_stage('dedupe')
     def detect_duplicates(self, data, mapped_columns):
-        """Efficiently detect duplicates using single master sheet read"""
+        """Drop rows that already exist in the master sheet or repeat an earlier row of the upload
+        
+        Rows are matched on every configured dedupe key (normalized company name,
+        website domain, LinkedIn slug) that the CSV provides.
+        """
         try:
-            if not self.config.DUPLICATE_CHECK_FIELDS:
-                return data
-            
-            # Single read from master sheet to get all existing companies
-            existing_companies = self.master_service.get_existing_companies()
-            
-            if not existing_companies:
+            ROWS_PROCESSED.inc(len(data))
+            key_columns = self._build_dedupe_keys(data, mapped_columns)
+            if not key_columns:
                 return data
             
-            # Get the company field to check
-            company_field = self.config.DUPLICATE_CHECK_FIELDS[0]  # "Company Name"
-            if company_field not in mapped_columns:
+            # Rows repeating an earlier row of this upload on any key
+            duplicate_mask = pd.Series(False, index=data.index)
+            for keys in key_columns.values():
+                duplicate_mask |= keys.duplicated() & (keys != '')
+            
+            # Rows already in the master sheet, looked up in the local master index
+            generation = self.run_keys.generation if self.run_keys is not None else None
+            existing_keys = self.master_service.find_existing_keys(
+                {key_type: keys[~duplicate_mask].unique() for key_type, keys in key_columns.items()}
+            )
+            for key_type, keys in key_columns.items():
+                if existing_keys.get(key_type):
+                    duplicate_mask |= keys.isin(existing_keys[key_type])
+            
+            # Rows another file of the same batch run is already adding
+            if self.run_keys is not None:
+                duplicate_mask, claimed = self.run_keys.claim(key_columns, duplicate_mask)
+                if self.run_keys.generation != generation:
+                    duplicate_mask, claimed = self._recheck_claimed_keys(key_columns, duplicate_mask, claimed)
+                for key_type, keys in claimed.items():
+                    self.unwritten_run_keys.setdefault(key_type, set()).update(keys)
+            
+            if not duplicate_mask.any():
                 return data
             
-            csv_col = mapped_columns[company_field]
+            DUPLICATES_SKIPPED.inc(int(duplicate_mask.sum()))
             
             # Filter DataFrame to only include new companies
-            new_companies_mask = ~data[csv_col].str.strip().isin(existing_companies)
-            new_companies = data[new_companies_mask].copy()
-            
-            return new_companies
+            return data[~duplicate_mask].copy()
             
         except Exception as e:
             print(f"ERROR: Failed to detect duplicates: {str(e)}")
             return data
     
+    def select_new_companies(self, data, mapped_columns):
+        """Start a batch of the upload and pick its new rows with detect_duplicates
+        
+        When the job is checkpointed the chosen rows are saved, and a retried job
+        reuses them: rows an earlier attempt already wrote to the master sheet
+        would otherwise look like duplicates and never reach the client sheet.
+        """
+        if self.checkpoint is None:
+            return self.detect_duplicates(data, mapped_columns)
+        
+        self.checkpoint.next_batch()
+        row_labels = self.checkpoint.get_plan()
+        if row_labels is not None:
+            return data.loc[row_labels]
+        
+        new_companies_data = self.detect_duplicates(data, mapped_columns)
+        self.checkpoint.save_plan(new_companies_data.index.tolist())
+        return new_companies_data
+    
+    def _recheck_claimed_keys(self, key_columns, duplicate_mask, claimed):
+        """Look up freshly claimed keys in the master index again
+        
+        Another file of the run may have written them to the master sheet and
+        dropped its claims after this upload's index lookup. Rows found there
+        now are duplicates, and every key claimed for them is released.
+        """
+        existing_keys = self.master_service.find_existing_keys(
+            {key_type: list(keys) for key_type, keys in claimed.items()}
+        )
+        late_mask = pd.Series(False, index=duplicate_mask.index)
+        for key_type, keys in existing_keys.items():
+            if keys:
+                late_mask |= key_columns[key_type].isin(keys)
+        if not late_mask.any():
+            return duplicate_mask, claimed
+        
+        late_keys = {
+            key_type: set(keys[late_mask]) & claimed.get(key_type, set())
+            for key_type, keys in key_columns.items()
+        }
+        self.run_keys.release(late_keys)
+        claimed = {key_type: keys - late_keys.get(key_type, set()) for key_type, keys in claimed.items()}
+        return duplicate_mask | late_mask, claimed
+    
+    def _build_dedupe_keys(self, data, mapped_columns):
+        """Build a normalized key Series per dedupe key type the CSV provides"""
+        key_columns = {}
+        for field in self.config.DUPLICATE_CHECK_FIELDS:
+            if field not in mapped_columns:
+                continue
+            key_type = self.config.DUPLICATE_KEY_TYPES.get(field, 'company')
+            key_columns[key_type] = normalize_keys(data[mapped_columns[field]], key_type)
+        return key_columns
+    
     def append_data(self, data, client_name):
         """Efficiently append data to both master sheet and client sheet"""
         try:
@@ -255,58 +362,26 @@ class GoogleSheetsService:
                 return False, "No CSV columns could be mapped to sheet headers"
             
             # Efficient duplicate detection - returns filtered DataFrame
-            new_companies_data = self.detect_duplicates(data, mapped_columns)
+            new_companies_data = self.select_new_companies(data, mapped_columns)
             
             if len(new_companies_data) == 0:
-                return False, f"No new companies to add. All {len(data)} companies already exist in master sheet."
-            
-            # Prepare data for client sheet (all new companies at once)
-            client_sheet_data = self.prepare_data_for_sheets(new_companies_data, mapped_columns, sheet_headers)
-            
-            if not client_sheet_data:
-                return False, "Failed to prepare data for client sheet"
+                return False, f"{NO_NEW_COMPANIES}. All {len(data)} companies already exist in master sheet or repeat earlier rows."
             
-            # Find next available row in client sheet
-            next_row, error = self.find_next_available_row()
+            # Write client rows, then master rows
+            next_row, master_count, error = self._write_new_companies(new_companies_data, mapped_columns, sheet_headers, client_name)
             if error:
-                return False, f"Failed to find next available row: {error}"
-            
-            # Single write to client sheet with all new companies
-            range_name = f"{sheet_name}!A{next_row}:{chr(65 + len(sheet_headers) - 1)}{next_row + len(client_sheet_data) - 1}"
-            body = {'values': client_sheet_data}
-            
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=sheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
-            
-            # Prepare data for master sheet (just company names, client, and date)
-            master_data = []
-            company_field = self.config.DUPLICATE_CHECK_FIELDS[0]  # "Company Name"
-            csv_col = mapped_columns[company_field]
-            
-            for _, row in new_companies_data.iterrows():
-                company_name = str(row[csv_col]).strip()
-                master_data.append([client_name, company_name, self.config.DEFAULT_VALUES["Date"]])
-            
-            # Single write to master sheet
-            master_success, master_message = self.master_service.add_companies_to_master(master_data)
-            if not master_success:
-                print(f"WARNING: Failed to add companies to master sheet: {master_message}")
-                # Continue anyway since client sheet was updated
+                return False, error
             
             # Success message
             message_parts = [
                 f"Successfully added {len(new_companies_data)} new companies to {client_name} sheet",
                 f"Starting from row {next_row}",
-                f"Updated master sheet with {len(master_data)} new company entries"
+                f"Updated master sheet with {master_count} new company entries"
             ]
             
             if len(data) > len(new_companies_data):
                 skipped_count = len(data) - len(new_companies_data)
-                message_parts.append(f"Skipped {skipped_count} existing companies")
+                message_parts.append(f"Skipped {skipped_count} duplicate companies")
             
             return True, ". ".join(message_parts)
             
@@ -314,6 +389,163 @@ class GoogleSheetsService:
             print(f"ERROR: Failed to append data: {str(e)}")
             return False, f"Unexpected error: {str(e)}"
     
+    def append_data_stream(self, chunks, client_name, progress_callback=None):
+        """Append data chunk by chunk to both master sheet and client sheet
+        
+        Each chunk is deduplicated against the master index (which already includes
+        the rows written for earlier chunks) and written before the next one is used,
+        so memory stays bounded by the chunk size.
+        """
+        try:
+            client_info, error = self.get_client_sheet_info()
+            if error:
+                return False, f"Failed to get client sheet info: {error}"
+            
+            sheet_headers, error = self.get_existing_headers()
+            if error:
+                return False, f"Failed to get sheet headers: {error}"
+            
+            mapped_columns = None
+            first_row = None
+            total_rows = 0
+            added_rows = 0
+            master_rows = 0
+            
+            for chunk in chunks:
+                total_rows += len(chunk)
+                
+                # Chunks share the CSV header, so the mapping is resolved once
+                if mapped_columns is None:
+                    mapped_columns = self.map_csv_columns_to_sheet(chunk.columns.tolist(), sheet_headers)
+                    if not mapped_columns:
+                        return False, "No CSV columns could be mapped to sheet headers"
+                
+                new_companies_data = self.select_new_companies(chunk, mapped_columns)
+                if len(new_companies_data) > 0:
+                    next_row, master_count, error = self._write_new_companies(new_companies_data, mapped_columns, sheet_headers, client_name)
+                    if error:
+                        return False, f"{error} (after adding {added_rows} companies)"
+                    
+                    if first_row is None:
+                        first_row = next_row
+                    added_rows += len(new_companies_data)
+                    master_rows += master_count
+                
+                if progress_callback:
+                    progress_callback(total_rows, added_rows)
+            
+            if added_rows == 0:
+                return False, f"{NO_NEW_COMPANIES}. All {total_rows} companies already exist in master sheet or repeat earlier rows."
+            
+            message_parts = [
+                f"Successfully added {added_rows} new companies to {client_name} sheet",
+                f"Starting from row {first_row}",
+                f"Updated master sheet with {master_rows} new company entries"
+            ]
+            
+            if total_rows > added_rows:
+                message_parts.append(f"Skipped {total_rows - added_rows} duplicate companies")
+            
+            return True, ". ".join(message_parts)
+            
+        except Exception as e:
+            print(f"ERROR: Failed to append streamed data: {str(e)}")
+            return False, f"Unexpected error: {str(e)}"
+    
+    def _write_new_companies(self, new_companies_data, mapped_columns, sheet_headers, client_name):
+        """Write already-deduplicated companies to the client sheet and the master sheet
+        
+        A failed master write is an error too: the companies would otherwise be
+        missing from the master index, so a re-upload would add them again. The
+        job's checkpoints let a retry finish the master write without rewriting
+        the client rows.
+        
+        Returns:
+            Tuple[Optional[int], int, Optional[str]]: (first client row, master rows added, error)
+        """
+        next_row, error = self.write_client_rows(new_companies_data, mapped_columns, sheet_headers)
+        if error:
+            return None, 0, error
+        self.rows_added += len(new_companies_data)
+        written_run_keys, self.unwritten_run_keys = self.unwritten_run_keys, {}
+        
+        master_data = self.build_master_rows(new_companies_data, mapped_columns, client_name)
+        
+        # Single write to master sheet
+        master_success, master_message = self.master_service.add_companies_to_master(master_data)
+        if not master_success:
+            print(f"ERROR: Failed to add companies to master sheet: {master_message}")
+            return next_row, 0, (
+                f"Added {len(new_companies_data)} companies to {client_name} sheet but failed to update master sheet: "
+                f"{master_message}. Retry the job to finish; uploading the file again would add them twice"
+            )
+        
+        # The master index has these companies now, so the run can stop holding their keys
+        if self.run_keys is not None:
+            self.run_keys.forget(written_run_keys)
+        
+        return next_row, len(master_data), None
+    
+    def write_client_rows(self, new_companies_data, mapped_columns, sheet_headers):
+        """Write already-deduplicated companies to the client sheet only
+        
+        Returns:
+            Tuple[Optional[int], Optional[str]]: (first client row, error)
+        """
+        # Prepare data for client sheet (all new companies at once)
+        client_sheet_data = self.prepare_data_for_sheets(new_companies_data, mapped_columns, sheet_headers)
+        
+        if not client_sheet_data:
+            return None, "Failed to prepare data for client sheet"
+        
+        # Single append to client sheet with all new companies
+        return self.append_rows(client_sheet_data, sheet_headers), None
+    
+    def build_master_rows(self, new_companies_data, mapped_columns, client_name):
+        """Master sheet rows (client, company, date, website, LinkedIn) for new companies"""
+        company_field = self.config.DUPLICATE_CHECK_FIELDS[0]  # "Company Name"
+        csv_col = mapped_columns[company_field]
+        date_added = self.default_values["Date"]
+        
+        company_names = new_companies_data[csv_col].astype(str).str.strip().tolist()
+        
+        # Keep the website and LinkedIn URL so later uploads can be deduplicated on them
+        key_values = []
+        for field in ('Website', 'Company Linkedin'):
+            if field in mapped_columns:
+                key_values.append(new_companies_data[mapped_columns[field]].astype(str).str.strip().tolist())
+            else:
+                key_values.append([''] * len(company_names))
+        
+        return [
+            [client_name, company_name, date_added, website, linkedin]
+            for company_name, website, linkedin in zip(company_names, *key_values)
+        ]
+    
+    @time_stage('client_write')
+    def append_rows(self, rows, sheet_headers):
+        """Append rows after the client sheet's last row and return the first row written
+        
+        The Sheets API locates the end of the table server-side, so no read is
+        needed; the row cursor is updated from the range it reports back. Large
+        appends are written in checkpointed blocks (see BlockWriter).
+        """
+        client_info, error = self.get_client_sheet_info()
+        if error:
+            raise ValueError(error)
+        
+        sheet_id = client_info['sheet_id']
+        sheet_name = client_info['sheet_name']
+        
+        with spreadsheet_write_lock(sheet_id):
+            first_row, last_row = BlockWriter(self.pool).write(
+                sheet_id, sheet_name, chr(65 + len(sheet_headers) - 1), rows, self.checkpoint
+            )
+        
+        _row_cursors[(sheet_id, sheet_name)] = last_row + 1
+        ROWS_WRITTEN.inc(len(rows), sheet='client')
+        return first_row
+    
     def get_column_mapping_info(self):
         """Get information about column mapping and sheet configuration"""
         try:
@@ -329,7 +561,7 @@ class GoogleSheetsService:
                 'client_name': client_info['name'] if client_info else 'Unknown',
                 'sheet_name': client_info['sheet_name'] if client_info else 'Unknown',
                 'sheet_headers': sheet_headers,
-                'csv_mapping': self.config.COLUMN_MAPPING,
+                'csv_mapping': self.column_mapping,
                 'duplicate_check_fields': self.config.DUPLICATE_CHECK_FIELDS,
                 'duplicate_handling': self.config.DUPLICATE_HANDLING,
                 'duplicate_min_match_score': self.config.DUPLICATE_MIN_MATCH_SCORE
@@ -353,9 +585,10 @@ class GoogleSheetsService:
                 return False, f"Sheet ID not configured for {client_info['name']}"
             
             # Try to get sheet info
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=sheet_id
-            ).execute()
+            with self.pool.checkout() as service:
+                spreadsheet = service.spreadsheets().get(
+                    spreadsheetId=sheet_id
+                ).execute()
             
             sheet_title = spreadsheet['properties']['title']
             return True, f"Connected to {client_info['name']} sheet: {sheet_title}"
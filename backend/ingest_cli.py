@@ -0,0 +1,240 @@
+"""Ingest Crunchbase CSV exports into a client's sheet without going through the web app.
+
+Directory mode uploads every matching file once; watch mode keeps polling the
+folders and uploads files as they appear. Run from the backend directory:
+
+    python ingest_cli.py exports/2024-06-01 --client client_a --workers 4
+    python ingest_cli.py incoming/ --client client_b --watch --interval 30
+"""
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import get_config
+from csv_processor import CSVProcessor
+from duplicate_detector import RunKeyRegistry
+from google_sheets_service import GoogleSheetsService, NO_NEW_COMPANIES
+from master_sheet_service import MasterSheetService
+from metrics import SHEETS_API_CALLS
+
+# Plain and compressed CSV exports
+DEFAULT_PATTERN = '*.csv,*.csv.gz,*.csv.zst'
+
+class IngestRun:
+    """Uploads CSV files to one client's sheet with a pool of workers.
+
+    Every file of the run is deduplicated against the master sheet and against
+    the other files of the run, including ones still being uploaded, so a
+    company spread over several exports is added once.
+    """
+
+    def __init__(self, client_id, workers=4):
+        self.config = get_config()
+        self.client_id = client_id
+        self.workers = max(1, workers)
+        self.client_name = self.config.CLIENT_SHEETS[client_id]['name']
+        self.master_service = MasterSheetService()
+        self.run_keys = RunKeyRegistry()
+
+        self.results = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._api_calls_at_start = SHEETS_API_CALLS.total()
+
+    def prepare(self):
+        """Initialize the master sheet and bring the master index up to date; returns an error or None"""
+        success, message = self.master_service.initialize_master_sheet()
+        if not success:
+            return f"Master sheet initialization failed: {message}"
+
+        _, error = self.master_service.sync_index()
+        if error:
+            print(f"WARNING: {error}")
+        return None
+
+    def ingest_file(self, file_path):
+        """Upload one CSV file and record the outcome"""
+        started = time.perf_counter()
+        result = {'file': file_path, 'bytes': 0, 'rows': 0, 'added': 0}
+        sheets_service = None
+        try:
+            result['bytes'] = os.path.getsize(file_path)
+            csv_processor = CSVProcessor(file_path, engine=self.config.CSV_PARSE_ENGINE)
+            sheets_service = GoogleSheetsService(client_id=self.client_id, master_service=self.master_service)
+            sheets_service.run_keys = self.run_keys
+            
+            # Load only the columns the client's sheet maps; a header that can't be read
+            # is left for the parse below to report
+            if self.config.CSV_PROJECT_COLUMNS:
+                sheet_headers, error = sheets_service.get_existing_headers()
+                if not error:
+                    try:
+                        csv_columns = csv_processor.read_header()
+                    except Exception:
+                        csv_columns = None
+                    if csv_columns:
+                        csv_processor.select_columns(sheets_service.csv_columns_used(csv_columns, sheet_headers))
+
+            # Large files (by decompressed size) are parsed and uploaded chunk by chunk to bound memory
+            if csv_processor.data_size() >= self.config.CSV_STREAMING_THRESHOLD_MB * 1024 * 1024:
+                chunks = csv_processor.iter_chunks(self.config.CSV_CHUNK_ROWS)
+                success, message = sheets_service.append_data_stream(chunks, self.client_name)
+            else:
+                success, data, message = csv_processor.process_csv()
+                if success:
+                    success, message = sheets_service.append_data(data, self.client_name)
+                else:
+                    message = f"CSV processing failed: {message}"
+
+            result['rows'] = csv_processor.get_data_info().get('rows', 0)
+            result['added'] = sheets_service.rows_added
+            if success:
+                result['status'] = 'added'
+            elif message.startswith(NO_NEW_COMPANIES):
+                result['status'] = 'nothing new'
+            else:
+                result['status'] = 'failed'
+            result['message'] = message
+
+        except Exception as e:
+            result['status'] = 'failed'
+            result['message'] = f"Unexpected error: {str(e)}"
+
+        # Companies this file claimed but never wrote can still come from another file of the run
+        if result['status'] == 'failed' and sheets_service is not None:
+            self.run_keys.release(sheets_service.unwritten_run_keys)
+        
+        result['seconds'] = time.perf_counter() - started
+        with self._lock:
+            self.results.append(result)
+            print(f"[{result['status']}] {file_path}: {result['message']} ({result['seconds']:.1f}s)", flush=True)
+        return result
+
+    def ingest_files(self, file_paths):
+        """Upload the given files concurrently and wait for all of them"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(self.ingest_file, file_paths))
+
+    def watch(self, directories, pattern, interval):
+        """Upload files as they appear in the directories until interrupted
+
+        A file is picked up once its size and modification time have not
+        changed for a whole polling interval, so exports that are still being
+        written are left alone. A file that is rewritten is uploaded again.
+        Files that disappear are forgotten, so only the files currently in the
+        folders are tracked.
+        """
+        last_seen = {}
+        ingested = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while True:
+                    found = set()
+                    for file_path in find_csv_files(directories, pattern):
+                        try:
+                            stat = os.stat(file_path)
+                        except OSError:
+                            continue
+                        found.add(file_path)
+                        signature = (stat.st_size, stat.st_mtime)
+                        previous = last_seen.get(file_path)
+                        last_seen[file_path] = signature
+                        if previous == signature and ingested.get(file_path) != signature:
+                            ingested[file_path] = signature
+                            executor.submit(self.ingest_file, file_path)
+                    for file_path in set(last_seen) - found:
+                        del last_seen[file_path]
+                        ingested.pop(file_path, None)
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                print("\nStopping, waiting for uploads in progress...", flush=True)
+
+    def summary(self):
+        """Totals and throughput of the run so far"""
+        with self._lock:
+            results = list(self.results)
+        elapsed = time.perf_counter() - self._started
+        rows = sum(result['rows'] for result in results)
+        completed = [result for result in results if result['status'] != 'failed']
+        return {
+            'files': len(results),
+            'added': sum(1 for result in results if result['status'] == 'added'),
+            'nothing_new': sum(1 for result in results if result['status'] == 'nothing new'),
+            'failed': len(results) - len(completed),
+            'rows_read': rows,
+            'rows_added': sum(result['added'] for result in results),
+            'duplicates_skipped': sum(result['rows'] - result['added'] for result in completed),
+            'seconds': elapsed,
+            'rows_per_second': rows / elapsed if elapsed else 0.0,
+            'mb_per_second': sum(result['bytes'] for result in results) / 1024 / 1024 / elapsed if elapsed else 0.0,
+            'api_calls': int(SHEETS_API_CALLS.total() - self._api_calls_at_start)
+        }
+
+def find_csv_files(paths, pattern=DEFAULT_PATTERN):
+    """Files given directly plus files in the given directories matching pattern, in name order
+    
+    pattern may hold several comma-separated glob patterns.
+    """
+    patterns = [part.strip() for part in pattern.split(',') if part.strip()]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted({
+                file_path
+                for part in patterns
+                for file_path in glob.glob(os.path.join(path, part))
+                if os.path.isfile(file_path)
+            }))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+def print_summary(summary, workers):
+    print(f"\nIngested {summary['files']} files in {summary['seconds']:.1f}s with {workers} workers")
+    print(f"  added: {summary['added']}, nothing new: {summary['nothing_new']}, failed: {summary['failed']}")
+    print(f"  rows read: {summary['rows_read']}, new companies: {summary['rows_added']}, "
+          f"duplicates skipped: {summary['duplicates_skipped']}")
+    print(f"  throughput: {summary['rows_per_second']:.0f} rows/s, {summary['mb_per_second']:.2f} MB/s, "
+          f"{summary['api_calls']} Sheets API calls")
+
+def main(argv=None):
+    config = get_config()
+    parser = argparse.ArgumentParser(description="Upload Crunchbase CSV exports to a client's sheet")
+    parser.add_argument('paths', nargs='+', help='CSV files and/or directories of CSV files')
+    parser.add_argument('--client', required=True, choices=sorted(config.CLIENT_SHEETS), help='client whose sheet receives the new companies')
+    parser.add_argument('--workers', type=int, default=4, help='files uploaded at the same time')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN, help='comma-separated file name patterns inside directories')
+    parser.add_argument('--watch', action='store_true', help='keep polling the directories for new files until interrupted')
+    parser.add_argument('--interval', type=float, default=10, help='seconds between polls in watch mode')
+    args = parser.parse_args(argv)
+
+    if args.watch:
+        missing = [path for path in args.paths if not os.path.isdir(path)]
+        if missing:
+            parser.error(f"--watch needs directories, not: {', '.join(missing)}")
+
+    run = IngestRun(args.client, args.workers)
+    error = run.prepare()
+    if error:
+        print(f"ERROR: {error}")
+        return 1
+
+    if args.watch:
+        print(f"Watching {', '.join(args.paths)} for {args.pattern} every {args.interval:g}s (Ctrl+C to stop)", flush=True)
+        run.watch(args.paths, args.pattern, args.interval)
+    else:
+        file_paths = find_csv_files(args.paths, args.pattern)
+        if not file_paths:
+            print("No CSV files found")
+            return 0
+        run.ingest_files(file_paths)
+
+    summary = run.summary()
+    print_summary(summary, run.workers)
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import queue
+import threading
+
+class JobExecutor:
+    """Bounded pool of worker threads that run upload jobs in submission order.
+
+    Jobs beyond the worker count wait in a FIFO queue instead of each getting
+    its own thread, which caps how many jobs hit the Sheets API at once.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max(1, int(max_workers))
+        self._queue = queue.Queue()
+        self._pending = []
+        self._running = 0
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def _ensure_workers(self):
+        # Called with self._lock held; workers are started lazily on first submit
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"job-worker-{len(self._workers) + 1}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return its queue position (1-based place in line, 0 if it starts right away)"""
+        with self._lock:
+            self._ensure_workers()
+            self._pending.append(job_id)
+            self._queue.put((job_id, fn, args, kwargs))
+            return self._position(job_id)
+
+    def get_queue_position(self, job_id):
+        """1-based place in line for a worker (0 once a worker is free for it), or None if it is no longer queued"""
+        with self._lock:
+            if job_id not in self._pending:
+                return None
+            return self._position(job_id)
+
+    def _position(self, job_id):
+        free_workers = self.max_workers - self._running
+        return max(0, self._pending.index(job_id) + 1 - free_workers)
+
+    @property
+    def queue_depth(self):
+        """Number of jobs waiting for a worker"""
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def running(self):
+        """Number of jobs currently running"""
+        with self._lock:
+            return self._running
+
+    def _work(self):
+        while True:
+            job_id, fn, args, kwargs = self._queue.get()
+            with self._lock:
+                self._pending.remove(job_id)
+                self._running += 1
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"ERROR: Job {job_id} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self._queue.task_done()
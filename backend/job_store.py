@@ -0,0 +1,214 @@
+import os
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+# Statuses after which a job's status no longer changes
+FINAL_STATUSES = {'completed', 'failed'}
+
+class JobStore:
+    """SQLite-backed store of upload job status, shared by every worker process.
+
+    Jobs are keyed by generated IDs. Entries not updated for ttl_seconds are
+    evicted, and beyond max_jobs the least recently updated ones go first.
+    Every update bumps the job's version so watchers can wait for changes
+    and records the process that made it, so jobs left unfinished by a
+    process that died can be told apart from ones still running.
+    """
+
+    def __init__(self, db_path, ttl_seconds=24 * 3600, max_jobs=1000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._last_eviction = 0
+        self._updated = threading.Condition()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    params TEXT,
+                    owner TEXT
+                )
+            """)
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+            if 'version' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+            if 'params' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN params TEXT')
+            if 'owner' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    @staticmethod
+    def _owner():
+        # Looked up on every call: worker processes may be forked after the store is created
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def create_job(self, status, params=None):
+        """Store the initial status of a new job and return its generated ID
+        
+        params are whatever is needed to run the job again if it is retried.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, status, created_at, updated_at, params, owner) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, json.dumps(status), now, now, json.dumps(params) if params is not None else None, self._owner())
+            )
+        self._evict_if_due()
+        return job_id
+    
+    def set_params(self, job_id, params):
+        """Replace the parameters a job is re-run with"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('UPDATE jobs SET params = ? WHERE job_id = ?', (json.dumps(params), job_id))
+    
+    def get_params(self, job_id):
+        """Get the parameters a job was submitted with, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT params FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def set_status(self, job_id, status):
+        """Replace a job's status and wake up anyone watching it in this process"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, updated_at = ?, version = version + 1, owner = ? WHERE job_id = ?',
+                (json.dumps(status), time.time(), self._owner(), job_id)
+            )
+        with self._updated:
+            self._updated.notify_all()
+
+    def compare_and_set_status(self, job_id, version, status):
+        """Replace a job's status only if it is still at version
+        
+        Returns:
+            bool: whether the status was replaced (False if another update came first)
+        """
+        with closing(self._connect()) as conn, conn:
+            updated = conn.execute(
+                'UPDATE jobs SET status = ?, updated_at = ?, version = version + 1, owner = ? WHERE job_id = ? AND version = ?',
+                (json.dumps(status), time.time(), self._owner(), job_id, version)
+            ).rowcount
+        if updated:
+            with self._updated:
+                self._updated.notify_all()
+        return bool(updated)
+
+    def get_status(self, job_id):
+        """Get a job's status, or None if it is unknown or evicted"""
+        status, _ = self.get_status_version(job_id)
+        return status
+
+    def get_status_version(self, job_id):
+        """Get (status, version) for a job, or (None, None) if it is unknown or evicted"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT status, updated_at, version FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl_seconds:
+            return None, None
+        return json.loads(row[0]), row[2]
+
+    def wait_for_update(self, job_id, since_version, timeout, poll_interval=1.0):
+        """Block until the job's version differs from since_version or timeout passes
+
+        Updates made in this process wake the waiter immediately; updates made by
+        other worker processes are picked up every poll_interval seconds.
+
+        Returns:
+            Tuple[Optional[dict], Optional[int]]: the latest (status, version)
+        """
+        deadline = time.time() + timeout
+        while True:
+            status, version = self.get_status_version(job_id)
+            remaining = deadline - time.time()
+            if version != since_version or remaining <= 0:
+                return status, version
+            with self._updated:
+                self._updated.wait(min(poll_interval, remaining))
+
+    def fail_interrupted_jobs(self, message):
+        """Mark jobs that were queued or running in a process that has since died as failed
+        
+        Meant to be called once at startup, before this process queues any job:
+        jobs recorded under this process's own ID are taken as left over by an
+        earlier process that had the same ID.
+        
+        Jobs run in an in-memory executor, so a crash or restart leaves them
+        unfinished forever; once failed they can be retried, resuming from their
+        write checkpoints. Jobs of processes on other hosts are left alone, as
+        there is no way to tell from here whether those are still alive.
+        
+        Returns:
+            int: number of jobs marked as failed
+        """
+        hostname = socket.gethostname()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT job_id, status, owner FROM jobs WHERE updated_at >= ?', (time.time() - self.ttl_seconds,)
+            ).fetchall()
+        
+        interrupted = []
+        for job_id, status, owner in rows:
+            status = json.loads(status)
+            if status.get('status') in FINAL_STATUSES:
+                continue
+            host, _, pid = (owner or '').rpartition(':')
+            if owner and (host != hostname or not pid.isdigit() or _process_alive(int(pid))):
+                continue
+            interrupted.append(job_id)
+        
+        for job_id in interrupted:
+            self.set_status(job_id, {'status': 'failed', 'message': message, 'progress': 0})
+        return len(interrupted)
+
+    def _evict_if_due(self):
+        # Evict at most once a minute per process to keep job creation cheap
+        with self._lock:
+            if time.time() - self._last_eviction < 60:
+                return
+            self._last_eviction = time.time()
+        self.evict()
+
+    def evict(self):
+        """Drop expired jobs, then the least recently updated ones beyond max_jobs"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM jobs WHERE updated_at < ?', (time.time() - self.ttl_seconds,))
+            conn.execute("""
+                DELETE FROM jobs WHERE job_id IN (
+                    SELECT job_id FROM jobs ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_jobs,))
+
+def _process_alive(pid):
+    """Whether another process with this ID is running on this host (this process's own ID counts as dead)"""
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
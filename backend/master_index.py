@@ -0,0 +1,214 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from duplicate_detector import CompanyMatcher, normalize_company_name, normalize_website_domain, normalize_linkedin_slug
+
+# Bump whenever the table layout or a key normalizer changes so stale indexes are rebuilt
+INDEX_VERSION = 3
+
+# Table column holding each kind of dedupe key
+KEY_COLUMNS = {
+    'company': 'normalized',
+    'website': 'website_key',
+    'linkedin': 'linkedin_key'
+}
+
+class MasterIndex:
+    """Local SQLite copy of the master sheet's (client, company, date, row) entries.
+
+    The index remembers how many master sheet rows it has seen and only
+    downloads rows added after that on each sync, so duplicate checks no
+    longer need to pull the whole master sheet. Alongside the normalized
+    company name it keeps website domain and LinkedIn slug keys.
+    """
+
+    def __init__(self, db_path, spreadsheet_id, sheet_name, column_count=5):
+        self.db_path = db_path
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.last_column = chr(64 + column_count)
+        self._sync_lock = threading.Lock()
+        self._matchers = {}
+        self._matchers_lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._create_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _create_schema(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS master_meta (key TEXT PRIMARY KEY, value TEXT)')
+
+            # Start over if the index belongs to another sheet or an older layout
+            meta = dict(conn.execute('SELECT key, value FROM master_meta').fetchall())
+            expected = {
+                'spreadsheet_id': str(self.spreadsheet_id),
+                'sheet_name': str(self.sheet_name),
+                'index_version': str(INDEX_VERSION)
+            }
+            if any(meta.get(key) != value for key, value in expected.items()):
+                conn.execute('DROP TABLE IF EXISTS master_companies')
+                conn.execute('DELETE FROM master_meta')
+                conn.executemany('INSERT INTO master_meta (key, value) VALUES (?, ?)', expected.items())
+                conn.execute("INSERT INTO master_meta (key, value) VALUES ('row_count', '0')")
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS master_companies (
+                    row_number INTEGER PRIMARY KEY,
+                    client_name TEXT,
+                    company TEXT,
+                    normalized TEXT,
+                    date_added TEXT,
+                    website_key TEXT,
+                    linkedin_key TEXT
+                )
+            """)
+            for column in KEY_COLUMNS.values():
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_master_companies_{column} ON master_companies ({column})')
+
+    def _get_row_count(self, conn):
+        row = conn.execute("SELECT value FROM master_meta WHERE key = 'row_count'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _set_row_count(self, conn, row_count):
+        conn.execute("INSERT OR REPLACE INTO master_meta (key, value) VALUES ('row_count', ?)", (str(row_count),))
+
+    def _insert_rows(self, conn, start_row, rows):
+        records = []
+        for offset, row in enumerate(rows):
+            row_number = start_row + offset
+            # Row 1 is the header row
+            if row_number == 1 or len(row) < 2 or not str(row[1]).strip():
+                continue
+            company = str(row[1]).strip()
+            records.append((
+                row_number,
+                str(row[0]),
+                company,
+                normalize_company_name(company),
+                str(row[2]) if len(row) > 2 else '',
+                normalize_website_domain(row[3]) if len(row) > 3 else '',
+                normalize_linkedin_slug(row[4]) if len(row) > 4 else ''
+            ))
+        conn.executemany(
+            'INSERT OR REPLACE INTO master_companies '
+            '(row_number, client_name, company, normalized, date_added, website_key, linkedin_key) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            records
+        )
+
+        # Keep any in-memory fuzzy matchers in step with the table
+        with self._matchers_lock:
+            for matcher in self._matchers.values():
+                matcher.add_all(record[3] for record in records)
+
+    @property
+    def row_count(self):
+        """Number of master sheet rows (including the header) the index has seen"""
+        with closing(self._connect()) as conn:
+            return self._get_row_count(conn)
+
+    def sync(self, service):
+        """Download only the master sheet rows added since the last sync"""
+        with self._sync_lock:
+            start_row = self.row_count + 1
+            result = service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{self.sheet_name}!A{start_row}:{self.last_column}"
+            ).execute()
+
+            values = result.get('values', [])
+            if not values:
+                return start_row - 1
+
+            with closing(self._connect()) as conn, conn:
+                self._insert_rows(conn, start_row, values)
+                row_count = max(self._get_row_count(conn), start_row + len(values) - 1)
+                self._set_row_count(conn, row_count)
+            return row_count
+
+    def record_rows(self, start_row, rows):
+        """Record rows we just wrote to the master sheet without re-reading them"""
+        if not rows:
+            return
+
+        with closing(self._connect()) as conn, conn:
+            self._insert_rows(conn, start_row, rows)
+            row_count = self._get_row_count(conn)
+            # Only advance the row count when there is no gap the next sync still has to fill
+            if start_row <= row_count + 1:
+                self._set_row_count(conn, max(row_count, start_row + len(rows) - 1))
+
+    def find_existing(self, company_names, min_score=1.0):
+        """Return the subset of company_names that already exist in the master sheet
+
+        Names are compared after normalization; below a min_score of 1.0 names
+        whose similarity reaches min_score also count as existing.
+        """
+        names = {str(name).strip() for name in company_names if str(name).strip()}
+        normalized_names = {name: normalize_company_name(name) for name in names}
+        existing_keys = self.find_existing_keys('company', normalized_names.values(), min_score)
+        return {name for name, key in normalized_names.items() if key in existing_keys}
+
+    def find_existing_keys(self, key_type, keys, min_score=1.0):
+        """Return the subset of already-normalized keys ('company', 'website' or 'linkedin') present in the index
+
+        Company keys below a min_score of 1.0 also match similar names.
+        """
+        keys = {key for key in keys if key}
+        if not keys:
+            return set()
+
+        if key_type == 'company' and min_score < 1.0:
+            matcher = self._get_matcher(min_score)
+            with self._matchers_lock:
+                return {key for key in keys if matcher.find_match(key)[0] is not None}
+
+        column = KEY_COLUMNS[key_type]
+        with closing(self._connect()) as conn:
+            conn.execute('CREATE TEMP TABLE lookup_keys (key TEXT)')
+            conn.executemany('INSERT INTO lookup_keys (key) VALUES (?)', [(key,) for key in keys])
+            rows = conn.execute(f"""
+                SELECT DISTINCT l.key FROM lookup_keys l
+                JOIN master_companies m ON m.{column} = l.key
+            """).fetchall()
+            return {row[0] for row in rows}
+
+    def _get_matcher(self, min_score):
+        """Get the in-memory fuzzy matcher for min_score, loading it from the table once per process"""
+        with self._matchers_lock:
+            matcher = self._matchers.get(min_score)
+            if matcher is None:
+                matcher = CompanyMatcher(min_score)
+                with closing(self._connect()) as conn:
+                    matcher.add_all(row[0] for row in conn.execute('SELECT DISTINCT normalized FROM master_companies'))
+                self._matchers[min_score] = matcher
+            return matcher
+
+    def get_companies(self):
+        """Return every company name in the index"""
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute('SELECT company FROM master_companies')}
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_master_index(config):
+    """Get the process-wide MasterIndex for the configured master sheet"""
+    key = (config.MASTER_INDEX_PATH, config.MASTER_SHEET_ID, config.MASTER_SHEET_NAME)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = MasterIndex(
+                config.MASTER_INDEX_PATH,
+                config.MASTER_SHEET_ID,
+                config.MASTER_SHEET_NAME,
+                len(config.MASTER_SHEET_COLUMNS)
+            )
+        return _indexes[key]
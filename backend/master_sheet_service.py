@@ -1,60 +1,39 @@
 import os
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import pandas as pd
 from datetime import datetime
-from config import Config
+from config import get_config
+from sheets_client import get_sheets_client_pool, get_sheet_id, spreadsheet_write_lock
+from block_writer import BlockWriter
+from master_index import get_master_index
+from metrics import time_stage, ROWS_WRITTEN
 
 class MasterSheetService:
-    def __init__(self):
-        self.config = Config()
-        self.creds = None
-        self.service = None
-        self._authenticate()
+    def __init__(self, pool=None):
+        self.config = get_config()
+        self.pool = pool or get_sheets_client_pool()
+        self.creds = self.pool.creds
+        # JobCheckpoint of the upload job, if its writes should be resumable
+        self.checkpoint = None
     
-    def _authenticate(self):
-        """Authenticate with Google Sheets API"""
+    @property
+    def index(self):
+        """Local index of the master sheet's companies"""
+        return get_master_index(self.config)
+    
+    @time_stage('master_read')
+    def sync_index(self):
+        """Bring the local master index up to date with rows added to the master sheet"""
         try:
-            # First try to use credentials from environment variables
-            if self.config.GOOGLE_SHEETS_CREDENTIALS:
-                print("Using credentials from environment variables")
-                self.creds = Credentials.from_service_account_info(
-                    self.config.GOOGLE_SHEETS_CREDENTIALS,
-                    ['https://www.googleapis.com/auth/spreadsheets']
-                )
-            else:
-                # Fall back to credential files
-                if os.path.exists(self.config.GOOGLE_SHEETS_CREDENTIALS_FILE):
-                    print("Using credentials from file")
-                    self.creds = Credentials.from_service_account_file(
-                        self.config.GOOGLE_SHEETS_CREDENTIALS_FILE,
-                        ['https://www.googleapis.com/auth/spreadsheets']
-                    )
-                else:
-                    raise FileNotFoundError(f"Credentials file not found: {self.config.GOOGLE_SHEETS_CREDENTIALS_FILE}")
-            
-            # If no valid credentials, get new ones
-            if not self.creds or not self.creds.valid:
-                if self.creds and self.creds.expired and self.creds.refresh_token:
-                    self.creds.refresh(Request())
-                else:
-                    # For OAuth flow (if using user credentials instead of service account)
-                    if os.path.exists(self.config.GOOGLE_SHEETS_TOKEN_FILE):
-                        self.creds = Credentials.from_authorized_user_file(
-                            self.config.GOOGLE_SHEETS_TOKEN_FILE,
-                            ['https://www.googleapis.com/auth/spreadsheets']
-                        )
-                    else:
-                        raise Exception("No valid credentials found")
+            if not self.config.MASTER_SHEET_ID:
+                return None, "MASTER_SHEET_ID not configured"
             
-            self.service = build('sheets', 'v4', credentials=self.creds)
+            with self.pool.checkout() as service:
+                return self.index.sync(service), None
             
         except Exception as e:
-            print(f"ERROR: MasterSheetService authentication failed: {str(e)}")
-            raise
+            print(f"ERROR: Failed to sync master index: {str(e)}")
+            return None, f"Failed to sync master index: {str(e)}"
     
     def get_existing_companies(self):
         """Get all existing companies from master sheet (for duplicate prevention)"""
@@ -63,55 +42,66 @@ class MasterSheetService:
                 print("ERROR: MASTER_SHEET_ID not configured")
                 return set()
             
-            # Get all data from master sheet
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                range=f"{self.config.MASTER_SHEET_NAME}!A:C"
-            ).execute()
+            self.sync_index()
+            return self.index.get_companies()
             
-            values = result.get('values', [])
-            if not values:
+        except Exception as e:
+            print(f"ERROR: Failed to get existing companies from master sheet: {str(e)}")
+            return set()
+    
+    def find_existing_companies(self, company_names):
+        """Return the given company names that already exist in the master sheet"""
+        try:
+            if not self.config.MASTER_SHEET_ID:
+                print("ERROR: MASTER_SHEET_ID not configured")
                 return set()
             
-            # Skip header row, extract company names from column B
-            existing_companies = set()
-            for row in values[1:]:  # Skip header
-                if len(row) >= 2 and row[1]:  # Check if Company column has value
-                    existing_companies.add(row[1].strip())
-            
-            return existing_companies
+            self.sync_index()
+            return self.index.find_existing(company_names, self.config.DUPLICATE_MIN_MATCH_SCORE)
             
         except Exception as e:
-            print(f"ERROR: Failed to get existing companies from master sheet: {str(e)}")
+            print(f"ERROR: Failed to look up companies in master index: {str(e)}")
             return set()
     
-    def add_company_to_master(self, client_name, company_name):
+    def find_existing_keys(self, keys_by_type):
+        """Look up normalized dedupe keys in the master index after a single sync
+        
+        Args:
+            keys_by_type: {'company' | 'website' | 'linkedin': iterable of normalized keys}
+        
+        Returns:
+            dict: the same key types mapped to the set of keys already in the master sheet
+        """
+        try:
+            if not self.config.MASTER_SHEET_ID:
+                print("ERROR: MASTER_SHEET_ID not configured")
+                return {key_type: set() for key_type in keys_by_type}
+            
+            self.sync_index()
+            return {
+                key_type: self.index.find_existing_keys(key_type, keys, self.config.DUPLICATE_MIN_MATCH_SCORE)
+                for key_type, keys in keys_by_type.items()
+            }
+            
+        except Exception as e:
+            print(f"ERROR: Failed to look up keys in master index: {str(e)}")
+            return {key_type: set() for key_type in keys_by_type}
+    
+    def add_company_to_master(self, client_name, company_name, website='', linkedin=''):
         """Add a single company to the master sheet"""
         try:
             if not self.config.MASTER_SHEET_ID:
                 return False, "Master sheet ID not configured"
             
             # Prepare the row data
-            row_data = [client_name, company_name, self.config.DEFAULT_VALUES["Date"]]
+            row_data = [client_name, company_name, self.config.DEFAULT_VALUES["Date"], website, linkedin]
             
-            # Find next available row
-            next_row, error = self.find_next_available_row()
-            if error:
-                return False, f"Failed to find next available row: {error}"
-            
-            # Add the row
-            range_name = f"{self.config.MASTER_SHEET_NAME}!A{next_row}:C{next_row}"
-            body = {'values': [row_data]}
-            
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
-            
-            # Apply client-specific background color
-            self.apply_client_color(next_row, client_name)
+            with spreadsheet_write_lock(self.config.MASTER_SHEET_ID):
+                # Append the row after the last row of the master sheet
+                next_row = self._append_rows([row_data])
+                
+                # Apply client-specific background color
+                self.apply_client_color(next_row, client_name)
             
             return True, f"Successfully added {company_name} to master sheet"
             
@@ -120,7 +110,11 @@ class MasterSheetService:
             return False, f"Failed to add company: {str(e)}"
     
     def add_companies_to_master(self, companies_data):
-        """Add multiple companies to the master sheet efficiently"""
+        """Add multiple companies to the master sheet efficiently
+        
+        Each entry is [client_name, company_name, date_added] optionally followed by
+        the company's website and LinkedIn URL, which are kept as dedupe keys.
+        """
         try:
             if not self.config.MASTER_SHEET_ID:
                 return False, "Master sheet ID not configured"
@@ -128,32 +122,18 @@ class MasterSheetService:
             if not companies_data:
                 return True, "No companies to add"
             
-            # Find next available row
-            next_row, error = self.find_next_available_row()
-            if error:
-                return False, f"Failed to find next available row: {error}"
-            
             # Prepare all rows at once
             rows_data = []
             for company_data in companies_data:
-                client_name, company_name, date_added = company_data
-                rows_data.append([client_name, company_name, date_added])
-            
-            # Add all rows in a single API call
-            range_name = f"{self.config.MASTER_SHEET_NAME}!A{next_row}:C{next_row + len(rows_data) - 1}"
-            body = {'values': rows_data}
+                client_name, company_name, date_added, *dedupe_keys = company_data
+                rows_data.append([client_name, company_name, date_added, *dedupe_keys])
             
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
-            
-            # Apply client-specific background colors for all rows
-            for i, company_data in enumerate(companies_data):
-                client_name = company_data[0]
-                self.apply_client_color(next_row + i, client_name)
+            with spreadsheet_write_lock(self.config.MASTER_SHEET_ID):
+                # Append all rows in a single API call
+                next_row = self._append_rows(rows_data)
+                
+                # Apply client-specific background colors for all rows in one batch
+                self.apply_client_colors(next_row, [company_data[0] for company_data in companies_data])
             
             return True, f"Successfully added {len(companies_data)} companies to master sheet"
             
@@ -161,87 +141,126 @@ class MasterSheetService:
             print(f"ERROR: Failed to add companies to master sheet: {str(e)}")
             return False, f"Failed to add companies: {str(e)}"
     
+    @time_stage('master_write')
+    def _append_rows(self, rows_data):
+        """Append rows after the master sheet's last row and return the first row written
+        
+        The Sheets API finds the end of the table server-side, so no read is needed
+        to locate the write position. Large appends are written in checkpointed
+        blocks (see BlockWriter).
+        """
+        next_row, _ = BlockWriter(self.pool).write(
+            self.config.MASTER_SHEET_ID, self.config.MASTER_SHEET_NAME, self._last_column(), rows_data, self.checkpoint
+        )
+        self.index.record_rows(next_row, rows_data)
+        ROWS_WRITTEN.inc(len(rows_data), sheet='master')
+        return next_row
+    
+    def _last_column(self):
+        """Letter of the master sheet's last column"""
+        return chr(64 + len(self.config.MASTER_SHEET_COLUMNS))
+    
     def find_next_available_row(self):
         """Find the next available row in the master sheet"""
         try:
             if not self.config.MASTER_SHEET_ID:
                 return None, "Master sheet ID not configured"
             
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                range=f"{self.config.MASTER_SHEET_NAME}!A:C"
-            ).execute()
-            
-            values = result.get('values', [])
-            next_row = len(values) + 1
+            # The master index only downloads rows added since its last sync
+            row_count, error = self.sync_index()
+            if error:
+                return None, error
             
-            return next_row, None
+            return row_count + 1, None
             
         except Exception as e:
             print(f"ERROR: Failed to find next available row: {str(e)}")
             return None, f"Failed to find next row: {str(e)}"
     
+    def _get_client_color(self, client_name):
+        """Get the background color used for a client's rows (set per client in the client registry)"""
+        return self.config.CLIENT_COLORS.get(client_name)
+    
     def apply_client_color(self, row_number, client_name):
         """Apply client-specific background color to a row"""
+        return self.apply_client_colors(row_number, [client_name])
+    
+    @time_stage('coloring')
+    def apply_client_colors(self, start_row, client_names):
+        """Apply client-specific background colors to consecutive rows starting at start_row
+        
+        Consecutive rows for the same client are merged into a single range and all
+        ranges are sent in as few batchUpdate calls as the payload limit allows.
+        """
         try:
             if not self.config.MASTER_SHEET_ID:
                 return False, "Master sheet ID not configured"
             
-            # Define client colors
-            colors = {
-                'Client A': {'red': 0.9, 'green': 0.9, 'blue': 1.0},  # Light blue
-                'Client B': {'red': 1.0, 'green': 0.9, 'blue': 0.9}   # Light red
-            }
+            if not client_names:
+                return True, "No rows to color"
+            
+            sheet_id = self._get_sheet_id(self.config.MASTER_SHEET_NAME)
+            
+            # Merge runs of rows belonging to the same client
+            requests = []
+            missing_colors = set()
+            run_start = 0
+            for i in range(1, len(client_names) + 1):
+                if i < len(client_names) and client_names[i] == client_names[run_start]:
+                    continue
+                
+                client_name = client_names[run_start]
+                color = self._get_client_color(client_name)
+                if color is None:
+                    missing_colors.add(client_name)
+                else:
+                    requests.append({
+                        'repeatCell': {
+                            'range': {
+                                'sheetId': sheet_id,
+                                'startRowIndex': start_row - 1 + run_start,
+                                'endRowIndex': start_row - 1 + i,
+                                'startColumnIndex': 0,
+                                'endColumnIndex': len(self.config.MASTER_SHEET_COLUMNS)
+                            },
+                            'cell': {
+                                'userEnteredFormat': {
+                                    'backgroundColor': color
+                                }
+                            },
+                            'fields': 'userEnteredFormat.backgroundColor'
+                        }
+                    })
+                run_start = i
             
-            if client_name not in colors:
+            for client_name in missing_colors:
                 print(f"WARNING: No color defined for client: {client_name}")
-                return False, f"No color defined for client: {client_name}"
-            
-            color = colors[client_name]
             
-            # Apply background color to the entire row
-            requests = [{
-                'repeatCell': {
-                    'range': {
-                        'sheetId': self._get_sheet_id(self.config.MASTER_SHEET_NAME),
-                        'startRowIndex': row_number - 1,
-                        'endRowIndex': row_number,
-                        'startColumnIndex': 0,
-                        'endColumnIndex': 3
-                    },
-                    'cell': {
-                        'userEnteredFormat': {
-                            'backgroundColor': color
-                        }
-                    },
-                    'fields': 'userEnteredFormat.backgroundColor'
-                }
-            }]
+            if not requests:
+                return False, f"No color defined for client: {', '.join(sorted(missing_colors))}"
             
-            body = {'requests': requests}
-            result = self.service.spreadsheets().batchUpdate(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                body=body
-            ).execute()
+            # Send all formatting in as few batchUpdate calls as possible
+            batch_size = self.config.FORMAT_BATCH_MAX_REQUESTS
+            for i in range(0, len(requests), batch_size):
+                body = {'requests': requests[i:i + batch_size]}
+                with self.pool.checkout() as service:
+                    service.spreadsheets().batchUpdate(
+                        spreadsheetId=self.config.MASTER_SHEET_ID,
+                        body=body
+                    ).execute()
             
-            return True, f"Applied color to row {row_number}"
+            end_row = start_row + len(client_names) - 1
+            return True, f"Applied colors to rows {start_row}-{end_row} in {len(requests)} ranges"
             
         except Exception as e:
             print(f"ERROR: Failed to apply client color: {str(e)}")
             return False, f"Failed to apply color: {str(e)}"
     
     def _get_sheet_id(self, sheet_name):
-        """Get the sheet ID by name"""
+        """Get the sheet ID by name (cached per spreadsheet for the life of the process)"""
         try:
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.config.MASTER_SHEET_ID
-            ).execute()
-            
-            for sheet in spreadsheet['sheets']:
-                if sheet['properties']['title'] == sheet_name:
-                    return sheet['properties']['sheetId']
-            
-            return None
+            with self.pool.checkout() as service:
+                return get_sheet_id(service, self.config.MASTER_SHEET_ID, sheet_name)
         except Exception as e:
             print(f"ERROR: Failed to get sheet ID: {str(e)}")
             return None
@@ -253,9 +272,10 @@ class MasterSheetService:
                 return False, "MASTER_SHEET_ID not configured"
             
             # Try to get sheet info
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.config.MASTER_SHEET_ID
-            ).execute()
+            with self.pool.checkout() as service:
+                spreadsheet = service.spreadsheets().get(
+                    spreadsheetId=self.config.MASTER_SHEET_ID
+                ).execute()
             
             sheet_title = spreadsheet['properties']['title']
             return True, f"Connected to master sheet: {sheet_title}"
@@ -270,10 +290,11 @@ class MasterSheetService:
                 return False, "MASTER_SHEET_ID not configured"
             
             # Check if headers already exist
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                range=f"{self.config.MASTER_SHEET_NAME}!A1:C1"
-            ).execute()
+            with self.pool.checkout() as service:
+                result = service.spreadsheets().values().get(
+                    spreadsheetId=self.config.MASTER_SHEET_ID,
+                    range=f"{self.config.MASTER_SHEET_NAME}!A1:{self._last_column()}1"
+                ).execute()
             
             values = result.get('values', [])
             
@@ -282,15 +303,16 @@ class MasterSheetService:
                 return True, "Master sheet headers already exist"
             
             # Add headers if they don't exist
-            range_name = f"{self.config.MASTER_SHEET_NAME}!A1:C1"
+            range_name = f"{self.config.MASTER_SHEET_NAME}!A1:{self._last_column()}1"
             body = {'values': [self.config.MASTER_SHEET_COLUMNS]}
             
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
+            with self.pool.checkout() as service:
+                result = service.spreadsheets().values().update(
+                    spreadsheetId=self.config.MASTER_SHEET_ID,
+                    range=range_name,
+                    valueInputOption='RAW',
+                    body=body
+                ).execute()
             
             # Format headers (bold, centered, background color)
             self._format_headers()
@@ -311,7 +333,7 @@ class MasterSheetService:
                         'startRowIndex': 0,
                         'endRowIndex': 1,
                         'startColumnIndex': 0,
-                        'endColumnIndex': 3
+                        'endColumnIndex': len(self.config.MASTER_SHEET_COLUMNS)
                     },
                     'cell': {
                         'userEnteredFormat': {
@@ -328,10 +350,11 @@ class MasterSheetService:
             }]
             
             body = {'requests': requests}
-            result = self.service.spreadsheets().batchUpdate(
-                spreadsheetId=self.config.MASTER_SHEET_ID,
-                body=body
-            ).execute()
+            with self.pool.checkout() as service:
+                result = service.spreadsheets().batchUpdate(
+                    spreadsheetId=self.config.MASTER_SHEET_ID,
+                    body=body
+                ).execute()
             
             return True, "Headers formatted successfully"
             
@@ -0,0 +1,194 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def _samples(self):
+        """List of (suffix, labels, value) to render"""
+        with self._lock:
+            return [('', key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels"""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters can only increase')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        """Sum of the count over every label set"""
+        with self._lock:
+            return sum(self._values.values())
+
+class Gauge(_Metric):
+    """Value that goes up and down; can be read from a callback at scrape time"""
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Report function() as the (unlabelled) value on every scrape"""
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            return [('', (), self._function())]
+        return super()._samples()
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, with sum and count"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def totals(self):
+        """Map of label values to (sum, count) of the observations so far"""
+        with self._lock:
+            return {
+                tuple(value for _, value in key): (series['sum'], series['count'])
+                for key, series in self._values.items()
+            }
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    samples.append(('_bucket', key + (('le', _format_value(bound)),), count))
+                samples.append(('_sum', key, series['sum']))
+                samples.append(('_count', key, series['count']))
+        return samples
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Process-wide registry and the metrics the backend reports
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'crunchbase_upload_stage_seconds',
+    'Time spent in each upload stage, excluding nested stages',
+    ['stage']
+)
+ROWS_PROCESSED = REGISTRY.counter('crunchbase_rows_processed_total', 'CSV rows checked for duplicates')
+DUPLICATES_SKIPPED = REGISTRY.counter('crunchbase_duplicates_skipped_total', 'CSV rows skipped as duplicates')
+ROWS_WRITTEN = REGISTRY.counter('crunchbase_rows_written_total', 'Rows appended to Google Sheets', ['sheet'])
+SHEETS_API_CALLS = REGISTRY.counter('crunchbase_sheets_api_calls_total', 'Sheets API requests sent, retries included', ['method'])
+SHEETS_API_RETRIES = REGISTRY.counter('crunchbase_sheets_api_retries_total', 'Sheets API requests retried after a failure', ['method'])
+SHEETS_API_THROTTLED_SECONDS = REGISTRY.counter('crunchbase_sheets_api_throttled_seconds_total', 'Time spent waiting on the Sheets rate limiter')
+JOBS_QUEUED = REGISTRY.gauge('crunchbase_jobs_queued', 'Upload jobs waiting for a worker')
+JOBS_RUNNING = REGISTRY.gauge('crunchbase_jobs_running', 'Upload jobs currently running')
+
+_stage_stack = threading.local()
+
+@contextmanager
+def time_stage(stage):
+    """Record the time spent in a block as one observation of an upload stage
+
+    Time spent in stages nested inside the block (for example the master read
+    triggered by duplicate detection) is charged to the inner stage only.
+    """
+    stack = getattr(_stage_stack, 'stack', None)
+    if stack is None:
+        stack = _stage_stack.stack = []
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        STAGE_SECONDS.observe(elapsed - nested, stage=stage)
@@ -0,0 +1,230 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from config import get_config
+from sheets_client import get_sheets_client_pool
+from master_sheet_service import MasterSheetService
+from google_sheets_service import GoogleSheetsService, NO_NEW_COMPANIES
+
+# How rows of a multi-client upload are assigned to clients
+ROUTING_MODES = ('round_robin', 'column')
+
+class MultiClientUploadService:
+    """Upload one parsed CSV to several clients' sheets in a single pass.
+
+    The upload is deduplicated once, against the master index and within
+    itself, before each new row is routed to one client: either round-robin
+    or by a CSV column whose values are client IDs or names. Client sheets are
+    written concurrently, then every client's rows go to the master sheet in
+    one append once all of them succeeded.
+    """
+
+    def __init__(self, client_ids, routing='round_robin', routing_column=None, master_service=None, pool=None):
+        self.config = get_config()
+        self.pool = pool or get_sheets_client_pool()
+        self.master_service = master_service or MasterSheetService(pool=self.pool)
+        self.client_ids = list(dict.fromkeys(client_ids))
+        self.routing = routing
+        self.routing_column = routing_column
+        self.services = {
+            client_id: GoogleSheetsService(client_id=client_id, master_service=self.master_service, pool=self.pool)
+            for client_id in self.client_ids
+        }
+
+        # Rows added per client over the whole upload
+        self.client_counts = {client_id: 0 for client_id in self.client_ids}
+        self._sheet_headers = {}
+        self._mapped_columns = None
+        self._dedupe_columns = None
+        self._next_client = 0
+
+    def validate_request(self):
+        """Check the client IDs and routing rule before any work is queued; returns an error or None"""
+        if len(self.client_ids) < 2:
+            return "Multi-client uploads need at least two client IDs"
+        unknown = [client_id for client_id in self.client_ids if client_id not in self.config.CLIENT_SHEETS]
+        if unknown:
+            return f"Unknown client ID(s): {', '.join(unknown)}"
+        if self.routing not in ROUTING_MODES:
+            return f"Unknown routing '{self.routing}', expected one of: {', '.join(ROUTING_MODES)}"
+        if self.routing == 'column' and not self.routing_column:
+            return "Column routing needs a routing_column"
+        return None
+
+    def set_checkpoint(self, checkpoint):
+        """Make every sheet write of this upload resumable through one JobCheckpoint"""
+        self.master_service.checkpoint = checkpoint
+        for service in self.services.values():
+            service.checkpoint = checkpoint
+
+    def client_names(self):
+        return [self.config.CLIENT_SHEETS[client_id]['name'] for client_id in self.client_ids]
+
+    def _load_sheet_headers(self):
+        """Read every client sheet's headers once; returns an error or None"""
+        for client_id, service in self.services.items():
+            sheet_headers, error = service.get_existing_headers()
+            if error:
+                return f"Failed to get sheet headers for {client_id}: {error}"
+            self._sheet_headers[client_id] = sheet_headers
+        return None
+
+    def _map_columns(self, csv_columns):
+        """Resolve each client's column mapping and the mapping used for deduplication"""
+        self._mapped_columns = {}
+        company_field = self.config.DUPLICATE_CHECK_FIELDS[0]
+        for client_id, service in self.services.items():
+            mapped_columns = service.map_csv_columns_to_sheet(csv_columns, self._sheet_headers[client_id])
+            if company_field not in mapped_columns:
+                return f"No CSV column maps to '{company_field}' in {client_id}'s sheet"
+            self._mapped_columns[client_id] = mapped_columns
+
+        # Deduplicate on every key column any of the client sheets has
+        all_headers = [header for headers in self._sheet_headers.values() for header in headers]
+        self._dedupe_columns = self.services[self.client_ids[0]].map_csv_columns_to_sheet(csv_columns, all_headers)
+
+        if self.routing == 'column' and self.routing_column not in csv_columns:
+            return f"Routing column '{self.routing_column}' not found in CSV"
+        return None
+
+    def _route(self, data):
+        """Split new rows between clients
+
+        Returns:
+            Tuple[dict, int]: ({client_id: rows for that client}, rows matching no client)
+        """
+        if self.routing == 'round_robin':
+            # Continue the rotation across chunks of a streamed upload
+            positions = (np.arange(len(data)) + self._next_client) % len(self.client_ids)
+            self._next_client = (self._next_client + len(data)) % len(self.client_ids)
+            targets = pd.Series(np.array(self.client_ids)[positions], index=data.index)
+        else:
+            lookup = {}
+            for client_id in self.client_ids:
+                lookup[client_id.lower()] = client_id
+                lookup[self.config.CLIENT_SHEETS[client_id]['name'].lower()] = client_id
+            targets = data[self.routing_column].astype(str).str.strip().str.lower().map(lookup)
+
+        shares = {
+            client_id: data[(targets == client_id).to_numpy()]
+            for client_id in self.client_ids
+        }
+        return {client_id: share for client_id, share in shares.items() if len(share) > 0}, int(targets.isna().sum())
+
+    def _upload_batch(self, data):
+        """Deduplicate, route and write one batch of rows
+
+        Returns:
+            Tuple[dict, int, int, Optional[str]]: (rows added per client, duplicates, unrouted rows, error)
+        """
+        dedupe_service = self.services[self.client_ids[0]]
+        new_companies_data = dedupe_service.select_new_companies(data, self._dedupe_columns)
+        duplicates = len(data) - len(new_companies_data)
+        if len(new_companies_data) == 0:
+            return {}, duplicates, 0, None
+
+        shares, unrouted = self._route(new_companies_data)
+
+        # Client sheets are independent, so they are written concurrently
+        def write(client_id):
+            try:
+                return self.services[client_id].write_client_rows(
+                    shares[client_id], self._mapped_columns[client_id], self._sheet_headers[client_id]
+                )
+            except Exception as e:
+                print(f"ERROR: Failed to write rows for {client_id}: {str(e)}")
+                return None, str(e)
+
+        with ThreadPoolExecutor(max_workers=len(shares) or 1) as executor:
+            results = dict(zip(shares, executor.map(write, shares)))
+
+        added = {}
+        errors = []
+        master_data = []
+        for client_id, (next_row, error) in results.items():
+            if error:
+                errors.append(f"{client_id}: {error}")
+                continue
+            added[client_id] = len(shares[client_id])
+            self.client_counts[client_id] += len(shares[client_id])
+
+            # Rows stay grouped by client so coloring needs one range per client
+            client_name = self.config.CLIENT_SHEETS[client_id]['name']
+            master_data.extend(self.services[client_id].build_master_rows(
+                shares[client_id], self._mapped_columns[client_id], client_name
+            ))
+
+        # One master append for every client written in this batch. If any
+        # client failed the master write waits for the retry, which replays this
+        # batch's plan and writes every client's rows together; the master write
+        # is checkpointed per batch, so writing only part of them now would make
+        # the retry skip the rest.
+        if errors:
+            return added, duplicates, unrouted, "; ".join(errors)
+        if master_data:
+            master_success, master_message = self.master_service.add_companies_to_master(master_data)
+            if not master_success:
+                # Reported as an error so the upload is retried rather than cached as done
+                print(f"ERROR: Failed to add companies to master sheet: {master_message}")
+                errors.append(f"master sheet: {master_message}")
+
+        return added, duplicates, unrouted, "; ".join(errors) or None
+
+    def append_data(self, data):
+        """Upload a whole parsed CSV to the clients"""
+        return self.append_data_stream([data])
+
+    def append_data_stream(self, chunks, progress_callback=None):
+        """Upload a CSV chunk by chunk; each chunk is deduplicated, routed and written before the next"""
+        try:
+            error = self._load_sheet_headers()
+            if error:
+                return False, error
+
+            total_rows = 0
+            added_rows = 0
+            duplicate_rows = 0
+            unrouted_rows = 0
+
+            for chunk in chunks:
+                total_rows += len(chunk)
+
+                # Chunks share the CSV header, so the mappings are resolved once
+                if self._mapped_columns is None:
+                    error = self._map_columns(chunk.columns.tolist())
+                    if error:
+                        return False, error
+
+                added, duplicates, unrouted, error = self._upload_batch(chunk)
+                added_rows += sum(added.values())
+                duplicate_rows += duplicates
+                unrouted_rows += unrouted
+                if error:
+                    return False, f"Failed to write sheets ({error}) after adding {added_rows} companies; retry the job to finish"
+
+                if progress_callback:
+                    progress_callback(total_rows, added_rows)
+
+            if added_rows == 0 and unrouted_rows:
+                return False, f"{NO_NEW_COMPANIES}. {unrouted_rows} new rows had a '{self.routing_column}' matching no selected client."
+            if added_rows == 0:
+                return False, f"{NO_NEW_COMPANIES}. All {total_rows} companies already exist in master sheet or repeat earlier rows."
+
+            per_client = ", ".join(
+                f"{self.config.CLIENT_SHEETS[client_id]['name']}: {count}"
+                for client_id, count in self.client_counts.items()
+            )
+            message_parts = [
+                f"Successfully added {added_rows} new companies across {len(self.client_ids)} clients ({per_client})",
+                f"Updated master sheet with {added_rows} new company entries"
+            ]
+            if duplicate_rows:
+                message_parts.append(f"Skipped {duplicate_rows} duplicate companies")
+            if unrouted_rows:
+                message_parts.append(f"Skipped {unrouted_rows} rows whose '{self.routing_column}' matched no selected client")
+
+            return True, ". ".join(message_parts)
+
+        except Exception as e:
+            print(f"ERROR: Failed to upload to multiple clients: {str(e)}")
+            return False, f"Unexpected error: {str(e)}"
@@ -0,0 +1,172 @@
+import json
+import random
+import socket
+import threading
+import time
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from config import get_config
+from metrics import SHEETS_API_CALLS, SHEETS_API_RETRIES, SHEETS_API_THROTTLED_SECONDS
+
+# HTTP statuses worth retrying: quota exceeded and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Statuses that mean the request was rejected before it was applied, so even
+# non-idempotent calls (values.append would duplicate rows) can be retried
+REJECTED_STATUSES = {429, 503}
+
+# API methods that must not be replayed after an ambiguous failure
+NON_IDEMPOTENT_METHODS = {'sheets.spreadsheets.values.append'}
+
+# batchUpdate requests that add rows or columns: replayed, they would add them twice
+NON_IDEMPOTENT_BATCH_REQUESTS = {'insertDimension', 'appendDimension', 'appendCells'}
+
+def is_idempotent(method_id, body=None):
+    """Whether a request can be replayed after a failure that may have been applied"""
+    if method_id in NON_IDEMPOTENT_METHODS:
+        return False
+    if method_id == 'sheets.spreadsheets.batchUpdate' and body:
+        if isinstance(body, (str, bytes)):
+            body = json.loads(body)
+        return not any(name in NON_IDEMPOTENT_BATCH_REQUESTS for request in body.get('requests', []) for name in request)
+    return True
+
+class TokenBucket:
+    """Thread-safe token bucket: refills at rate_per_minute, holds at most burst tokens"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_second)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate_per_second
+            time.sleep(delay)
+            waited += delay
+
+class SheetsRequestLayer:
+    """Shared gate for every Sheets API call made by this process.
+
+    Each call first takes a token from a bucket sized to the per-minute Sheets
+    quota, then retryable failures are retried with exponential backoff and
+    full jitter. Counters record how often calls were throttled or retried.
+    """
+
+    def __init__(self, requests_per_minute, burst, max_retries, base_delay, max_delay):
+        self.bucket = TokenBucket(requests_per_minute, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'throttled': 0,
+            'throttled_seconds': 0.0,
+            'retried': 0,
+            'failed': 0
+        }
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def get_stats(self):
+        """Snapshot of the request counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['throttled_seconds'] = round(stats['throttled_seconds'], 3)
+        return stats
+
+    def call(self, fn, method_id=None, idempotent=None):
+        """Run fn() under the rate limit, retrying retryable failures
+
+        Non-idempotent calls (see is_idempotent) are only retried when the error
+        shows the request was rejected before it was applied.
+        """
+        if idempotent is None:
+            idempotent = is_idempotent(method_id)
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._count('calls')
+            SHEETS_API_CALLS.inc(method=method_id or 'unknown')
+            if waited > 0:
+                self._count('throttled')
+                self._count('throttled_seconds', waited)
+                SHEETS_API_THROTTLED_SECONDS.inc(waited)
+
+            try:
+                return fn()
+            except Exception as e:
+                retry_after = self._retry_delay(e, idempotent, attempt)
+                if retry_after is None:
+                    self._count('failed')
+                    raise
+                attempt += 1
+                self._count('retried')
+                SHEETS_API_RETRIES.inc(method=method_id or 'unknown')
+                print(f"WARNING: Sheets API call {method_id or ''} failed ({str(e)[:200]}), retry {attempt}/{self.max_retries} in {retry_after:.1f}s")
+                time.sleep(retry_after)
+
+    def _retry_delay(self, error, idempotent, attempt):
+        """Seconds to wait before retrying, or None if the error should not be retried"""
+        if attempt >= self.max_retries:
+            return None
+
+        if isinstance(error, HttpError):
+            status = error.resp.status
+            if status not in RETRYABLE_STATUSES:
+                return None
+            if not idempotent and status not in REJECTED_STATUSES:
+                return None
+            retry_after = error.resp.get('retry-after')
+            if retry_after and str(retry_after).isdigit():
+                return min(self.max_delay, float(retry_after))
+        elif isinstance(error, (ConnectionError, TimeoutError, socket.timeout)):
+            if not idempotent:
+                return None
+        else:
+            return None
+
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class RateLimitedHttpRequest(HttpRequest):
+    """HttpRequest whose execute() goes through the process-wide request layer"""
+
+    def execute(self, http=None, num_retries=0):
+        parent_execute = super().execute
+        return get_request_layer().call(
+            lambda: parent_execute(http=http), self.methodId, is_idempotent(self.methodId, self.body)
+        )
+
+_layer = None
+_layer_lock = threading.Lock()
+
+def get_request_layer():
+    """Get the process-wide request layer, creating it from Config on first use"""
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                config = get_config()
+                _layer = SheetsRequestLayer(
+                    config.SHEETS_REQUESTS_PER_MINUTE,
+                    config.SHEETS_RATE_LIMIT_BURST,
+                    config.SHEETS_MAX_RETRIES,
+                    config.SHEETS_RETRY_BASE_DELAY,
+                    config.SHEETS_RETRY_MAX_DELAY
+                )
+    return _layer
@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import queue
+import threading
+from contextlib import contextmanager
+import httplib2
+import google_auth_httplib2
+from google.oauth2 import service_account
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build, build_from_document
+from config import get_config
+from rate_limiter import RateLimitedHttpRequest
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within one process
+    fcntl = None
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+class SheetsClientPool:
+    """Process-wide pool of authenticated Google Sheets API clients.
+
+    Credentials are loaded and refreshed once per process and the discovery
+    document is cached on disk. httplib2 is not thread-safe, so each client
+    (with its keep-alive HTTP connection) is checked out by one thread at a
+    time and returned afterwards; up to SHEETS_CLIENT_POOL_SIZE idle clients
+    are kept, so connections are reused across jobs and short-lived worker
+    threads. All clients share one rate limiter and retry layer (see
+    rate_limiter.py).
+    """
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.creds = None
+        self._discovery_doc = None
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue(maxsize=max(1, self.config.SHEETS_CLIENT_POOL_SIZE))
+        self._authenticate()
+
+    def _authenticate(self):
+        """Load credentials once for the whole process"""
+        try:
+            # First try to use credentials from environment variables
+            if self.config.GOOGLE_SHEETS_CREDENTIALS:
+                print("Using credentials from environment variables")
+                self.creds = service_account.Credentials.from_service_account_info(
+                    self.config.GOOGLE_SHEETS_CREDENTIALS, scopes=SCOPES
+                )
+            elif os.path.exists(self.config.GOOGLE_SHEETS_CREDENTIALS_FILE):
+                # Fall back to credential files
+                print("Using credentials from file")
+                self.creds = service_account.Credentials.from_service_account_file(
+                    self.config.GOOGLE_SHEETS_CREDENTIALS_FILE, scopes=SCOPES
+                )
+            elif os.path.exists(self.config.GOOGLE_SHEETS_TOKEN_FILE):
+                # For OAuth flow (if using user credentials instead of service account)
+                self.creds = Credentials.from_authorized_user_file(
+                    self.config.GOOGLE_SHEETS_TOKEN_FILE, SCOPES
+                )
+            else:
+                raise FileNotFoundError(f"Credentials file not found: {self.config.GOOGLE_SHEETS_CREDENTIALS_FILE}")
+
+            self.refresh_credentials()
+
+        except Exception as e:
+            print(f"ERROR: Sheets client authentication failed: {str(e)}")
+            raise
+
+    def refresh_credentials(self):
+        """Refresh the shared access token if it is missing or expired"""
+        with self._lock:
+            if self.creds.valid:
+                return
+            if isinstance(self.creds, Credentials) and not self.creds.refresh_token:
+                raise Exception("No valid credentials found")
+            self.creds.refresh(Request())
+
+    def _get_discovery_doc(self):
+        """Load the Sheets discovery document, caching it in memory and on disk"""
+        if self._discovery_doc is not None:
+            return self._discovery_doc
+
+        with self._lock:
+            if self._discovery_doc is not None:
+                return self._discovery_doc
+
+            cache_file = self.config.SHEETS_DISCOVERY_CACHE_FILE
+            if cache_file and os.path.exists(cache_file):
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    self._discovery_doc = json.load(f)
+                return self._discovery_doc
+
+            # Build once to obtain the document, then keep the parsed copy
+            service = build('sheets', 'v4', credentials=self.creds, cache_discovery=False)
+            self._discovery_doc = service._rootDesc
+
+            if cache_file:
+                try:
+                    cache_dir = os.path.dirname(cache_file)
+                    if cache_dir:
+                        os.makedirs(cache_dir, exist_ok=True)
+                    with open(cache_file, 'w', encoding='utf-8') as f:
+                        json.dump(self._discovery_doc, f)
+                except OSError as e:
+                    print(f"WARNING: Could not write discovery cache: {str(e)}")
+
+            return self._discovery_doc
+
+    def _build_service(self):
+        http = google_auth_httplib2.AuthorizedHttp(
+            self.creds, http=httplib2.Http(timeout=self.config.SHEETS_HTTP_TIMEOUT)
+        )
+        # Every request goes through the shared rate limiter and retry layer
+        return build_from_document(self._get_discovery_doc(), http=http, requestBuilder=RateLimitedHttpRequest)
+
+    @contextmanager
+    def checkout(self):
+        """Borrow a Sheets client for the duration of a with block
+
+        An idle client is reused when there is one; otherwise a new one is
+        built rather than waiting, so nested checkouts can't deadlock. Clients
+        returned while the pool is full are dropped.
+        """
+        self.refresh_credentials()
+        try:
+            service = self._idle.get_nowait()
+        except queue.Empty:
+            service = self._build_service()
+        try:
+            yield service
+        finally:
+            try:
+                self._idle.put_nowait(service)
+            except queue.Full:
+                pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_sheets_client_pool():
+    """Get the process-wide Sheets client pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = get_config()
+                if config.SHEETS_BACKEND == 'fake':
+                    from fake_sheets import FakeSheetsClientPool
+                    _pool = FakeSheetsClientPool(config=config)
+                else:
+                    _pool = SheetsClientPool(config)
+    return _pool
+
+def set_sheets_client_pool(pool):
+    """Replace the process-wide pool, e.g. with a FakeSheetsClientPool in benchmarks"""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+def get_sheets_service():
+    """Shortcut for checking out a client of the process-wide pool (use in a with block)"""
+    return get_sheets_client_pool().checkout()
+
+# Sheet (tab) IDs never change once created, so they are looked up once per process
+_sheet_id_cache = {}
+
+def get_sheet_id(service, spreadsheet_id, sheet_name):
+    """Get a tab's numeric sheet ID by name, or None if the spreadsheet has no such tab"""
+    cache_key = (spreadsheet_id, sheet_name)
+    if cache_key not in _sheet_id_cache:
+        spreadsheet = service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields='sheets.properties(sheetId,title)'
+        ).execute()
+        for sheet in spreadsheet['sheets']:
+            _sheet_id_cache[(spreadsheet_id, sheet['properties']['title'])] = sheet['properties']['sheetId']
+    return _sheet_id_cache.get(cache_key)
+
+class SpreadsheetWriteLock:
+    """Re-entrant lock serializing writes to one spreadsheet
+
+    Threads of this process take turns on an RLock; the outermost holder also
+    takes an exclusive flock on a lock file, so the web app and ingest_cli
+    processes on the same host take turns too. Writers on other hosts are not
+    covered: run one writer host per spreadsheet.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and self.path and fcntl:
+            try:
+                lock_file = open(self.path, 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except Exception:
+                self._lock.release()
+                raise
+            self._file = lock_file
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+_write_locks = {}
+_write_locks_lock = threading.Lock()
+
+def spreadsheet_write_lock(spreadsheet_id):
+    """Lock serializing writes to one spreadsheet (see SpreadsheetWriteLock)
+
+    Jobs writing to different spreadsheets proceed in parallel; jobs writing
+    to the same one take turns so their rows are not interleaved and block
+    writes can insert rows after their first block without another write
+    landing in between.
+    """
+    with _write_locks_lock:
+        if spreadsheet_id not in _write_locks:
+            lock_dir = get_config().WRITE_LOCK_DIR
+            path = None
+            if lock_dir:
+                os.makedirs(lock_dir, exist_ok=True)
+                path = os.path.join(lock_dir, re.sub(r'[^A-Za-z0-9_-]', '_', spreadsheet_id) + '.lock')
+            _write_locks[spreadsheet_id] = SpreadsheetWriteLock(path)
+        return _write_locks[spreadsheet_id]
+
+def parse_updated_range(updated_range):
+    """Get (first_row, last_row) from an A1 range such as "'Client A Data'!A12:H40" """
+    match = re.search(r'!\$?[A-Z]+\$?(\d+)(?::\$?[A-Z]+\$?(\d+))?$', updated_range)
+    if not match:
+        raise ValueError(f"Unexpected range in API response: {updated_range}")
+    first_row = int(match.group(1))
+    last_row = int(match.group(2) or first_row)
+    return first_row, last_row
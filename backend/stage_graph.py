@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class StageError(Exception):
+    """Raised by a stage (or re-raised by StageGraph.run) when a job cannot continue"""
+
+    def __init__(self, message, stage=None):
+        super().__init__(message)
+        self.stage = stage
+
+class StageGraph:
+    """Runs the stages of a job as soon as the stages they depend on have finished.
+
+    Stages that do not depend on each other (for example parsing the CSV and
+    reading the sheets) run concurrently, so a job takes roughly as long as its
+    longest chain of dependent stages. Each stage is called with the results of
+    the stages that finished before it.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._stages = {}
+
+    def add(self, name, fn, depends_on=()):
+        """Add a stage; fn(results) runs once every stage in depends_on has succeeded"""
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+        self._stages[name] = (fn, tuple(depends_on))
+
+    def run(self):
+        """Run every stage and return {stage: result}
+
+        If a stage raises, no further stages are started, the running ones are
+        allowed to finish, and the error is re-raised as a StageError.
+        """
+        results = {}
+        pending = dict(self._stages)
+        running = {}
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if failure is None:
+                    for name, (fn, depends_on) in list(pending.items()):
+                        if all(dependency in results for dependency in depends_on):
+                            running[executor.submit(fn, dict(results))] = name
+                            del pending[name]
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        if failure is None:
+                            failure = (name, e)
+
+        if failure is not None:
+            name, error = failure
+            if isinstance(error, StageError):
+                error.stage = error.stage or name
+                raise error
+            raise StageError(f"{name} failed: {str(error)}", name) from error
+        return results
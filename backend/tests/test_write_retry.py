@@ -0,0 +1,107 @@
+"""Retrying a failed upload job must finish its sheet writes without losing or repeating rows.
+
+Run from backend/:
+
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+
+# Runs against the in-memory fake Sheets backend without rate limiting
+os.environ['SHEETS_BACKEND'] = 'fake'
+os.environ['SHEETS_REQUESTS_PER_MINUTE'] = '1000000'
+os.environ['SHEETS_RATE_LIMIT_BURST'] = '1000000'
+
+import pandas as pd
+
+from block_writer import BlockWriter
+from config import reload_config
+from fake_sheets import FakeSheetsBackend, FakeSheetsClientPool
+from multi_client_service import MultiClientUploadService
+from sheets_client import set_sheets_client_pool
+from write_checkpoints import CheckpointStore, JobCheckpoint
+
+CLIENT_HEADERS = ['Date', 'Source', 'Campaign', 'Company Name', 'Website', 'Company Linkedin', 'POCs']
+
+class WriteRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        run_id = os.path.basename(self.work_dir.name)
+        os.environ.update({
+            'MASTER_SHEET_ID': f"{run_id}-master",
+            'MASTER_SHEET_NAME': 'Master',
+            'CLIENT_A_SHEET_ID': f"{run_id}-a",
+            'CLIENT_A_SHEET_NAME': 'Sheet1',
+            'CLIENT_B_SHEET_ID': f"{run_id}-b",
+            'CLIENT_B_SHEET_NAME': 'Sheet1',
+            'MASTER_INDEX_PATH': os.path.join(self.work_dir.name, 'master_index.sqlite3')
+        })
+        self.config = reload_config()
+
+        self.backend = FakeSheetsBackend()
+        self.backend.seed(self.config.MASTER_SHEET_ID, 'Master', [self.config.MASTER_SHEET_COLUMNS])
+        self.backend.seed(os.environ['CLIENT_A_SHEET_ID'], 'Sheet1', [CLIENT_HEADERS])
+        self.backend.seed(os.environ['CLIENT_B_SHEET_ID'], 'Sheet1', [CLIENT_HEADERS])
+        self.pool = FakeSheetsClientPool(self.backend)
+        set_sheets_client_pool(self.pool)
+        self.store = CheckpointStore(os.path.join(self.work_dir.name, 'write_checkpoints.sqlite3'))
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def data_rows(self, sheet_id, sheet_name='Sheet1'):
+        return self.backend.get_rows(sheet_id, sheet_name)[1:]
+
+    def test_multi_client_retry_writes_every_master_row_once(self):
+        data = pd.DataFrame({
+            'Organization Name': [f"Company {i}" for i in range(10)],
+            'Website': [f"company{i}.com" for i in range(10)],
+            'LinkedIn': [f"linkedin.com/company/company{i}" for i in range(10)]
+        })
+
+        # First attempt: client B's sheet write fails after client A's landed
+        upload = MultiClientUploadService(['client_a', 'client_b'], pool=self.pool)
+        upload.set_checkpoint(JobCheckpoint(self.store, 'job'))
+        def fail(*args, **kwargs):
+            raise RuntimeError('HTTP 503')
+        upload.services['client_b'].write_client_rows = fail
+        success, message = upload.append_data(data)
+        self.assertFalse(success, message)
+        self.assertEqual(len(self.data_rows(os.environ['CLIENT_A_SHEET_ID'])), 5)
+
+        # Retry with a fresh service, as a retried job gets
+        upload = MultiClientUploadService(['client_a', 'client_b'], pool=self.pool)
+        upload.set_checkpoint(JobCheckpoint(self.store, 'job'))
+        success, message = upload.append_data(data)
+        self.assertTrue(success, message)
+
+        self.assertEqual(len(self.data_rows(os.environ['CLIENT_A_SHEET_ID'])), 5)
+        self.assertEqual(len(self.data_rows(os.environ['CLIENT_B_SHEET_ID'])), 5)
+        master_companies = [row[1] for row in self.data_rows(self.config.MASTER_SHEET_ID, 'Master')]
+        self.assertEqual(sorted(master_companies), sorted(data['Organization Name']))
+        # The master index only records rows the sheet actually has
+        index = upload.master_service.index
+        self.assertEqual(index.row_count, len(master_companies) + 1)
+        self.assertEqual(index.get_companies(), set(master_companies))
+
+    def test_checkpoint_of_other_rows_is_not_resumed(self):
+        checkpoint = JobCheckpoint(self.store, 'job')
+        checkpoint.next_batch()
+        writer = BlockWriter(self.pool, block_rows=10)
+        sheet_id = self.config.MASTER_SHEET_ID
+
+        first_row, _ = writer.write(sheet_id, 'Master', 'E', [['a', 'x', '', '', '']], checkpoint)
+        # Same rows again: the checkpoint is resumed and nothing is written
+        self.assertEqual(writer.write(sheet_id, 'Master', 'E', [['a', 'x', '', '', '']], checkpoint), (first_row, first_row))
+        self.assertEqual(len(self.data_rows(sheet_id, 'Master')), 1)
+
+        # Different rows under the same key are a new write
+        rows = [['a', 'x', '', '', ''], ['b', 'y', '', '', '']]
+        start_row, last_row = writer.write(sheet_id, 'Master', 'E', rows, checkpoint)
+        self.assertEqual((start_row, last_row), (first_row + 1, first_row + 2))
+        self.assertEqual(self.data_rows(sheet_id, 'Master')[1:], rows)
+
+if __name__ == '__main__':
+    unittest.main()
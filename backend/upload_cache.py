@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+import sqlite3
+import time
+from contextlib import closing
+
+# Bytes read at a time while hashing an upload
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def hash_stream(stream):
+    """SHA-256 of a file-like object's remaining bytes; the stream is rewound afterwards"""
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    stream.seek(start)
+    return digest.hexdigest()
+
+def mapping_version(config):
+    """Fingerprint of every setting that changes what an upload writes or treats as a duplicate"""
+    settings = {
+        'column_mapping': config.COLUMN_MAPPING,
+        'default_values': config.DEFAULT_VALUES,
+        'duplicate_check_fields': config.DUPLICATE_CHECK_FIELDS,
+        'duplicate_min_match_score': config.DUPLICATE_MIN_MATCH_SCORE,
+        'master_sheet': [config.MASTER_SHEET_ID, config.MASTER_SHEET_NAME],
+        'client_sheets': config.CLIENT_SHEETS
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class UploadCache:
+    """SQLite cache of upload outcomes keyed by file content, target clients and mapping version.
+
+    Every row of a finished upload either was written to the master sheet or
+    already existed there, so re-running an identical upload can only report
+    that nothing is new. Its recorded outcome is returned instead, without
+    saving, parsing or deduplicating the file again.
+    """
+
+    def __init__(self, db_path, ttl_seconds=7 * 24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_results (
+                    cache_key TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    @staticmethod
+    def make_key(file_hash, client_ids, routing, routing_column, config):
+        """Cache key for one file uploaded to the given client(s) under the current configuration"""
+        target = json.dumps([sorted(client_ids), routing, routing_column])
+        return hashlib.sha256(f"{file_hash}|{target}|{mapping_version(config)}".encode('utf-8')).hexdigest()
+
+    def get(self, cache_key):
+        """Get {'job_id', 'result', 'created_at'} of an earlier identical upload, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT job_id, result, created_at FROM upload_results WHERE cache_key = ? AND created_at >= ?',
+                (cache_key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'job_id': row[0], 'result': json.loads(row[1]), 'created_at': row[2]}
+
+    def put(self, cache_key, job_id, result):
+        """Record the outcome of a finished upload"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO upload_results (cache_key, job_id, result, created_at) VALUES (?, ?, ?, ?)',
+                (cache_key, job_id, json.dumps(result), time.time())
+            )
+            conn.execute('DELETE FROM upload_results WHERE created_at < ?', (time.time() - self.ttl_seconds,))
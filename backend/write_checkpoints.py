@@ -0,0 +1,170 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+class CheckpointStore:
+    """SQLite record of how far each upload job got with its sheet writes.
+
+    For every batch of an upload (the whole file, or one chunk when streaming)
+    the rows picked as new by duplicate detection are saved as a plan, and for
+    every block write the start row, whether space was reserved and which
+    blocks were committed. A retried job replays the plan and skips committed
+    blocks instead of deduplicating again and writing rows twice.
+    """
+
+    def __init__(self, db_path, ttl_seconds=24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_eviction = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS write_plans (
+                    job_id TEXT NOT NULL,
+                    batch TEXT NOT NULL,
+                    row_labels TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, batch)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS write_blocks (
+                    job_id TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    start_row INTEGER NOT NULL,
+                    reserved INTEGER NOT NULL DEFAULT 0,
+                    committed TEXT NOT NULL DEFAULT '[]',
+                    payload TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, target)
+                )
+            """)
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(write_blocks)')]
+            if 'payload' not in columns:
+                conn.execute('ALTER TABLE write_blocks ADD COLUMN payload TEXT')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get_plan(self, job_id, batch):
+        """Row labels chosen for a batch by an earlier attempt, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT row_labels FROM write_plans WHERE job_id = ? AND batch = ?', (job_id, batch)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_plan(self, job_id, batch, row_labels):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO write_plans (job_id, batch, row_labels, updated_at) VALUES (?, ?, ?, ?)',
+                (job_id, batch, json.dumps(row_labels), time.time())
+            )
+        self._evict_if_due()
+
+    def get_write(self, job_id, target):
+        """Progress of a block write as {'start_row', 'reserved', 'committed', 'payload'}, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT start_row, reserved, committed, payload FROM write_blocks WHERE job_id = ? AND target = ?',
+                (job_id, target)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'start_row': row[0], 'reserved': bool(row[1]), 'committed': set(json.loads(row[2])), 'payload': row[3]}
+
+    def start_write(self, job_id, target, start_row, committed, payload=None):
+        """Record where a block write landed once its first block is committed
+
+        payload fingerprints the rows written, so a retry with different rows
+        is not mistaken for a resume of this write.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO write_blocks (job_id, target, start_row, reserved, committed, payload, updated_at) '
+                'VALUES (?, ?, ?, 0, ?, ?, ?)',
+                (job_id, target, start_row, json.dumps(sorted(committed)), payload, time.time())
+            )
+
+    def mark_reserved(self, job_id, target):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'UPDATE write_blocks SET reserved = 1, updated_at = ? WHERE job_id = ? AND target = ?',
+                (time.time(), job_id, target)
+            )
+
+    def mark_committed(self, job_id, target, block):
+        # Read-modify-write in one transaction; concurrent writers wait on SQLite's lock
+        with closing(self._connect()) as conn, conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT committed FROM write_blocks WHERE job_id = ? AND target = ?', (job_id, target)
+            ).fetchone()
+            committed = set(json.loads(row[0])) if row else set()
+            committed.add(block)
+            conn.execute(
+                'UPDATE write_blocks SET committed = ?, updated_at = ? WHERE job_id = ? AND target = ?',
+                (json.dumps(sorted(committed)), time.time(), job_id, target)
+            )
+
+    def clear(self, job_id):
+        """Forget a job's checkpoints once it has completed"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM write_plans WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM write_blocks WHERE job_id = ?', (job_id,))
+
+    def _evict_if_due(self):
+        # Checkpoints of failed or abandoned jobs are never cleared, so they expire here;
+        # at most once a minute per process to keep writes cheap
+        with self._lock:
+            if time.time() - self._last_eviction < 60:
+                return
+            self._last_eviction = time.time()
+        self.evict()
+
+    def evict(self):
+        """Drop checkpoints of jobs not touched for ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM write_plans WHERE updated_at < ?', (cutoff,))
+            conn.execute('DELETE FROM write_blocks WHERE updated_at < ?', (cutoff,))
+
+class JobCheckpoint:
+    """Checkpoints of one job, handed to the services that do its writes
+
+    Batches are numbered in the order the job processes them, which is the same
+    on every attempt because the file is re-read in the same order.
+    """
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.batch = 0
+
+    def next_batch(self):
+        """Start the next batch of the upload and return its number"""
+        self.batch += 1
+        return self.batch
+
+    def get_plan(self, name=''):
+        return self.store.get_plan(self.job_id, f"{self.batch}:{name}")
+
+    def save_plan(self, row_labels, name=''):
+        self.store.save_plan(self.job_id, f"{self.batch}:{name}", row_labels)
+
+    def write_key(self, spreadsheet_id, sheet_name):
+        """Key of this batch's block write to one sheet"""
+        return f"{self.batch}:{spreadsheet_id}:{sheet_name}"
+
+    def clear(self):
+        self.store.clear(self.job_id)
@@ -2,8 +2,18 @@ import { useState, useCallback, useEffect } from 'react'
 import './App.css'
 import config from './config'
 
+// Plain CSVs, or gzip/zstd-compressed ones that the backend decompresses while parsing
+const isCsvFile = (file) => {
+  const name = file.name.toLowerCase()
+  return file.type === 'text/csv' || ['.csv', '.csv.gz', '.csv.zst'].some((extension) => name.endsWith(extension))
+}
+
+// Several files, or zip archives of CSVs, go to the batch endpoint as one merged upload
+const isUploadFile = (file) => isCsvFile(file) || file.name.toLowerCase().endsWith('.zip')
+const isBatchUpload = (files) => files.length > 1 || !isCsvFile(files[0])
+
 function App() {
-  const [file, setFile] = useState(null)
+  const [files, setFiles] = useState([])
   const [isUploading, setIsUploading] = useState(false)
   const [status, setStatus] = useState('')
   const [dragActive, setDragActive] = useState(false)
@@ -50,42 +60,36 @@ function App() {
     }
   }, [])
 
+  const selectFiles = useCallback((fileList) => {
+    const chosenFiles = Array.from(fileList || [])
+    if (chosenFiles.length === 0) {
+      return
+    }
+    if (chosenFiles.every(isUploadFile)) {
+      setFiles(chosenFiles)
+      setStatus('')
+      setProcessingId(null)
+      setProcessingStatus(null)
+      setProgress(0)
+    } else {
+      setStatus('Please select valid CSV files (.csv, .csv.gz or .csv.zst) or zip archives of them')
+    }
+  }, [])
+
   const handleDrop = useCallback((e) => {
     e.preventDefault()
     e.stopPropagation()
     setDragActive(false)
-    
-    if (e.dataTransfer.files && e.dataTransfer.files[0]) {
-      const droppedFile = e.dataTransfer.files[0]
-      if (droppedFile.type === 'text/csv' || droppedFile.name.endsWith('.csv')) {
-        setFile(droppedFile)
-        setStatus('')
-        setProcessingId(null)
-        setProcessingStatus(null)
-        setProgress(0)
-      } else {
-        setStatus('Please select a valid CSV file')
-      }
-    }
-  }, [])
+    selectFiles(e.dataTransfer.files)
+  }, [selectFiles])
 
   const handleFileSelect = (e) => {
-    const selectedFile = e.target.files[0]
-    if (selectedFile) {
-      if (selectedFile.type === 'text/csv' || selectedFile.name.endsWith('.csv')) {
-        setFile(selectedFile)
-        setStatus('')
-        setProcessingId(null)
-        setProcessingStatus(null)
-        setProgress(0)
-      } else {
-        setStatus('Please select a valid CSV file')
-      }
-    }
+    selectFiles(e.target.files)
   }
 
-  const handleUpload = async () => {
-    if (!file) {
+  // force re-processes files the backend has already seen instead of returning the cached result
+  const handleUpload = async (force = false) => {
+    if (files.length === 0) {
       setStatus('Please select a file first')
       return
     }
@@ -96,17 +100,25 @@ function App() {
     }
 
     setIsUploading(true)
-    setStatus('Uploading CSV file...')
+    setStatus(files.length > 1 ? `Uploading ${files.length} files...` : 'Uploading CSV file...')
     setProgress(10)
 
     try {
       // Create FormData for file upload
+      const batch = isBatchUpload(files)
       const formData = new FormData()
-      formData.append('file', file)
+      if (batch) {
+        files.forEach((selectedFile) => formData.append('files', selectedFile))
+      } else {
+        formData.append('file', files[0])
+      }
       formData.append('client_id', selectedClient)
+      if (force) {
+        formData.append('force', 'true')
+      }
 
       // Send to Flask backend
-      const response = await fetch(config.getEndpoint('UPLOAD'), {
+      const response = await fetch(config.getEndpoint(batch ? 'UPLOAD_BATCH' : 'UPLOAD'), {
         method: 'POST',
         body: formData
       })
@@ -117,8 +129,8 @@ function App() {
         setStatus('File uploaded! Processing CSV and updating Google Sheets...')
         setProgress(30)
         
-        // Start polling for status updates
-        pollProcessingStatus(result.processing_id)
+        // Subscribe to status updates
+        subscribeToProcessingStatus(result.processing_id)
       } else {
         const error = await response.json()
         setStatus(error.error || 'Upload failed. Please try again.')
@@ -133,37 +145,90 @@ function App() {
     }
   }
 
-  const pollProcessingStatus = async (filename) => {
+  // Run a failed job again; rows it already wrote are skipped by the backend
+  const handleRetry = async () => {
+    setIsUploading(true)
+    setStatus('Retrying...')
+    setProgress(30)
+
+    try {
+      const response = await fetch(`${config.getEndpoint('RETRY')}/${processingId}`, { method: 'POST' })
+      const result = await response.json()
+      if (response.ok) {
+        setStatus(result.message)
+        subscribeToProcessingStatus(processingId)
+      } else {
+        setStatus(result.error || 'Retry failed. Please try again.')
+        setProgress(0)
+        setIsUploading(false)
+      }
+    } catch (error) {
+      console.error('Retry error:', error)
+      setStatus('Retry failed. Please check if the backend is running.')
+      setProgress(0)
+      setIsUploading(false)
+    }
+  }
+
+  // Apply a status update from the backend; returns true once the job has finished
+  const applyStatusUpdate = (statusData) => {
+    setProcessingStatus(statusData)
+    
+    // Update progress based on status
+    if (statusData.progress) {
+      setProgress(30 + (statusData.progress * 0.7)) // 30% to 100%
+    }
+    
+    // Update status message
+    if (statusData.status === 'processing' || statusData.status === 'queued' || statusData.status === 'warning') {
+      setStatus(statusData.message)
+    } else if (statusData.status === 'completed') {
+      setStatus(statusData.message)
+      setProgress(100)
+      setIsUploading(false)
+      return true
+    } else if (statusData.status === 'failed') {
+      setStatus(`Error: ${statusData.message}`)
+      setProgress(0)
+      setIsUploading(false)
+      return true
+    }
+    return false
+  }
+
+  // Subscribe to pushed status updates, falling back to polling if streaming is unavailable
+  const subscribeToProcessingStatus = (jobId) => {
+    if (typeof EventSource === 'undefined') {
+      pollProcessingStatus(jobId)
+      return
+    }
+
+    const eventSource = new EventSource(`${config.getEndpoint('STATUS')}/${jobId}/stream`)
+    let finished = false
+
+    eventSource.onmessage = (event) => {
+      finished = applyStatusUpdate(JSON.parse(event.data))
+      if (finished) {
+        eventSource.close()
+      }
+    }
+
+    eventSource.onerror = () => {
+      eventSource.close()
+      if (!finished) {
+        pollProcessingStatus(jobId)
+      }
+    }
+  }
+
+  const pollProcessingStatus = async (jobId) => {
     const pollInterval = setInterval(async () => {
       try {
-        const response = await fetch(`${config.getEndpoint('STATUS')}/${filename}`)
+        const response = await fetch(`${config.getEndpoint('STATUS')}/${jobId}`)
         if (response.ok) {
           const statusData = await response.json()
-          setProcessingStatus(statusData)
-          
-          // Update progress based on status
-          if (statusData.progress) {
-            setProgress(30 + (statusData.progress * 0.7)) // 30% to 100%
-          }
-          
-          // Update status message
-          if (statusData.status === 'processing') {
-            setStatus(statusData.message)
-          } else if (statusData.status === 'completed') {
-            setStatus(statusData.message)
-            setProgress(100)
-            clearInterval(pollInterval)
-            setIsUploading(false)
-          } else if (statusData.status === 'failed') {
-            setStatus(`Error: ${statusData.message}`)
-            setProgress(0)
+          if (applyStatusUpdate(statusData)) {
             clearInterval(pollInterval)
-            setIsUploading(false)
-          } else if (statusData.status === 'warning') {
-            setStatus(statusData.message)
-            setProgress(100)
-            clearInterval(pollInterval)
-            setIsUploading(false)
           }
         }
       } catch (error) {
@@ -183,7 +248,7 @@ function App() {
   }
 
   const removeFile = () => {
-    setFile(null)
+    setFiles([])
     setStatus('')
     setProcessingId(null)
     setProcessingStatus(null)
@@ -243,7 +308,7 @@ function App() {
   const handleClientChange = (clientId) => {
     setSelectedClient(clientId)
     // Reset file input when client changes
-    setFile(null)
+    setFiles([])
     setDragActive(false)
     setStatus('')
     setProcessingStatus(null)
@@ -311,7 +376,7 @@ function App() {
             onDragOver={handleDrag}
             onDrop={handleDrop}
           >
-            {!file ? (
+            {files.length === 0 ? (
               <div>
                 <div className="mx-auto w-16 h-16 bg-gray-100 rounded-full flex items-center justify-center mb-4">
                   <svg className="w-8 h-8 text-gray-400" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -319,16 +384,17 @@ function App() {
                   </svg>
                 </div>
                 <p className="text-lg font-medium text-gray-900 mb-2">
-                  Drop your CSV file here
+                  Drop your CSV files here
                 </p>
                 <p className="text-gray-500 mb-4">
                   or click to browse files
                 </p>
                 <label className="inline-flex items-center px-6 py-3 bg-blue-600 text-white font-medium rounded-lg hover:bg-blue-700 focus:outline-none focus:ring-2 focus:ring-blue-500 focus:ring-offset-2 cursor-pointer transition-colors">
-                  Choose File
+                  Choose Files
                   <input
                     type="file"
-                    accept=".csv,text/csv"
+                    accept=".csv,.gz,.zst,.zip,text/csv"
+                    multiple
                     onChange={handleFileSelect}
                     className="hidden"
                   />
@@ -342,10 +408,10 @@ function App() {
                   </svg>
                 </div>
                 <p className="text-lg font-medium text-gray-900 mb-2">
-                  File Selected
+                  {files.length > 1 ? `${files.length} Files Selected` : 'File Selected'}
                 </p>
                 <p className="text-gray-500 mb-4">
-                  {file.name} ({(file.size / 1024).toFixed(1)} KB)
+                  {files.map((selectedFile) => selectedFile.name).join(', ')} ({(files.reduce((total, selectedFile) => total + selectedFile.size, 0) / 1024).toFixed(1)} KB)
                 </p>
                 <div className="flex gap-3 justify-center">
                   <button
@@ -356,7 +422,7 @@ function App() {
                     Remove
                   </button>
                   <button
-                    onClick={handleUpload}
+                    onClick={() => handleUpload()}
                     disabled={isUploading || !selectedClient}
                     className="px-6 py-2 bg-blue-600 text-white font-medium rounded-lg hover:bg-blue-700 focus:outline-none focus:ring-2 focus:ring-blue-500 focus:ring-offset-2 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
                   >
@@ -406,6 +472,22 @@ function App() {
                   Please wait...
                 </div>
               )}
+              {!isUploading && processingStatus?.cached && files.length > 0 && (
+                <button
+                  onClick={() => handleUpload(true)}
+                  className="ml-4 px-4 py-2 text-sm text-blue-700 border border-blue-300 rounded-lg hover:bg-blue-50 focus:outline-none focus:ring-2 focus:ring-blue-500 focus:ring-offset-2 transition-colors"
+                >
+                  Upload anyway
+                </button>
+              )}
+              {!isUploading && processingStatus?.status === 'failed' && !processingStatus.cached && processingId && (
+                <button
+                  onClick={handleRetry}
+                  className="ml-4 px-4 py-2 text-sm text-blue-700 border border-blue-300 rounded-lg hover:bg-blue-50 focus:outline-none focus:ring-2 focus:ring-blue-500 focus:ring-offset-2 transition-colors"
+                >
+                  Retry
+                </button>
+              )}
             </div>
             
             {/* Show detailed processing info when available */}
@@ -420,7 +502,8 @@ function App() {
                     <span className="font-medium">Rows processed:</span> {processingStatus.data_info.rows}
                   </div>
                   <div>
-                    <span className="font-medium">Columns mapped:</span> {processingStatus.data_info.columns}
+                    <span className="font-medium">Columns mapped:</span> {processingStatus.data_info.loaded_columns ?? processingStatus.data_info.columns}
+                    {processingStatus.data_info.loaded_columns < processingStatus.data_info.columns && ` of ${processingStatus.data_info.columns}`}
                   </div>
                   <div>
                     <span className="font-medium">File size:</span> {processingStatus.data_info.file_size_mb} MB
@@ -14,7 +14,9 @@ const config = {
   ENDPOINTS: {
     CLIENTS: '/api/clients',
     UPLOAD: '/api/upload',
+    UPLOAD_BATCH: '/api/upload/batch',
     STATUS: '/api/status',
+    RETRY: '/api/retry',
     HEALTH: '/api/health',
     TEST_MASTER: '/api/test-master-connection',
     TEST_CLIENT: '/api/test-client-connection',